@@ -0,0 +1,78 @@
+from websockets.sync.client import connect
+
+import time
+import json
+import threading
+
+AGENTS_SUBSCRIPTION =   """
+                            subscription {
+                                agentsChanged {
+                                    id
+                                }
+                            }
+                        """
+
+MAX_RECONNECT_DELAY = 30  # seconds
+
+
+class AgentListSubscription:
+    """
+    Receives agent list changes pushed by the GraphQL server (`agentsChanged` subscription, over
+    the graphql-transport-ws protocol) and applies them to a Bridge as soon as they arrive.
+
+    The connection is re-established with exponential backoff if it drops; the bridge's slow
+    resync poll covers any change missed while disconnected.
+
+    Attributes:
+        bridge (Bridge): The bridge to update.
+        url (str): The websocket URL of the GraphQL endpoint.
+        connected (bool): True while the subscription is active.
+    """
+
+    def __init__(self, bridge):
+        self.bridge = bridge
+        self.url = bridge.graphql_server.replace('http://', 'ws://', 1).replace('https://', 'wss://', 1)
+        self.connected = False
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='agent-membership', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        delay = 1
+        while self.running:
+            try:
+                with connect(self.url, subprotocols=['graphql-transport-ws'], open_timeout=2) as ws:
+                    ws.send(json.dumps({'type': 'connection_init', 'payload': {}}))
+                    ack = json.loads(ws.recv(timeout=5))
+                    if ack.get('type') != 'connection_ack':
+                        raise ConnectionError(f"Unexpected reply to connection_init: {ack}")
+
+                    ws.send(json.dumps({'id': '1', 'type': 'subscribe', 'payload': {'query': AGENTS_SUBSCRIPTION}}))
+                    self.connected = True
+                    delay = 1
+
+                    for raw_message in ws:
+                        message = json.loads(raw_message)
+                        message_type = message.get('type')
+
+                        if message_type == 'next':
+                            agent_lists = message.get('payload', {}).get('data', {}).get('agentsChanged') or []
+                            if len(agent_lists) == 2:
+                                self.bridge.set_agents(agent_lists[0].get('id') or [], agent_lists[1].get('id') or [])
+                        elif message_type == 'ping':
+                            ws.send(json.dumps({'type': 'pong'}))
+                        elif message_type in ('error', 'complete'):
+                            print(f"Agent list subscription ended: {message}")
+                            break
+            except Exception as e:
+                if self.connected:
+                    print(f"Agent list subscription lost: {e}")
+
+            self.connected = False
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def stop(self):
+        self.running = False
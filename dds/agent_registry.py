@@ -0,0 +1,218 @@
+import time
+
+import requests
+
+REGISTRY_STATE_QUERY = """
+    query {
+    agentRegistryState {
+        version
+        active
+        exited
+    }
+    }
+"""
+
+APPLY_CHANGES_MUTATION = """
+    mutation($version: Int!, $active: [Int!], $inactive: [Int!], $exited: [Int!], $notExited: [Int!]) {
+    applyAgentChanges(expected_version: $version, active: $active, inactive: $inactive, exited: $exited, not_exited: $notExited)
+    }
+"""
+
+ADD_AGENT_MUTATION = """
+    mutation($agentId: Int!, $timestamp: Float) {
+    addAgent(agent_id: $agentId, timestamp: $timestamp)
+    }
+"""
+
+REMOVE_AGENT_MUTATION = """
+    mutation($agentId: Int!, $exited: Boolean) {
+    removeAgent(agent_id: $agentId, exited: $exited)
+    }
+"""
+
+MAX_ATTEMPTS = 3    # Diffs sent per sync, each against a fresh read of the registry after a conflict
+RETRY_DELAY = 0.05  # seconds before reading the registry again when it could not be read
+
+
+class AgentRegistryWriter:
+    """
+    Writes a handler's view of the agent lists to the GraphQL agent registry as per-agent changes.
+
+    update() sends each agent that joined, left or exited since the last update as its own
+    addAgent/removeAgent mutation, so a change costs one small request whatever the number of
+    agents, and an update with nothing to change sends nothing.
+
+    sync() is the repair path, used for the first update and after a failed write: it diffs the
+    view against the registry contents at a known version and sends the differences in one
+    applyAgentChanges mutation conditioned on that version. If another writer changed the
+    registry since, the server rejects the batch and the writer reads the registry again and
+    diffs against what is there, so the lists end up as this writer's view.
+
+    Attributes:
+        graphql_server (str): The GraphQL server URL.
+        version (int): The registry version `agents` and `exited_agents` were read or written at
+            by sync(), or None if unknown.
+        in_sync (bool): True if the registry had this writer's view after its last write.
+        agents (set): The active agents as last written.
+        exited_agents (set): The exited agents as last written.
+    """
+
+    def __init__(self, graphql_server, timeout=1):
+        self.graphql_server = graphql_server
+        self.timeout = timeout
+        self.version = None
+        self.in_sync = False
+        self.agents = set()
+        self.exited_agents = set()
+        self.metrics = {
+            'reads': 0,
+            'writes': 0,
+            'agent_changes': 0,
+            'skipped': 0,
+            'retries': 0,
+            'syncs': 0,
+            'failed': 0,
+        }
+
+    def update(self, agents, exited_agents=None):
+        """
+        Sends the agents that changed since the last update, one mutation per agent.
+
+        Args:
+            agents (iterable): IDs of all active agents.
+            exited_agents (iterable): IDs of exited agents, or None to leave them unchanged
+                (apart from agents entering again, which are no longer exited).
+
+        Returns:
+            bool: True if the server is up to date.
+        """
+        agents = set(agents)
+        target_exited = self._target_exited(agents, exited_agents)
+
+        # Clearing the exited flag of an agent that did not enter has no per-agent mutation
+        if not self.in_sync or (self.exited_agents - target_exited) - agents:
+            return self.sync(agents, exited_agents)
+
+        joined = sorted(agents - self.agents)
+        left = sorted((self.agents - agents) | (target_exited - self.exited_agents - agents))
+        if not joined and not left:
+            self.metrics['skipped'] += 1
+            return True
+
+        for agent_id in joined:
+            if not self._post(ADD_AGENT_MUTATION, {'agentId': agent_id}, 'addAgent'):
+                return self._resync(agents, exited_agents)
+        for agent_id in left:
+            if not self._post(REMOVE_AGENT_MUTATION, {'agentId': agent_id, 'exited': agent_id in target_exited},
+                              'removeAgent'):
+                return self._resync(agents, exited_agents)
+
+        self.metrics['writes'] += len(joined) + len(left)
+        self.metrics['agent_changes'] += len(joined) + len(left)
+        self.agents = agents
+        self.exited_agents = target_exited
+        self.version = None  # The per-agent mutations moved the version
+        return True
+
+    def register(self, agent_id, timestamp):
+        """
+        Marks an agent as active with `timestamp` as its last seen time, even if it already is.
+
+        Returns:
+            bool: True if the registry accepted it.
+        """
+        if not self._post(ADD_AGENT_MUTATION, {'agentId': int(agent_id), 'timestamp': float(timestamp)}, 'addAgent'):
+            return False
+        self.agents = self.agents | {int(agent_id)}
+        self.exited_agents = self.exited_agents - {int(agent_id)}
+        self.version = None
+        return True
+
+    def sync(self, agents, exited_agents=None):
+        """
+        Makes the registry match the given lists, diffed against its current contents.
+
+        Args:
+            agents (iterable): IDs of all active agents.
+            exited_agents (iterable): IDs of exited agents, or None to leave them unchanged
+                (apart from agents entering again, which are no longer exited).
+
+        Returns:
+            bool: True if the server is up to date.
+        """
+        agents = set(agents)
+        self.in_sync = False
+        self.metrics['syncs'] += 1
+
+        for attempt in range(MAX_ATTEMPTS):
+            if self.version is None and not self._read_state():
+                # Unreachable, or a batch of another writer was being written
+                self.metrics['retries'] += 1
+                time.sleep(RETRY_DELAY)
+                continue
+
+            target_exited = self._target_exited(agents, exited_agents)
+            changes = {
+                'active': sorted(agents - self.agents),
+                'inactive': sorted(self.agents - agents),
+                'exited': sorted(target_exited - self.exited_agents),
+                'notExited': sorted(self.exited_agents - target_exited),
+            }
+
+            version = self._post(APPLY_CHANGES_MUTATION, dict(changes, version=self.version), 'applyAgentChanges')
+            if version is None:
+                # The registry moved (or the request failed): read it again and diff against it
+                self.metrics['retries'] += 1
+                self.version = None
+                continue
+
+            count = sum(len(agent_ids) for agent_ids in changes.values())
+            if count:
+                self.metrics['writes'] += 1
+                self.metrics['agent_changes'] += count
+            else:
+                self.metrics['skipped'] += 1
+            self.version = version
+            self.agents = agents
+            self.exited_agents = target_exited
+            self.in_sync = True
+            return True
+
+        self.metrics['failed'] += 1
+        return False
+
+    def _target_exited(self, agents, exited_agents):
+        if exited_agents is None:
+            return self.exited_agents - agents
+        return set(exited_agents)
+
+    def _resync(self, agents, exited_agents):
+        # Some of the per-agent changes may have been applied, find out from the registry
+        self.metrics['retries'] += 1
+        self.version = None
+        return self.sync(agents, exited_agents)
+
+    def _read_state(self):
+        state = self._post(REGISTRY_STATE_QUERY, None, 'agentRegistryState')
+        if state is None:
+            return False
+        self.version = state['version']
+        self.agents = set(state['active'] or [])
+        self.exited_agents = set(state['exited'] or [])
+        self.metrics['reads'] += 1
+        return True
+
+    def _post(self, query, variables, field):
+        payload = {'query': query}
+        if variables is not None:
+            payload['variables'] = variables
+        try:
+            response = requests.post(self.graphql_server, json=payload, timeout=self.timeout)
+            if response.status_code == 200:
+                return (response.json().get('data') or {}).get(field)
+        except Exception as e:
+            print(f"Failed to update the agent registry: {e}")
+        return None
+
+    def get_metrics(self):
+        return dict(self.metrics)
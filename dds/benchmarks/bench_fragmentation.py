@@ -0,0 +1,134 @@
+"""
+Throughput, latency and loss of large messages sent whole versus fragmented, over the local
+DDS domain (two participants in one process).
+
+Wi-Fi loss is simulated on the sending side with --loss, the probability that one fragment-sized
+packet is lost. A message sent whole is lost if any of its packets is; a fragmented message
+only loses the affected fragments, which are then dropped by the reassembler's timeout.
+
+Usage:
+    python benchmarks/bench_fragmentation.py --size 200000 --count 200 --loss 0.01
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+from cyclonedds.domain import DomainParticipant
+from cyclonedds.topic import Topic
+from cyclonedds.sub import DataReader
+from cyclonedds.pub import DataWriter
+from cyclonedds.core import Qos, Policy, Listener
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from message_defs import DataMessage, FragmentMessage, fragment_qos
+from fragmentation import Fragmenter, FragmentListener, Reassembler, FRAGMENT_SIZE
+
+whole_qos = Qos(
+    Policy.Reliability.BestEffort,
+    Policy.Durability.Volatile,
+    Policy.History.KeepLast(depth=64)
+)
+
+
+class Receiver:
+    def __init__(self):
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def deliver(self, message):
+        latency = time.time_ns() - message.timestamp
+        with self.lock:
+            self.latencies.append(latency / 1e6)
+
+
+class WholeListener(Listener):
+    def __init__(self, receiver):
+        super().__init__()
+        self.receiver = receiver
+
+    def on_data_available(self, reader):
+        for sample in reader.take(N=64):
+            if getattr(sample, 'sample_info', None) is None or sample.sample_info.valid_data:
+                self.receiver.deliver(sample)
+
+
+def run(mode, args):
+    sender = DomainParticipant()
+    receiver_participant = DomainParticipant()
+    receiver = Receiver()
+    reassembler = Reassembler(timeout=args.timeout)
+    fragmenter = Fragmenter(1, fragment_size=args.fragment_size)
+
+    if mode == 'whole':
+        topic_name, data_type, qos = 'BenchWholeTopic', DataMessage, whole_qos
+        listener = WholeListener(receiver)
+    else:
+        topic_name, data_type, qos = 'BenchFragmentTopic', FragmentMessage, fragment_qos
+        listener = FragmentListener(receiver.deliver, reassembler)
+
+    writer = DataWriter(sender, Topic(sender, topic_name, data_type), qos=qos)
+    reader = DataReader(receiver_participant, Topic(receiver_participant, topic_name, data_type), listener=listener, qos=qos)
+    time.sleep(1)  # Discovery
+
+    rng = random.Random(0)
+    payload = 'x' * args.size
+    packets = max(1, -(-args.size // args.fragment_size))
+    interval = 1 / args.rate if args.rate else 0
+
+    start = time.perf_counter()
+    for i in range(args.count):
+        message = DataMessage(message_type='bench', sending_agent=1, timestamp=time.time_ns(), data=payload)
+        if mode == 'whole':
+            if all(rng.random() >= args.loss for _ in range(packets)):
+                writer.write(message)
+        else:
+            for fragment in fragmenter.fragment(message, timestamp=message.timestamp):
+                if rng.random() >= args.loss:
+                    writer.write(fragment)
+        if interval:
+            time.sleep(interval)
+    send_time = time.perf_counter() - start
+
+    time.sleep(args.timeout + 0.5)  # Let the last messages arrive and incomplete ones expire
+
+    latencies = sorted(receiver.latencies)
+    delivered = len(latencies)
+    result = {
+        'mode': mode,
+        'delivered': delivered,
+        'loss_pct': 100 * (1 - delivered / args.count),
+        'throughput_mb_s': delivered * args.size / send_time / 1e6,
+        'p50_ms': latencies[delivered // 2] if latencies else float('nan'),
+        'p99_ms': latencies[min(delivered - 1, int(delivered * 0.99))] if latencies else float('nan'),
+    }
+    if mode == 'fragmented':
+        result['reassembly'] = reassembler.get_metrics()
+    del reader, writer
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=200000, help='Message size in bytes')
+    parser.add_argument('--count', type=int, default=200, help='Number of messages')
+    parser.add_argument('--rate', type=float, default=20, help='Messages per second, 0 for as fast as possible')
+    parser.add_argument('--loss', type=float, default=0.0, help='Simulated loss probability per fragment-sized packet')
+    parser.add_argument('--fragment-size', type=int, default=FRAGMENT_SIZE)
+    parser.add_argument('--timeout', type=float, default=1.0, help='Reassembly timeout in seconds')
+    args = parser.parse_args()
+
+    for mode in ('whole', 'fragmented'):
+        result = run(mode, args)
+        print(f"{result['mode']:10s} delivered {result['delivered']:5d}/{args.count} "
+              f"({result['loss_pct']:5.1f}% lost)  {result['throughput_mb_s']:7.2f} MB/s  "
+              f"p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms")
+        if 'reassembly' in result:
+            print(f"           {result['reassembly']}")
+
+
+if __name__ == '__main__':
+    main()
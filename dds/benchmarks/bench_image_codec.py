@@ -0,0 +1,83 @@
+"""
+Compares the wire size and receive-side deserialize + decode time of the legacy ImageMessage (one int per
+byte) against CompressedImageMessage with raw, PNG and JPEG payloads.
+
+CycloneDDS hands a sequence<uint8> back as a list of ints, so the CompressedImageMessage rows include the
+copy of that list into bytes (the 'to bytes' column), paid once per admitted frame.
+
+Usage:
+    python benchmarks/bench_image_codec.py --width 640 --height 480 --repeat 50
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from message_defs import ImageMessage, CompressedImageMessage, octets
+from image_codec import decode_image, encode_image
+
+
+def legacy_decode(sample):
+    # The previous listener code, kept here as the baseline
+    image_data = np.array(sample.data)
+    image_array = image_data.reshape((sample.height, sample.width, 3))
+    return image_array.astype('uint8')
+
+
+def time_it(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def make_frame(width, height):
+    # Smooth gradients plus a little noise, closer to a camera frame than pure noise
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width)
+    y = np.linspace(0, 255, height)
+    frame = np.stack([np.add.outer(y, x) / 2, np.tile(x, (height, 1)), np.tile(y[:, None], (1, width))], axis=-1)
+    frame += rng.normal(0, 4, size=frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    frame = make_frame(args.width, args.height)
+
+    legacy = ImageMessage(agent_id=1, timestamp=0, data=frame.reshape(-1).tolist(),
+                          width=args.width, height=args.height, encoding='rgb8')
+    messages = [('legacy ImageMessage', legacy, legacy_decode)]
+    for encoding in ('raw', 'png', 'jpeg'):
+        messages.append((f'CompressedImageMessage ({encoding})', encode_image(1, 0, frame, encoding=encoding), decode_image))
+
+    baseline_size = None
+    baseline_time = None
+    print(f"{'message':34s} {'wire bytes':>12s} {'size':>8s} {'deser ms':>9s} {'to bytes ms':>12s} {'decode ms':>10s} "
+          f"{'speedup':>8s}")
+    for label, message, decode in messages:
+        wire = message.serialize()
+        received = type(message).deserialize(wire)
+        deserialize_time = time_it(lambda: type(message).deserialize(wire), args.repeat)
+        convert_time = 0.0
+        if isinstance(received, CompressedImageMessage):
+            convert_time = time_it(lambda: octets(received.data), args.repeat)
+            received.data = octets(received.data)
+        elapsed = deserialize_time + convert_time + time_it(lambda: decode(received), args.repeat)
+
+        if baseline_size is None:
+            baseline_size, baseline_time = len(wire), elapsed
+        print(f"{label:34s} {len(wire):12d} {len(wire) / baseline_size:8.3f} {deserialize_time * 1e3:9.3f} {convert_time * 1e3:12.3f} {elapsed * 1e3:10.3f} {baseline_time / elapsed:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
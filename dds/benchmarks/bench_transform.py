@@ -0,0 +1,85 @@
+"""
+Microbenchmark of RigidTransform2D against the per-point transform that used to be
+copied into every bridge.
+
+Usage:
+    python benchmarks/bench_transform.py --points 1000 --repeat 200
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from transforms import RigidTransform2D
+
+
+def legacy_transform_point(R, t, point, forward=True):
+    # The previous implementation, kept here as the baseline
+    if R is None:
+        return point
+
+    point_xy = np.array([point[0], point[1]])
+    if forward:
+        new_point_xy = R @ point_xy + t
+        new_point_theta = point[2] + np.arctan2(R[1, 0], R[0, 0])
+        return np.concatenate((new_point_xy, [new_point_theta]))
+    else:
+        new_point_xy = R.T @ (point_xy - t)
+        new_point_theta = point[2] - np.arctan2(R[1, 0], R[0, 0])
+        return np.concatenate((new_point_xy, [new_point_theta]))
+
+
+def time_it(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1000, help='Number of poses per path')
+    parser.add_argument('--repeat', type=int, default=200, help='Number of paths to transform')
+    args = parser.parse_args()
+
+    angle = 0.3
+    R = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    t = np.array([1.5, -2.0])
+    transform = RigidTransform2D(R, t)
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-50, 50, size=(args.points, 3))
+    point_list = points.tolist()
+
+    def legacy():
+        return [legacy_transform_point(R, t, p, forward=False) for p in point_list]
+
+    def per_point():
+        return [transform.transform_point(p, forward=False) for p in point_list]
+
+    def batch():
+        return transform.apply_inverse(points)
+
+    # Make sure all three agree before timing them
+    expected = np.array(legacy())
+    assert np.allclose(expected, np.array(per_point()))
+    assert np.allclose(expected, batch())
+
+    results = {
+        'legacy per-point': time_it(legacy, args.repeat),
+        'RigidTransform2D.transform_point': time_it(per_point, args.repeat),
+        'RigidTransform2D.apply_inverse': time_it(batch, args.repeat),
+    }
+
+    baseline = results['legacy per-point']
+    print(f"{args.points} points per call, {args.repeat} calls")
+    for name, seconds in results.items():
+        print(f"    {name:<34} {seconds * 1e3:9.3f} ms/call   {baseline / seconds:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+"""
+Swarm simulator and load harness for the DDS bridge.
+
+Runs N fake agents over a loopback-only CycloneDDS domain against the real bridge, which runs in
+a child process and talks to a stand-in GraphQL server (Ignite stand-in) served by this script.
+The fake agents publish:
+  - Heartbeat on HeartbeatTopic, EntryExit 'enter'/'initialized' when they join and 'exit' when
+    they leave (--churn),
+  - Location on LocationTopic<id>,
+  - 'path' and 'detected_object' DataMessages on DataTopic<id>,
+  - frames on CompressedImageTopic<id>,
+each at its own rate. Every message carries a sequence number where the bridge's GraphQL write or
+frame upload reproduces it (position x, first path time, object x, image timestamp), so the
+stand-in server measures the end-to-end latency of each message from write to server.
+
+For each agent count, reports ingestion throughput, delivery, latency percentiles, and the
+bridge process's CPU and RSS.
+
+Usage:
+    python benchmarks/swarm_sim.py --agents 10,50,100 --duration 30
+    python benchmarks/swarm_sim.py --agents 20 --image-fps 0 --handlers heartbeat_subscriber,location,data
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from cyclonedds.domain import DomainParticipant
+from cyclonedds.topic import Topic
+from cyclonedds.pub import DataWriter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from image_codec import encode_image
+from message_defs import (Heartbeat, EntryExit, Location, DataMessage, CompressedImageMessage,
+                          best_effort_qos, heartbeat_writer_qos, reliable_qos)
+
+BRIDGE_ID = 1000        # Agent ID of the bridge under test; fake agents are 1..N
+FIRST_AGENT_ID = 1
+DEFAULT_HANDLERS = 'heartbeat_subscriber,location,data,image'
+HEARTBEAT_PERIOD = 10   # seconds, as the real heartbeat publisher
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def loopback_config(domain, max_participants):
+    """
+    CycloneDDS configuration keeping all traffic on the loopback interface, with unicast
+    discovery since multicast is usually not available on lo.
+    """
+    return f"""<CycloneDDS><Domain id="{domain}">
+        <General>
+            <Interfaces><NetworkInterface address="127.0.0.1"/></Interfaces>
+            <AllowMulticast>false</AllowMulticast>
+        </General>
+        <Discovery>
+            <ParticipantIndex>auto</ParticipantIndex>
+            <MaxAutoParticipantIndex>{max_participants}</MaxAutoParticipantIndex>
+            <Peers><Peer address="127.0.0.1"/></Peers>
+        </Discovery>
+    </Domain></CycloneDDS>"""
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class StandInServer:
+    """
+    Minimal GraphQL endpoint and /images upload route, answering what the bridge asks for
+    (schema probe, identity transform, agent lists) and timing the writes it receives.
+
+    Attributes:
+        url (str): The GraphQL endpoint.
+        agents (set): The subscribed agent list, as written by the bridge.
+        latencies (dict): kind -> list of end-to-end latencies, in ms.
+        unexpected (int): Writes that matched no sent message.
+    """
+
+    def __init__(self, agents):
+        self.lock = threading.Lock()
+        self.agents = set(agents)
+        self.exited_agents = set()
+        self.version = 1
+        self.pending = dict()       # (kind, robot_id, marker) -> send time
+        self.latencies = dict()
+        self.unexpected = 0
+        self.agents_queried = threading.Event()
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                self.reply(200, json.dumps(stand_in.graphql(body.get('query', ''), body.get('variables') or {})).encode())
+
+            def do_PUT(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                robot_id = int(self.path.rstrip('/').rsplit('/', 1)[-1])
+                stand_in.arrived('image', robot_id, int(float(self.headers.get('X-Timestamp', '0'))))
+                self.reply(204, b'')
+
+            def reply(self, status, payload):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/graphql"
+        self.thread = threading.Thread(target=self.server.serve_forever, name='stand-in-server', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def expect(self, kind, robot_id, marker):
+        with self.lock:
+            self.pending[(kind, robot_id, marker)] = time.perf_counter()
+
+    def arrived(self, kind, robot_id, marker):
+        now = time.perf_counter()
+        with self.lock:
+            sent = self.pending.pop((kind, robot_id, marker), None)
+            if sent is None:
+                self.unexpected += 1
+            else:
+                self.latencies.setdefault(kind, []).append((now - sent) * 1000)
+
+    def graphql(self, query, variables):
+        if 'setRobotPosition' in query:
+            self.arrived('location', variables['robot_id'], int(round(variables['x'])))
+        elif 'setPath' in query:
+            self.arrived('path', variables['robot_id'], int(round(variables['t'][0])))
+        elif 'setObjects' in query:
+            self.arrived('object', variables['agent_id'], int(round(variables['x'])))
+        elif '__typename' in query:
+            return {'data': {'__typename': 'Query'}}
+        elif 'transform' in query and 'setTransform' not in query:
+            return {'data': {'transform': {'R': [1.0, 0.0, 0.0, 1.0], 't': [0.0, 0.0], 'timestamp': time.time()}}}
+        elif 'agentRegistryState' in query:
+            with self.lock:
+                return {'data': {'agentRegistryState': {'version': self.version, 'active': sorted(self.agents),
+                                                        'exited': sorted(self.exited_agents)}}}
+        elif 'applyAgentChanges' in query:
+            return {'data': {'applyAgentChanges': self.apply_agent_changes(variables)}}
+        elif 'addAgent' in query and 'agentId' in variables:
+            return {'data': {'addAgent': self.apply_agent_changes(dict(variables, version=self.version,
+                                                                       active=[variables['agentId']],
+                                                                       notExited=[variables['agentId']])) is not None}}
+        elif 'removeAgent' in query and 'agentId' in variables:
+            exited = [variables['agentId']] if variables.get('exited') else []
+            return {'data': {'removeAgent': self.apply_agent_changes(dict(variables, version=self.version,
+                                                                          inactive=[variables['agentId']],
+                                                                          exited=exited)) is not None}}
+        elif 'agentRegistryVersion' in query:
+            with self.lock:
+                return {'data': {'agentRegistryVersion': self.version}}
+        elif 'subscribedAndExitedAgents' in query:
+            self.agents_queried.set()
+            with self.lock:
+                return {'data': {'subscribedAndExitedAgents': [{'id': sorted(self.agents)}, {'id': sorted(self.exited_agents)}]}}
+        elif 'subscribed_agents' in query:
+            with self.lock:
+                return {'data': {'subscribed_agents': {'id': sorted(self.agents)}}}
+        else:
+            self.apply_agent_mutation(query, variables)
+        return {'data': {}}
+
+    def apply_agent_changes(self, variables):
+        with self.lock:
+            if variables['version'] != self.version:
+                return None
+            changes = [variables.get(name) or [] for name in ('active', 'inactive', 'exited', 'notExited')]
+            if not any(changes):
+                return self.version
+            active, inactive, exited, not_exited = changes
+            self.agents = (self.agents | set(active)) - set(inactive)
+            self.exited_agents = (self.exited_agents | set(exited)) - set(not_exited)
+            self.version += 1
+            return self.version
+
+    def apply_agent_mutation(self, query, variables):
+        with self.lock:
+            if 'setAgentList' in query:
+                self.agents = set(variables.get('agentList', [])) - {-1}
+            if 'setExitedAgentList' in query:
+                self.exited_agents = set(variables.get('exitedAgentList', variables.get('agentList', []))) - {-1}
+            for field in query.split('\n'):
+                if 'addAgent(' in field:
+                    self.agents.add(int(field.split('agent_id:')[1].split(')')[0]))
+                elif 'removeAgent(' in field:
+                    agent_id = int(field.split('agent_id:')[1].split(',')[0])
+                    self.agents.discard(agent_id)
+                    if 'exited: true' in field:
+                        self.exited_agents.add(agent_id)
+            self.version += 1
+
+
+class FakeAgent:
+    """
+    One simulated robot with its own DomainParticipant (or a shared one) and writers.
+    """
+
+    def __init__(self, agent_id, participant, server, frames):
+        self.agent_id = agent_id
+        self.server = server
+        self.frames = frames
+        self.sequence = dict()
+        self.active = True
+
+        def writer(name, data_type, qos):
+            return DataWriter(participant, Topic(participant, name, data_type), qos=qos)
+
+        self.heartbeat_writer = writer('HeartbeatTopic', Heartbeat, heartbeat_writer_qos)
+        self.entry_exit_writer = writer('EntryExitTopic', EntryExit, reliable_qos)
+        self.location_writer = writer(f'LocationTopic{agent_id}', Location, best_effort_qos)
+        self.data_writer = writer(f'DataTopic{agent_id}', DataMessage, reliable_qos)
+        self.image_writer = writer(f'CompressedImageTopic{agent_id}', CompressedImageMessage, reliable_qos)
+        self.image_t0 = int(time.time())
+
+    def next_sequence(self, kind):
+        value = self.sequence.get(kind, 0) + 1
+        self.sequence[kind] = value
+        return value
+
+    def enter(self):
+        self.active = True
+        for action in ('enter', 'initialized'):
+            self.entry_exit_writer.write(EntryExit(self.agent_id, 'robot', action, '127.0.0.1', int(time.time())))
+        self.heartbeat()
+
+    def exit(self):
+        self.active = False
+        self.entry_exit_writer.write(EntryExit(self.agent_id, 'robot', 'exit', '127.0.0.1', int(time.time())))
+
+    def heartbeat(self):
+        self.heartbeat_writer.write(Heartbeat(self.agent_id, int(time.time()), 'robot', '127.0.0.1', True, 0.0, 0.0, 0.0, []))
+
+    def location(self):
+        seq = self.next_sequence('location')
+        self.server.expect('location', self.agent_id, seq)
+        self.location_writer.write(Location(self.agent_id, int(time.time()), float(seq), float(self.agent_id), 0.0, False))
+
+    def path(self, points):
+        seq = self.next_sequence('path')
+        poses = [{'header': {'stamp': {'secs': seq + i, 'nsecs': 0}},
+                  'pose': {'position': {'x': float(i), 'y': float(self.agent_id)}}} for i in range(points)]
+        self.server.expect('path', self.agent_id, seq)
+        self.data_writer.write(DataMessage('path', self.agent_id, int(time.time()), json.dumps({'poses': poses})))
+
+    def detected_object(self):
+        seq = self.next_sequence('object')
+        data = {'class_name': 'person', 'width': 0.5, 'pose': {'position': {'x': float(seq), 'y': 0.0}}}
+        self.server.expect('object', self.agent_id, seq)
+        self.data_writer.write(DataMessage('detected_object', self.agent_id, int(time.time()), json.dumps(data)))
+
+    def image(self):
+        seq = self.next_sequence('image')
+        frame = self.frames[seq % len(self.frames)]
+        timestamp = self.image_t0 + seq  # Unique per frame, the upload carries it back
+        self.server.expect('image', self.agent_id, timestamp)
+        self.image_writer.write(CompressedImageMessage(self.agent_id, timestamp, frame.encoding, frame.width,
+                                                       frame.height, frame.data))
+
+
+def make_frames(args):
+    if args.image_fps <= 0:
+        return []
+    width, height = (int(v) for v in args.image_size.split('x'))
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(8):
+        # Smooth gradients plus noise, compressible like a camera frame, and distinct per frame
+        base = np.linspace(0, 255, width, dtype=np.float32)[None, :, None] * rng.uniform(0.5, 1, 3)
+        noise = rng.normal(0, 12, (height, width, 3))
+        frames.append(encode_image(0, 0, np.clip(base + noise, 0, 255).astype(np.uint8), encoding=args.image_encoding))
+    return frames
+
+
+def process_stats(pid):
+    """
+    Returns:
+        tuple: (CPU seconds, RSS in MB) of a process, from /proc.
+    """
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss = 0.0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1]) / 1024
+    return cpu, rss
+
+
+def run_scale(agent_count, args, config):
+    agent_ids = list(range(FIRST_AGENT_ID, FIRST_AGENT_ID + agent_count))
+    server = StandInServer(agent_ids + [BRIDGE_ID])
+    server.start()
+
+    work_dir = tempfile.mkdtemp(prefix='swarm_sim_')
+    env = dict(os.environ, CYCLONEDDS_URI=config, AGENT_ID=str(BRIDGE_ID),
+               IMAGE_DIR=os.path.join(work_dir, 'images'),
+               IMAGE_INDEX_PATH=os.path.join(work_dir, 'images.sqlite'),
+               IMAGE_DEDUP_THRESHOLD='-1')  # The synthetic frames hash alike, every one must reach the server
+    log_path = os.path.join(work_dir, 'bridge.log')
+    with open(log_path, 'w') as log:
+        bridge = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--bridge-child',
+                                   '--server-url', server.url, '--handlers', args.handlers],
+                                  env=env, stdout=log, stderr=subprocess.STDOUT,
+                                  cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    try:
+        os.environ['CYCLONEDDS_URI'] = config
+        frames = make_frames(args)
+        shared = DomainParticipant(args.domain) if args.shared_participant else None
+        agents = [FakeAgent(agent_id, shared or DomainParticipant(args.domain), server, frames) for agent_id in agent_ids]
+        for agent in agents:
+            agent.enter()
+
+        if not server.agents_queried.wait(60):
+            raise RuntimeError(f"The bridge did not start, see {log_path}")
+        time.sleep(args.warmup)  # Discovery of every agent's topics
+
+        # Every (agent, kind) is due on its own period, with a random phase
+        rng = random.Random(0)
+        rates = {'heartbeat': 1 / HEARTBEAT_PERIOD, 'location': args.location_hz, 'path': args.path_hz,
+                 'object': args.object_hz, 'image': args.image_fps}
+        schedule = []
+        start = time.perf_counter()
+        for index, agent in enumerate(agents):
+            for kind, rate in rates.items():
+                if rate > 0:
+                    schedule.append((start + rng.uniform(0, 1 / rate), index, kind))
+        heapq.heapify(schedule)
+
+        cpu_start, _ = process_stats(bridge.pid)
+        peak_rss = 0.0
+        next_sample = start
+        next_churn = start + 1
+        sent = dict()
+        end = start + args.duration
+        while schedule and schedule[0][0] < end:
+            due, index, kind = heapq.heappop(schedule)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            agent = agents[index]
+            if agent.active:
+                if kind == 'heartbeat':
+                    agent.heartbeat()
+                elif kind == 'path':
+                    agent.path(args.path_points)
+                elif kind == 'object':
+                    agent.detected_object()
+                else:
+                    getattr(agent, kind)()
+                sent[kind] = sent.get(kind, 0) + 1
+            heapq.heappush(schedule, (due + 1 / rates[kind], index, kind))
+
+            now = time.perf_counter()
+            if now >= next_sample:
+                peak_rss = max(peak_rss, process_stats(bridge.pid)[1])
+                next_sample = now + 1
+            if args.churn and now >= next_churn:
+                # Some agents leave and others come back, once per second
+                for agent in rng.sample(agents, min(args.churn, len(agents))):
+                    if agent.active:
+                        agent.exit()
+                    else:
+                        agent.enter()
+                next_churn = now + 1
+        elapsed = time.perf_counter() - start
+        cpu_end, rss = process_stats(bridge.pid)
+
+        time.sleep(args.drain)  # Let the messages in flight arrive
+    finally:
+        bridge.send_signal(signal.SIGTERM)
+        try:
+            bridge.wait(10)
+        except subprocess.TimeoutExpired:
+            bridge.kill()
+        server.stop()
+
+    result = {'agents': agent_count, 'elapsed': elapsed, 'cpu_pct': 100 * (cpu_end - cpu_start) / elapsed,
+              'rss_mb': rss, 'peak_rss_mb': max(peak_rss, rss), 'unexpected': server.unexpected,
+              'log': log_path, 'kinds': dict()}
+    for kind in ('location', 'path', 'object', 'image'):
+        if not sent.get(kind):
+            continue
+        latencies = sorted(server.latencies.get(kind, []))
+        result['kinds'][kind] = {
+            'sent': sent[kind],
+            'delivered': len(latencies),
+            'per_second': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+        }
+    return result
+
+
+def run_bridge_child(args):
+    # Runs in the child process: the real bridge with the selected handlers
+    from bridge import Bridge, run_bridge
+    from dds_bridge import HANDLERS
+
+    names = [name.strip() for name in args.handlers.split(',') if name.strip()]
+    handler_classes = [handler for handler in HANDLERS if handler.name in names]
+    bridge = Bridge(os.environ['AGENT_ID'], handler_classes, server_url=args.server_url)
+    run_bridge(bridge)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agents', default='10,50,100', help='Comma separated agent counts to run')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load per agent count')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds for discovery before the load starts')
+    parser.add_argument('--drain', type=float, default=3, help='Seconds to wait for messages in flight')
+    parser.add_argument('--location-hz', type=float, default=10)
+    parser.add_argument('--path-hz', type=float, default=1)
+    parser.add_argument('--path-points', type=int, default=50)
+    parser.add_argument('--object-hz', type=float, default=0.5)
+    parser.add_argument('--image-fps', type=float, default=2)
+    parser.add_argument('--image-size', default='320x240')
+    parser.add_argument('--image-encoding', default='jpeg', choices=['jpeg', 'png', 'raw'])
+    parser.add_argument('--churn', type=int, default=0, help='Agents leaving or rejoining per second')
+    parser.add_argument('--handlers', default=DEFAULT_HANDLERS, help='Bridge handlers to run')
+    parser.add_argument('--domain', type=int, default=42, help='DDS domain, kept apart from the real one')
+    parser.add_argument('--shared-participant', action='store_true', help='One participant for all fake agents')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    parser.add_argument('--bridge-child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--server-url', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bridge_child:
+        run_bridge_child(args)
+        return
+
+    counts = [int(count) for count in args.agents.split(',')]
+    # This process's domain is created once, so size it for the largest run
+    config = loopback_config(args.domain, max(counts) + 16)
+    results = []
+    for count in counts:
+        result = run_scale(count, args, config)
+        results.append(result)
+
+        if args.json:
+            continue
+        print(f"{count} agents: bridge CPU {result['cpu_pct']:.0f}%, RSS {result['rss_mb']:.0f} MB "
+              f"(peak {result['peak_rss_mb']:.0f} MB), log {result['log']}")
+        for kind, stats in result['kinds'].items():
+            print(f"    {kind:9s} {stats['per_second']:8.1f}/s  delivered {stats['delivered']:6d}/{stats['sent']:<6d}  "
+                  f"p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+from cyclonedds.domain import DomainParticipant, DomainParticipantQos
+from cyclonedds.topic import Topic
+from cyclonedds.sub import Subscriber, DataReader
+from cyclonedds.pub import Publisher
+from cyclonedds.util import duration
+
+import abc
+import time
+import signal
+import threading
+import traceback
+import requests
+
+from transforms import RigidTransform2D
+from sample_utils import SampleCounter
+from tracing import tracer
+from fragmentation import FragmentListener, Reassembler
+from telemetry_writer import TelemetryWriter
+from readiness import StartupTimer, wait_for, graphql_ready, agent_registered
+from agent_membership import AgentListSubscription
+from message_defs import FragmentMessage, fragment_qos, get_ip
+
+AGENT_RESYNC_PERIOD = 30  # seconds, fallback in case a pushed change was missed
+TRANSFORM_MAX_AGE = 10    # seconds, older transforms are left over from an earlier run
+REGISTRATION_MAX_AGE = 10  # seconds, older entry/exit registrations are left over from an earlier run
+
+AGENT_REGISTRY_VERSION_QUERY = """
+                    query {
+                        agentRegistryVersion
+                    }
+               """
+
+AGENTS_QUERY = """
+                    query {
+                        subscribedAndExitedAgents {
+                            id
+                        }
+                    }
+               """
+
+TRANSFORM_QUERY =   """
+                        query {
+                            transform {
+                                R
+                                t
+                                timestamp
+                            }
+                        }
+                    """
+
+
+class BridgeHandler:
+    """
+    Base class for the handlers hosted by a Bridge.
+
+    Handlers are constructed with the bridge, and create their topics, readers and writers on the
+    bridge's shared participant. The bridge calls the hooks below; a handler only overrides the
+    ones it needs.
+
+    Attributes:
+        name (str): Short name of the handler, used on the command line.
+        uses_transform (bool): True if the handler needs the map transform before it starts.
+        uses_influx (bool): True if the handler writes telemetry to InfluxDB.
+    """
+    name = None
+    uses_transform = False
+    uses_influx = False
+
+    def __init__(self, bridge):
+        self.bridge = bridge
+
+    def setup(self):
+        """
+        Blocking initialization, run (in handler order) before any handler loop is started.
+        """
+        pass
+
+    def on_transform(self, transform):
+        """
+        Called when the bridge's transform cache is updated.
+
+        Args:
+            transform (RigidTransform2D): The transform from this agent's map to the reference map.
+        """
+        pass
+
+    def on_agents_changed(self, new_agents, old_agents):
+        """
+        Called by the bridge as soon as the set of subscribed agents changes.
+
+        Args:
+            new_agents (set): IDs of agents that joined.
+            old_agents (set): IDs of agents that left.
+        """
+        pass
+
+    def run(self):
+        """
+        Long-running loop. If a handler overrides this, the bridge runs it on its own thread.
+        """
+        pass
+
+    def get_sample_stats(self):
+        """
+        Returns:
+            SampleCounter: Counts of the samples taken by this handler's listeners, or None.
+        """
+        return None
+
+    def shutdown(self):
+        pass
+
+
+class AgentTopicHandler(BridgeHandler, abc.ABC):
+    """
+    Handler that keeps one DataReader per subscribed agent on the topic `<topic_prefix><agent_id>`.
+
+    Subclasses set `topic_prefix`, `data_type`, `qos` and `label`, and implement make_listener().
+
+    If `fragment_topic_prefix` is set, the handler also reads `<fragment_topic_prefix><agent_id>`,
+    reassembles the fragmented messages and passes them to the agent listener's handle_sample().
+    """
+    topic_prefix = None
+    data_type = None
+    qos = None
+    label = None
+    fragment_topic_prefix = None
+
+    def __init__(self, bridge):
+        super().__init__(bridge)
+        self.listeners = dict()
+        self.readers = dict()
+        self.fragment_listeners = dict()
+        self.fragment_readers = dict()
+        self.reassembler = Reassembler()
+
+    @abc.abstractmethod
+    def make_listener(self, agent_id):
+        """
+        Returns:
+            Listener: The listener of the agent's readers, with a handle_sample() for reassembled messages.
+        """
+
+    def on_transform(self, transform):
+        for listener in self.listeners.values():
+            listener.update_transformation(transform)
+
+    def get_sample_stats(self):
+        stats = SampleCounter()
+        for listener in list(self.listeners.values()) + list(self.fragment_listeners.values()):
+            stats.add(listener.sample_counter)
+        return stats
+
+    def on_agents_changed(self, new_agents, old_agents):
+        for agent_id in new_agents:
+            print(f"    Subscribed to agent {agent_id} {self.label}")
+            topic = self.bridge.get_topic(self.topic_prefix + str(agent_id), self.data_type)
+            self.listeners[agent_id] = self.make_listener(agent_id)
+            if self.bridge.transform is not None:
+                self.listeners[agent_id].update_transformation(self.bridge.transform)
+            self.readers[agent_id] = DataReader(self.bridge.subscriber, topic, listener=self.listeners[agent_id], qos=self.qos)
+
+            if self.fragment_topic_prefix is not None:
+                # A failure here must not cost the agent its primary reader, nor the agents after it
+                try:
+                    fragment_topic = self.bridge.get_topic(self.fragment_topic_prefix + str(agent_id), FragmentMessage)
+                    self.fragment_listeners[agent_id] = FragmentListener(self.listeners[agent_id].handle_sample, self.reassembler)
+                    self.fragment_readers[agent_id] = DataReader(self.bridge.subscriber, fragment_topic,
+                                                                 listener=self.fragment_listeners[agent_id], qos=fragment_qos)
+                except Exception as e:
+                    self.fragment_listeners.pop(agent_id, None)
+                    print(f"    Could not subscribe to agent {agent_id} {self.label} fragments: {e}")
+
+        for agent_id in old_agents:
+            if agent_id not in self.readers:
+                continue
+            print(f"    Unsubscribed from agent {agent_id} {self.label}")
+            self.readers.pop(agent_id)
+            self.listeners.pop(agent_id)
+            self.fragment_readers.pop(agent_id, None)
+            self.fragment_listeners.pop(agent_id, None)
+
+
+class Bridge:
+    """
+    Hosts several DDS handlers in one process, sharing a single DomainParticipant, a single
+    agent-membership view and a single transform cache.
+
+    Agent list changes are pushed to the bridge, either directly by the handler that wrote the
+    list (entry/exit, heartbeat subscriber) or by the GraphQL server's `agentsChanged`
+    subscription when the writer runs in another process. A slow resync poll is the fallback.
+
+    Attributes:
+        my_id (str): The ID of this agent.
+        my_ip (str): The IP address of this agent.
+        graphql_server (str): The GraphQL endpoint.
+        participant (DomainParticipant): The shared participant.
+        subscriber (Subscriber): The shared subscriber.
+        publisher (Publisher): The shared publisher.
+        transform (RigidTransform2D): The cached transform to the reference map, or None.
+        telemetry_writer (TelemetryWriter): Shared InfluxDB writer, or None.
+        agents (set): IDs of all agents in the environment, including this one.
+        exited_agents (set): IDs of agents that have exited the environment.
+        subscribed_agents (set): IDs of the agents handlers are currently subscribed to.
+        handlers (list): The handler instances, in start order.
+        wait_for_setup (bool): True if start() waits for this agent's entry/exit setup, which
+            runs in another process.
+        startup_timer (StartupTimer): Duration of each startup phase.
+    """
+
+    def __init__(self, my_id, handler_classes, server_url=None, influx_client=None, wait_for_setup=False):
+        self.startup_timer = StartupTimer('bridge')
+        self.my_id = my_id
+        self.my_ip = get_ip()
+        self.wait_for_setup = wait_for_setup
+
+        # GraphQL server URL
+        if server_url is None:
+            self.graphql_server = f"http://{self.my_ip}:8000/graphql"
+        else:
+            self.graphql_server = server_url
+
+        self.lease_duration_ms = 30000
+        qos_profile = DomainParticipantQos()
+        qos_profile.lease_duration = duration(milliseconds=self.lease_duration_ms)
+
+        # Create the DomainParticipant, Subscriber, and Publisher shared by all handlers
+        self.participant = DomainParticipant(qos=qos_profile)
+        self.subscriber = Subscriber(self.participant)
+        self.publisher = Publisher(self.participant)
+        self.topics = dict()
+        self.topics_lock = threading.Lock()
+
+        self.telemetry_writer = None
+        if influx_client is not None:
+            self.telemetry_writer = TelemetryWriter(influx_client)
+
+        self.transform = None
+        self.agents = set()
+        self.exited_agents = set()
+        self.subscribed_agents = set()
+        self.agents_lock = threading.RLock()
+        self.registry_version = None  # Agent registry version of the last resync
+        self.agent_subscription = AgentListSubscription(self)
+        self.threads = []
+
+        # Handlers talk to the GraphQL server from their constructors
+        with self.startup_timer.phase('graphql'):
+            wait_for(lambda: graphql_ready(self.graphql_server), 'the GraphQL server')
+
+        with self.startup_timer.phase('handlers'):
+            self.handlers = [handler_class(self) for handler_class in handler_classes]
+
+    def get_topic(self, name, data_type):
+        """
+        Returns the topic with the given name, creating it on first use.
+        """
+        with self.topics_lock:
+            if name not in self.topics:
+                self.topics[name] = Topic(self.participant, name, data_type)
+            return self.topics[name]
+
+    def set_transform(self, transform):
+        """
+        Updates the transform cache and pushes it to every handler.
+
+        Args:
+            transform (RigidTransform2D): The new transform.
+        """
+        self.transform = transform
+        for handler in self.handlers:
+            handler.on_transform(transform)
+
+    def start(self):
+        """
+        Runs every handler's setup, fills the transform cache and the agent list, then starts the
+        handler loops on their own threads. Each step starts as soon as what it depends on is ready.
+        """
+        timer = self.startup_timer
+        if self.wait_for_setup:
+            with timer.phase('entry'):
+                since = time.time() - REGISTRATION_MAX_AGE
+                wait_for(lambda: agent_registered(self.graphql_server, self.my_id, since), 'entry/exit setup', timeout=None)
+
+        for handler in self.handlers:
+            with timer.phase(f'setup {handler.name}'):
+                handler.setup()
+
+        # A handler in this process may already have published the transform (entry/exit)
+        if self.transform is None and any(handler.uses_transform for handler in self.handlers):
+            with timer.phase('transform'):
+                self.set_transform(self.fetch_transform())
+
+        with timer.phase('agents'):
+            self.set_agents(*self.get_agents())
+        self.agent_subscription.start()
+
+        for handler in self.handlers:
+            if type(handler).run is not BridgeHandler.run:
+                thread = threading.Thread(target=self._run_handler, args=(handler,), name=handler.name, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+        timer.report()
+
+    def _run_handler(self, handler):
+        try:
+            handler.run()
+        except Exception:
+            print(f"Handler '{handler.name}' stopped with an error:")
+            traceback.print_exc()
+
+    def run(self):
+        """
+        Resyncs the agent lists periodically, in case a pushed change was missed. The lists are
+        only queried when the agent registry version moved since the last resync.
+        """
+        while True:
+            time.sleep(AGENT_RESYNC_PERIOD)
+
+            try:
+                version = self.get_registry_version()
+                if version is not None and version == self.registry_version:
+                    continue
+                self.set_agents(*self.get_agents())
+                self.registry_version = version
+            except Exception as e:
+                pass
+
+    def set_agents(self, agents, exited_agents=None):
+        """
+        Applies new agent lists and notifies the handlers of any agent that joined or left.
+        Called by the handlers that write the lists, by the server subscription and by the resync poll.
+
+        Args:
+            agents (iterable): IDs of all agents in the environment.
+            exited_agents (iterable): IDs of agents that have exited, or None to leave them unchanged.
+        """
+        with self.agents_lock:
+            # -1 marks a cleared list
+            self.agents = set(int(agent_id) for agent_id in agents) - {-1}
+            if exited_agents is not None:
+                self.exited_agents = set(int(agent_id) for agent_id in exited_agents) - {-1}
+
+            agents_to_subscribe = self.agents - {int(self.my_id)}
+            new_agents = agents_to_subscribe - self.subscribed_agents
+            old_agents = self.subscribed_agents - agents_to_subscribe
+            self.subscribed_agents = agents_to_subscribe
+
+            if new_agents or old_agents:
+                for handler in self.handlers:
+                    try:
+                        handler.on_agents_changed(new_agents, old_agents)
+                    except Exception as e:
+                        print(f"Handler '{handler.name}' failed to update agents: {e}")
+
+    def get_registry_version(self):
+        """
+        Returns:
+            int: The version of the agent registry, or None if the query failed.
+        """
+        response = requests.post(self.graphql_server, json={'query': AGENT_REGISTRY_VERSION_QUERY}, timeout=1)
+        if response.status_code == 200:
+            return (response.json().get('data') or {}).get('agentRegistryVersion')
+        return None
+
+    def get_agents(self):
+        """
+        Queries the GraphQL server for the agent lists.
+
+        Returns:
+            tuple: (subscribed agent ids, exited agent ids)
+        """
+        response = requests.post(self.graphql_server, json={'query': AGENTS_QUERY}, timeout=1)
+        if response.status_code == 200:
+            data = response.json()
+
+            # Get the agent ids from the response
+            agent_lists = data.get('data', {}).get('subscribedAndExitedAgents', [])
+            if len(agent_lists) == 2:
+                return agent_lists[0].get('id') or [], agent_lists[1].get('id') or []
+
+        return self.agents, self.exited_agents
+
+    def fetch_transform(self):
+        """
+        Queries the GraphQL server until a valid transform is available. A transform written more
+        than TRANSFORM_MAX_AGE seconds before the wait started (by an earlier run) is ignored.
+
+        Returns:
+            RigidTransform2D: The transform to the reference map.
+        """
+        oldest = time.time() - TRANSFORM_MAX_AGE
+
+        def query_transform():
+            response = requests.post(self.graphql_server, json={'query': TRANSFORM_QUERY}, timeout=1)
+            transform = response.json().get('data', {}).get('transform') or {}
+            if (transform.get('timestamp') or 0) < oldest:
+                return None
+            return RigidTransform2D.from_graphql(transform)
+
+        return wait_for(query_transform, 'the transform', timeout=None)
+
+    def shutdown(self):
+        self.agent_subscription.stop()
+
+        for handler in self.handlers:
+            try:
+                handler.shutdown()
+            except Exception as e:
+                print(f"Error shutting down '{handler.name}': {e}")
+
+            stats = handler.get_sample_stats()
+            if stats is not None:
+                print(f"Samples ({handler.name}): {stats.as_dict()}")
+
+        trace = tracer.get_metrics()
+        if trace:
+            print(f"Latency per stage: {trace}")
+
+        if self.telemetry_writer is not None:
+            self.telemetry_writer.close()
+            print(f"Telemetry: {self.telemetry_writer.get_metrics()}")
+
+
+def run_bridge(bridge):
+    """
+    Starts the bridge and runs its membership loop until SIGTERM or Ctrl+C.
+    """
+    def handle_signal(sig, frame):
+        bridge.shutdown()
+        exit(0)
+
+    # Set up signal handlers for SIGINT (Ctrl+C) and SIGTERM
+    signal.signal(signal.SIGTERM, handle_signal) # Handles termination signal
+
+    try:
+        bridge.start()
+        bridge.run()
+    except KeyboardInterrupt:
+        bridge.shutdown()
+        print('Exiting...')
+        exit(0)
@@ -0,0 +1,71 @@
+"""
+Runs the DDS bridge handlers in a single process sharing one DomainParticipant.
+
+By default every handler runs in this process. To split the work across processes (for example
+when image handling saturates a core), start several bridges with disjoint handler lists:
+
+    python3 dds_bridge.py --handlers entry_exit,heartbeat_publisher,heartbeat_subscriber,goal,location,data
+    python3 dds_bridge.py --handlers image
+"""
+import os
+import time
+import argparse
+
+import influxdb_client
+
+from bridge import Bridge, run_bridge
+from entry_exit import EntryExitCommunication
+from heartbeat_publisher import HeartbeatPublisher
+from heartbeat_subscriber import HeartbeatSubscriber
+from goal_publisher import GoalWriter
+from location_subscriber import LocationSubscriber
+from data_subscriber import DataSubscriber
+from image_subscriber import ImageSubscriber
+
+# Handlers in start order, entry/exit first since its setup publishes the transform
+HANDLERS = [
+    EntryExitCommunication,
+    HeartbeatPublisher,
+    HeartbeatSubscriber,
+    GoalWriter,
+    LocationSubscriber,
+    DataSubscriber,
+    ImageSubscriber,
+]
+HANDLER_NAMES = [handler.name for handler in HANDLERS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--handlers', default=','.join(HANDLER_NAMES),
+                        help='Comma separated list of handlers to run, from: ' + ', '.join(HANDLER_NAMES))
+    parser.add_argument('--server-url', default=None, help='GraphQL endpoint (default: http://<my ip>:8000/graphql)')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.handlers.split(',') if name.strip()]
+    unknown = set(names) - set(HANDLER_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown handlers: {', '.join(sorted(unknown))}")
+    handler_classes = [handler for handler in HANDLERS if handler.name in names]
+
+    agent_id = os.getenv('AGENT_ID')
+    if agent_id is None:
+        raise ValueError("AGENT_ID environment variable not set")
+
+    influx_client = None
+    if any(handler.uses_influx for handler in handler_classes):
+        token = os.environ.get("INFLUXDB_TOKEN")
+        if token is None:
+            raise ValueError("INFLUXDB_TOKEN environment variable not set")
+        org = "eig"
+        url = "http://localhost:8086"
+        influx_client = influxdb_client.InfluxDBClient(url=url, token=token, org=org)
+
+    # Without the entry/exit handler, wait for the process running it to do entry and initialization
+    bridge = Bridge(agent_id, handler_classes, server_url=args.server_url, influx_client=influx_client,
+                    wait_for_setup=EntryExitCommunication not in handler_classes)
+    run_bridge(bridge)
+
+
+if __name__ == '__main__':
+    main()
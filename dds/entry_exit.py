@@ -6,33 +6,47 @@ from cyclonedds.util import duration
 from cyclonedds.idl import IdlStruct
 from cyclonedds.idl.types import sequence
 from cyclonedds.core import Qos, Policy, Listener
-from cyclonedds.builtin import BuiltinDataReader, BuiltinTopicDcpsParticipant
+from cyclonedds.builtin import BuiltinDataReader, BuiltinTopicDcpsParticipant, BuiltinTopicDcpsSubscription
 
 import time
 import os
-import hashlib
 import socket
 import json
 import requests
 import numpy as np
 import signal
+import threading
 import base64
 
 from ros_messages import Header, Origin, Position, Quaternion, MapMetaData, OccupancyGrid, msg_to_dict
-from message_defs import Heartbeat, EntryExit, Initialization, reliable_qos, best_effort_qos, get_ip
+from bridge import Bridge, BridgeHandler, run_bridge
+from transforms import RigidTransform2D
+from sample_utils import SampleCounter, take_samples
+from agent_registry import AgentRegistryWriter
+from readiness import wait_for
+from hash_ring import HashRing, agent_hash
+from fragmentation import FragmentListener, FragmentWriter, FRAGMENT_SIZE
+from message_defs import Heartbeat, EntryExit, Initialization, reliable_qos, best_effort_qos, FragmentMessage, fragment_qos, get_ip, encode_json_field, decode_json_field
 
 # Constants (Set depending on the agent)
 HEARTBEAT_PERIOD = 10    # seconds
 HEARTBEAT_TIMEOUT = 31  # seconds
 AGENT_TYPE = 'human'
-
-AGENTS_QUERY =  """
-                    query {
-                        subscribed_agents {
-                            id
-                        }
-                    }
-                """ 
+# Compress the Initialization payload. Only for fleets whose agents all decode it (this version on)
+INIT_PAYLOAD_COMPRESS = os.getenv('INIT_PAYLOAD_COMPRESS', '0') == '1'
+ENTRY_BACKUP_DELAY = 3       # seconds an entering agent waits before the backup responder answers
+ENTRY_REQUEST_TIMEOUT = 30   # seconds after which an entry request counts as a new attempt
+
+# Entry handshake: the entry request is repeated at growing intervals until an Initialization
+# arrives. Without any other agent discovered after ENTRY_DISCOVERY_GRACE, this agent is the first.
+# The grace period is kept at least ENTRY_SPDP_ROUNDS participant announcements long, so an agent
+# on a loaded network is not missed and two agents cannot both decide they are alone.
+ENTRY_PROBE_INITIAL = 0.25   # seconds before the first repeat
+ENTRY_PROBE_MAX = 2.0        # seconds between repeats, at most
+ENTRY_SPDP_INTERVAL = float(os.getenv('ENTRY_SPDP_INTERVAL', '1.0'))  # seconds, Discovery/SPDPInterval of the CycloneDDS config
+ENTRY_SPDP_ROUNDS = 3
+ENTRY_DISCOVERY_GRACE = max(float(os.getenv('ENTRY_DISCOVERY_GRACE', '3.0')), ENTRY_SPDP_ROUNDS * ENTRY_SPDP_INTERVAL)  # seconds
+ENTRY_TIMEOUT = max(10, 2 * ENTRY_DISCOVERY_GRACE)  # seconds to wait for an Initialization when other agents are discovered
 
 TRANSFORM_MUTATION =   """
                             mutation($R: [Float]!, $t: [Float]!, $timestamp: Float!) {
@@ -70,24 +84,28 @@ class EntryExitListener(Listener):
     - my_ip (str): The IP address of the current agent.
     - my_hash (int): The hash value of the current agent.
     - init_writer (Writer): The writer for sending initialization messages.
+    - init_fragment_writer (FragmentWriter): The writer for initialization messages larger than FRAGMENT_SIZE.
     - agents (dict): Dictionary of active agents in the environment.
     - exited_agents (dict): Dictionary of agents that have exited the environment.
     - lost_agents (dict): Dictionary of agents that have been lost.
     - map_msg (OccupancyGrid): The occupancy grid map message.
     - map_md_msg (MapMetaData): The map metadata message.
     - update_to_agents (bool): Flag indicating if there are updates to be sent to agents.
+    - ring (HashRing): Hashes of the active agents, to choose the agent answering an entry request.
+    - enter_requests (dict): Time of the first pending entry request of each entering agent.
 
     Methods:
     - on_data_available(reader): Callback method for handling incoming data.
-    - find_if_closest_robot(robot_hash): Determines if the given robot is the closest robot to the current agent.
+    - find_if_closest_robot(agent_id): Determines if the current agent should answer the given agent's entry request.
     - agent_update_available(): Checks if there are updates to be sent to agents.
     - get_agents(): Retrieves the active agents, exited agents, and lost agents.
     - update_agents(agents): Updates the active agents.
     - update_map(map, map_md): Updates the occupancy grid map and map metadata.
     """
 
-    def __init__(self, participant, publisher, subscriber, my_id, my_ip, my_hash, init_writer):
+    def __init__(self, participant, publisher, subscriber, my_id, my_ip, my_hash, init_writer, init_fragment_writer=None):
         super().__init__()
+        self.sample_counter = SampleCounter()
         self.participant = participant
         self.publisher = publisher
         self.subscriber = subscriber
@@ -108,9 +126,19 @@ class EntryExitListener(Listener):
         self.map_md_msg = MapMetaData()
         self.known_points = []
         self.init_writer = init_writer
+        self.init_fragment_writer = init_fragment_writer
 
         self.update_to_agents = False
 
+        self.ring = HashRing([my_id])
+        self.enter_requests = dict()
+        self.setup_complete = False
+        self.entering_peers = dict()  # agent_id -> participant key, of agents seen entering during our setup
+
+        # Serialized (agents, known_points) of the Initialization message, None when outdated
+        self.init_payload = None
+        self.init_payload_builds = 0
+
     def on_data_available(self, reader):
         """
         Callback method for handling incoming data.
@@ -121,7 +149,7 @@ class EntryExitListener(Listener):
         Returns:
         - None
         """
-        for sample in reader.read():
+        for sample in take_samples(reader, self.sample_counter):
 
             # Skip messages from self
             if sample.agent_id == int(self.my_id):
@@ -129,19 +157,27 @@ class EntryExitListener(Listener):
 
             # Determine what type of message was received
             if sample.action == 'enter':
-                new_robot_hash = hash_func(str(sample.agent_id))
+                # Two agents entering together: only the lower ID answers, so both end up with its
+                # reference points, which become the reference if it finds itself first
+                if not self.setup_complete:
+                    self.entering_peers[sample.agent_id] = writer_participant(reader, sample)
+                    if sample.agent_id < int(self.my_id):
+                        continue
+
                 # If the new agent is the closest robot, send an initialization message
                 # The initalization message contains the map, map metadata, and all agents in the environment
-                if self.find_if_closest_robot(new_robot_hash):
+                if self.find_if_closest_robot(sample.agent_id):
                     print(f'Agent {sample.agent_id} of type \'{sample.agent_type}\' is requesting entry')
 
-                    # Message containing details of all active agents
-                    agents_message = json.dumps(self.agents)
-
-                    known_points_json = json.dumps(self.known_points)
+                    # Details of all active agents and the known points, serialized once until they change
+                    agents_message, known_points_json = self.get_init_payload()
 
                     init_message = Initialization(target_agent=sample.agent_id, sending_agent=int(self.my_id), agents=agents_message, known_points=known_points_json)
-                    self.init_writer.write(init_message)
+                    # Large fleets or maps make a message too large to send whole on a lossy link
+                    if self.init_fragment_writer is not None and len(agents_message) + len(known_points_json) > FRAGMENT_SIZE:
+                        self.init_fragment_writer.write(init_message)
+                    else:
+                        self.init_writer.write(init_message)
 
                     # print("Sent initialization message to new agent")
             elif sample.action == "initialized":
@@ -158,6 +194,10 @@ class EntryExitListener(Listener):
                         'timestamp': sample.timestamp
                     }  
 
+                    self.ring.add(sample.agent_id)
+                    self.enter_requests.pop(sample.agent_id, None)
+                    self.init_payload = None
+
                     # Remove from exited agents if it exists
                     if sample.agent_id in self.exited_agents:
                         self.exited_agents.pop(sample.agent_id)
@@ -168,32 +208,57 @@ class EntryExitListener(Listener):
                 if sample.agent_id in self.agents:
                     print(f'Agent {sample.agent_id} exited the environment')
                     self.agents.pop(sample.agent_id)  # Pop from agents dictionary
+                    self.ring.remove(sample.agent_id)
+                    self.init_payload = None
                     self.exited_agents[sample.agent_id] = int(time.time())  # Add to exited agents dictionary
                     self.update_to_agents = True
 
-    def find_if_closest_robot(self, robot_hash):
+    def find_if_closest_robot(self, agent_id):
         """
-        Finds if the given robot is the closest robot to the current agent.
-        The closest robot is the robot that has the smallest difference in hash value
+        Finds if the current agent should answer the entry request of the given agent.
+
+        The responder is the agent whose hash is closest to the new agent's hash. The next
+        closest agent is a backup: it answers too if the new agent repeats its request after
+        ENTRY_BACKUP_DELAY seconds, in case the responder is slow or gone.
 
         Parameters:
-        - robot_hash (int): The hash value of the robot.
+        - agent_id (int): The ID of the agent requesting entry.
 
         Returns:
-        - bool: True if the given robot is the closest robot, False otherwise.
+        - bool: True if the current agent should send the initialization message, False otherwise.
         """
-        my_distance = abs(self.my_hash - robot_hash)
+        now = time.time()
+        first_request = self.enter_requests.get(agent_id)
+        if first_request is None or now - first_request > ENTRY_REQUEST_TIMEOUT:
+            first_request = self.enter_requests[agent_id] = now
 
-        for agent_id, agent_info in self.agents.items():
-            agent_hash = agent_info['hash']
+        responders = self.ring.responders(agent_id, count=2)
+        if not responders or responders[0] == int(self.my_id):
+            return True
 
-            distance = abs(agent_hash - robot_hash)
-            if distance < my_distance and distance != 0:
-                print("I will not provide initialization.")
-                return False
+        if len(responders) > 1 and responders[1] == int(self.my_id) and now - first_request >= ENTRY_BACKUP_DELAY:
+            print(f"Agent {responders[0]} has not initialized agent {agent_id}, answering as backup.")
+            return True
 
-        # print('I will provide initialization.')
-        return True
+        print("I will not provide initialization.")
+        return False
+
+    def get_init_payload(self):
+        """
+        Returns the serialized agents and known points of the Initialization message. They are
+        only serialized again after the agents or the known points changed, so a burst of entry
+        requests costs one serialization.
+
+        Returns:
+        - tuple: (agents, known_points) strings, compressed if INIT_PAYLOAD_COMPRESS is set.
+        """
+        payload = self.init_payload
+        if payload is None:
+            payload = (encode_json_field(self.agents, INIT_PAYLOAD_COMPRESS),
+                       encode_json_field(self.known_points, INIT_PAYLOAD_COMPRESS))
+            self.init_payload = payload
+            self.init_payload_builds += 1
+        return payload
 
     def agent_update_available(self):
         """
@@ -228,6 +293,8 @@ class EntryExitListener(Listener):
         """
         if agents is not None:
             self.agents = agents
+            self.ring.sync(list(agents.keys()) + [int(self.my_id)])
+            self.init_payload = None
 
     def update_known_points(self, known_points):
         """
@@ -240,6 +307,7 @@ class EntryExitListener(Listener):
         - None
         """
         self.known_points = known_points
+        self.init_payload = None
 
 
 class InitializationListener(Listener):
@@ -258,6 +326,7 @@ class InitializationListener(Listener):
 
     def __init__(self, my_id):
         super().__init__()
+        self.sample_counter = SampleCounter()
         self.map_received = False
         self.map_msg = OccupancyGrid()
         self.map_mod_msg = OccupancyGrid()
@@ -266,6 +335,8 @@ class InitializationListener(Listener):
         self.my_id = my_id
         self.known_points_received = False
         self.reference_known_points = []
+        self.received = threading.Event()  # Set once the first valid initialization arrived
+        self.lock = threading.Lock()  # Whole and reassembled messages arrive on different readers
 
     def on_data_available(self, init_reader):
         """
@@ -274,39 +345,59 @@ class InitializationListener(Listener):
         Args:
             init_reader: Reader object for reading initialization data.
         """
-        for sample in init_reader.read():
-
-            sending_agent = sample.sending_agent
-            if sending_agent == int(self.my_id):
-                continue
-
-            print(f'Initialization message received from agent {sending_agent}')
-
-            if sample.target_agent != int(self.my_id):
-                continue
-
-            agent_dict = json.loads(sample.agents)
-            if len(agent_dict) > 0:
-                # Cycle through agents in the initialization message and insert into our agents dictionary
-                for agent_id, agent_info in agent_dict.items():
-                    if agent_id != self.my_id:
-                        agent_type = agent_info['agent_type']
-                        ip_address = agent_info['ip_address']
-                        agent_hash = agent_info['hash']
-                        timestamp = agent_info['timestamp']
-                        self.agents[int(agent_id)] = {
-                            'agent_type': agent_type,
-                            'ip_address': ip_address,
-                            'hash': agent_hash,
-                            'timestamp': timestamp
-                        }
+        for sample in take_samples(init_reader, self.sample_counter):
+            self.handle_sample(sample)
+
+    def handle_sample(self, sample):
+        """
+        Handles one Initialization message, received whole or reassembled from fragments.
+        """
+        with self.lock:
+            self._handle_initialization(sample)
+
+    def _handle_initialization(self, sample):
+        sending_agent = sample.sending_agent
+        if sending_agent == int(self.my_id):
+            return
+
+        print(f'Initialization message received from agent {sending_agent}')
+
+        if sample.target_agent != int(self.my_id):
+            return
+
+        # Several responders may answer (backup, simultaneous entries), the first valid one wins
+        if self.known_points_received:
+            return
+        try:
+            agent_dict = decode_json_field(sample.agents)
+            known_points = decode_json_field(sample.known_points)
+        except ValueError as e:
+            print(f'Invalid initialization message from agent {sending_agent}: {e}')
+            return
+        if not known_points:
+            return
+
+        if len(agent_dict) > 0:
+            # Cycle through agents in the initialization message and insert into our agents dictionary
+            for agent_id, agent_info in agent_dict.items():
+                if agent_id != self.my_id:
+                    agent_type = agent_info['agent_type']
+                    ip_address = agent_info['ip_address']
+                    agent_hash = agent_info['hash']
+                    timestamp = agent_info['timestamp']
+                    self.agents[int(agent_id)] = {
+                        'agent_type': agent_type,
+                        'ip_address': ip_address,
+                        'hash': agent_hash,
+                        'timestamp': timestamp
+                    }
 
-            # Load the known points from the initialization message
-            known_points = json.loads(sample.known_points)
-            self.reference_known_points = known_points
-            self.known_points_received = True
+        # Load the known points from the initialization message
+        self.reference_known_points = known_points
+        self.known_points_received = True
+        self.received.set()
 
-            print("Reference points received through initialization message")
+        print("Reference points received through initialization message")
 
     def map_available(self):
         """
@@ -353,9 +444,19 @@ class InitializationListener(Listener):
         """
         return self.agents
 
+def writer_participant(reader, sample):
+    """
+    Returns the participant key of the writer of a sample, or None if it is not known.
+    """
+    try:
+        return reader.get_matched_publication_data(sample.sample_info.publication_handle).participant_key
+    except Exception as e:
+        return None
+
+
 def hash_func(robot_id):
     """
-    Hashes the given robot ID using SHA-256 algorithm.
+    Hashes the given robot ID using SHA-256 algorithm. Memoized, see hash_ring.agent_hash.
 
     Parameters:
     robot_id (str): The robot ID to be hashed.
@@ -364,19 +465,25 @@ def hash_func(robot_id):
     int: The hashed robot ID as an integer.
 
     """
-    return int(hashlib.sha256(robot_id.encode()).hexdigest(), 16)
+    return agent_hash(robot_id)
 
-class EntryExitCommunication:
+class EntryExitCommunication(BridgeHandler):
+    """
+    Bridge handler for the entry/exit protocol. Its setup publishes the map and the transform,
+    so it runs before the other handlers in the same bridge.
+    """
+    name = 'entry_exit'
 
-    def __init__(self, agent_id, server_url=None):
+    def __init__(self, bridge):
+        super().__init__(bridge)
 
         # Get agent ID, Hash, and IP Address
-        self.my_id = agent_id
+        self.my_id = bridge.my_id
         print(f"\nMy Agent ID is {self.my_id}")
         self.my_hash = hash_func(self.my_id)
 
         # Get IP Address
-        self.my_ip = get_ip()
+        self.my_ip = bridge.my_ip
         print(f"My IP address is {self.my_ip}\n")
 
         # Dictionary to store agents in the environment
@@ -387,36 +494,33 @@ class EntryExitCommunication:
         self.map_mod_msg = OccupancyGrid()
         self.map_md_msg = MapMetaData()
 
-        self.lease_duration_ms = 30000
-        qos_profile = DomainParticipantQos()
-        qos_profile.lease_duration = duration(milliseconds=self.lease_duration_ms)
-
-        # Create a DomainParticipant, Subscriber, and Publisher
-        self.participant = DomainParticipant(qos=qos_profile)
-        self.subscriber = Subscriber(self.participant)
-        self.publisher = Publisher(self.participant)
+        # Use the bridge's shared DomainParticipant, Subscriber, and Publisher
+        self.participant = bridge.participant
+        self.subscriber = bridge.subscriber
+        self.publisher = bridge.publisher
 
         # Create the topics needed
-        self.entry_exit_topic = Topic(self.participant, 'EntryExitTopic', EntryExit)
-        self.init_topic = Topic(self.participant, 'InitializationTopic', Initialization)
+        self.entry_exit_topic = bridge.get_topic('EntryExitTopic', EntryExit)
+        self.init_topic = bridge.get_topic('InitializationTopic', Initialization)
+        self.init_fragment_topic = bridge.get_topic('InitializationFragmentTopic', FragmentMessage)
 
         # Create the DataWriters and DataReaders
         self.enter_exit_writer = DataWriter(self.publisher, self.entry_exit_topic, qos=reliable_qos)
         self.init_writer = DataWriter(self.publisher, self.init_topic, qos=reliable_qos)
+        self.init_fragment_writer = FragmentWriter(self.publisher, self.init_fragment_topic, self.my_id)
 
         self.entry_exit_listener = EntryExitListener(self.participant, self.publisher, self.subscriber, self.my_id,
-                                                     self.my_ip, self.my_hash, self.init_writer)
+                                                     self.my_ip, self.my_hash, self.init_writer, self.init_fragment_writer)
         self.init_listener = InitializationListener(self.my_id)
 
         # We will start the readers later when it is necessary
         self.enter_exit_reader = None
         self.init_reader = None
+        self.init_fragment_reader = None
 
         # GraphQL server URL
-        if server_url is None:
-            self.graphql_server =  f"http://{self.my_ip}:8000/graphql" 
-        else:
-            self.graphql_server = server_url
+        self.graphql_server = bridge.graphql_server
+        self.registry_writer = AgentRegistryWriter(self.graphql_server)
 
         self.last_time = int(time.time())
 
@@ -476,20 +580,10 @@ class EntryExitCommunication:
         self.enter_exit_reader = DataReader(self.subscriber, self.entry_exit_topic,
                                                 listener=self.entry_exit_listener, qos=reliable_qos)
         self.init_reader = DataReader(self.subscriber, self.init_topic, listener=self.init_listener, qos=reliable_qos)
+        self.init_fragment_reader = DataReader(self.subscriber, self.init_fragment_topic,
+                                               listener=FragmentListener(self.init_listener.handle_sample), qos=fragment_qos)
 
-        # Broadcast an entry message
-        entry_message = EntryExit(int(self.my_id), AGENT_TYPE, 'enter', self.my_ip, int(time.time()))
-        self.enter_exit_writer.write(entry_message)
-
-        # Wait for the reference points to become available
-        num_tries = 0
-        while not self.init_listener.known_points_available() and num_tries < 10:
-            print("    Reference Points not yet received (attempt {0}/10)".format(num_tries+1))
-            time.sleep(1)
-            if not self.init_listener.known_points_available():
-                entry_message.timestamp = int(time.time())
-                self.enter_exit_writer.write(entry_message)
-                num_tries += 1
+        self.entry_handshake()
 
         if self.init_listener.known_points_available():
             print("    I am not the first agent, received reference points")
@@ -521,14 +615,24 @@ class EntryExitCommunication:
 
         self.create_transform()  # Create the transform from the known points
 
+        # Share the transform with the other handlers in this bridge
+        self.bridge.set_transform(self.transform)
+
         # Update the entry/exit listener with the known points
         self.entry_exit_listener.update_known_points(self.reference_known_points)
 
         # Update the agents in the entry/exit listener
         self.entry_exit_listener.update_agents(agents=self.agents)  
 
+        # Register in the agent list right away: handlers in other processes wait for it to start.
+        # The entry is stamped with this run's time, so they do not start on one left by an earlier run
+        self.update_agents()
+        wait_for(lambda: self.registry_writer.register(self.my_id, time.time()), 'the agent registration')
+        self.entry_exit_listener.setup_complete = True
+
         # Start the heartbeat reader now that we have the reference points, stop listening for initialization messages
         self.init_reader = None
+        self.init_fragment_reader = None
         self.init_listener = None
 
         # Send confirmation message to entry_exit topic
@@ -561,6 +665,73 @@ class EntryExitCommunication:
 
         print("    Map loaded from user_map.json")
 
+    def entry_handshake(self):
+        """
+        Broadcasts entry requests until an Initialization message arrives or this agent finds it
+        is the first one.
+
+        Requests are repeated at growing intervals (ENTRY_PROBE_INITIAL doubling up to
+        ENTRY_PROBE_MAX), and the first valid Initialization from any responder ends the wait
+        right away. Other agents are found through DDS discovery of their entry/exit readers: if
+        none is discovered within ENTRY_DISCOVERY_GRACE, this agent is the first; otherwise it
+        waits up to ENTRY_TIMEOUT.
+
+        When the only agents discovered are entering at the same time, the one with the lowest ID
+        goes first and answers the others, so it does not wait for ENTRY_TIMEOUT.
+
+        Returns:
+            bool: True if an Initialization message was received.
+        """
+        subscription_reader = BuiltinDataReader(self.participant, BuiltinTopicDcpsSubscription)
+        my_key = self.participant.guid
+        peers = set()
+        entering = self.entry_exit_listener.entering_peers
+
+        try:
+            start = time.monotonic()
+            delay = ENTRY_PROBE_INITIAL
+            attempt = 0
+            entry_message = EntryExit(int(self.my_id), AGENT_TYPE, 'enter', self.my_ip, int(time.time()))
+            while True:
+                attempt += 1
+                entry_message.timestamp = int(time.time())
+                self.enter_exit_writer.write(entry_message)
+
+                # Until an agent that is already set up is discovered, decide as soon as the grace period is over
+                wait = delay
+                if not peers - set(entering.values()):
+                    wait = min(delay, max(ENTRY_DISCOVERY_GRACE - (time.monotonic() - start), 0.05))
+                if self.init_listener.received.wait(wait):
+                    break
+
+                # Other participants reading entry requests or initializations
+                for sample in subscription_reader.take(N=64):
+                    if sample.sample_info.valid_data and sample.participant_key != my_key and \
+                            sample.topic_name in ('EntryExitTopic', 'InitializationTopic'):
+                        peers.add(sample.participant_key)
+
+                elapsed = time.monotonic() - start
+                established = peers - set(entering.values())
+                if not established and elapsed >= ENTRY_DISCOVERY_GRACE:
+                    if not peers:
+                        print(f"    No other agent discovered after {elapsed:.2f} s")
+                        break
+                    if all(agent_id > int(self.my_id) for agent_id in entering):
+                        print(f"    Agents {sorted(entering)} are entering too, this agent has the lowest ID and goes first")
+                        break
+                if elapsed >= ENTRY_TIMEOUT:
+                    print(f"    {len(peers)} agents discovered but none answered in {elapsed:.0f} s")
+                    break
+
+                print(f"    Reference points not yet received (attempt {attempt}, {len(peers)} agents discovered)")
+                delay = min(delay * 2, ENTRY_PROBE_MAX)
+        finally:
+            # Builtin readers otherwise live as long as the participant. The Python API has no
+            # public delete, __del__ deletes the DDS entity (and is a no-op if called again).
+            subscription_reader.__del__()
+
+        return self.init_listener.known_points_available()
+
     def create_transform(self):
         """
         Determines the transform from my map to the reference map
@@ -596,6 +767,8 @@ class EntryExitCommunication:
             self.R = R
             self.t = t
 
+        self.transform = RigidTransform2D(self.R, self.t)
+
         # Now store the transform in the ignite server
         response =  requests.post(
                                 self.graphql_server,
@@ -610,30 +783,6 @@ class EntryExitCommunication:
                                 timeout=1
                             )
 
-    def transform_point(self, point, forward=True):
-        """
-        Transforms a point from the current map to the reference map or vice versa
-
-        Parameters:
-        - point (tuple): The point to be transformed.
-        - forward (bool): True if transforming from current map to reference map, False otherwise.
-
-        Returns:
-        - tuple: The transformed point.
-        """
-        if self.R is None:
-            return point
-
-        point_xy = np.array([point[0], point[1]])
-        if forward:
-            new_point_xy = self.R @ point_xy + self.t
-            new_point_theta = point[2] + np.arctan2(self.R[1, 0], self.R[0, 0])
-            return np.concatenate((new_point_xy, [new_point_theta]))
-        else:
-            new_point_xy = self.R.T @ (point_xy - self.t)
-            new_point_theta = point[2] - np.arctan2(self.R[1, 0], self.R[0, 0])
-            return np.concatenate((new_point_xy, [new_point_theta]))
-
     def run(self):
 
         prev_agent_set = set()
@@ -667,7 +816,7 @@ class EntryExitCommunication:
                     if agent_id in exited_agents:
                         exited_agents.pop(agent_id)  # Remove from exited agents dictionary if reentered
 
-                # Get agents from the GraphQL server
+                # Get agents from the bridge (written by the heartbeat subscriber)
                 heartbeat_agents = list(self.get_agents())
 
                 new_agents = set(heartbeat_agents) - set(current_agents_list)
@@ -705,48 +854,20 @@ class EntryExitCommunication:
             time.sleep(0.2)
 
     def get_agents(self):
-        # Query for any agents
-        response = requests.post(self.graphql_server, json={'query': AGENTS_QUERY}, timeout=1)
-        if response.status_code == 200:
-            data = response.json()
-
-            # Get the agent ids from the response
-            agent_ids = data.get('data', {}).get('subscribed_agents', {}).get('id', [])
-
-            if len(agent_ids):
-                return set(agent_ids)
-            else:
-                return set()
-        else:
-            return set()
+        # The bridge keeps the agent list up to date from pushed changes, no need to query
+        return set(self.bridge.agents)
+
+    def get_sample_stats(self):
+        return self.entry_exit_listener.sample_counter
         
     def update_agents(self, exited_agents=None):
-        mutation = """
-            mutation($agentList: [Int!]!) {
-            setAgentList(agent_list: $agentList)
-            }
-        """
+        # Only the agents that changed since the last update are sent to the registry, one mutation each
         agent_list = list(self.agents.keys())
+        exited_agent_list = None if exited_agents is None else list(exited_agents.keys())
+        self.registry_writer.update(agent_list, exited_agent_list)
 
-        response = requests.post(
-            self.graphql_server,
-            json={'query': mutation, 'variables': {'agentList': agent_list}},
-            timeout=1
-        )
-
-        if exited_agents is not None:
-            mutation = """
-                mutation($agentList: [Int!]!) {
-                setExitedAgentList(agent_list: $agentList)
-                }
-            """
-            exited_agent_list = list(exited_agents.keys())
-
-            response = requests.post(
-                self.graphql_server,
-                json={'query': mutation, 'variables': {'agentList': exited_agent_list}},
-                timeout=1
-            )
+        # Let the other handlers in this bridge know right away
+        self.bridge.set_agents(agent_list, exited_agent_list)
 
     def shutdown(self):
         print('\nSending exit message...\n')
@@ -762,20 +883,6 @@ if __name__ == '__main__':
     if agent_id is None:
         raise ValueError("AGENT_ID environment variable not set")
     
-    # Create an instance of the EntryExitCommunication class
-    entry_exit_obj = EntryExitCommunication(agent_id, server_url='http://localhost:8000/graphql')
-
-    def handle_signal(sig, frame):
-        entry_exit_obj.shutdown()
-        exit(0)
-
-    # Set up signal handlers for SIGINT (Ctrl+C) and SIGTERM
-    signal.signal(signal.SIGTERM, handle_signal) # Handles termination signal
-
-    entry_exit_obj.setup()
-    try:
-        entry_exit_obj.run()
-    except KeyboardInterrupt:
-        entry_exit_obj.shutdown()
-        print('Exiting...')
-        exit(0)
+    # Run the entry/exit protocol on its own bridge
+    bridge = Bridge(agent_id, [EntryExitCommunication], server_url='http://localhost:8000/graphql')
+    run_bridge(bridge)
@@ -0,0 +1,81 @@
+import heapq
+
+COMPACT_MIN_SIZE = 64  # Never compact heaps smaller than this
+
+
+class DeadlineHeap:
+    """
+    Min-heap of deadlines keyed by an ID (e.g. an agent), for expiring many entries cheaply.
+
+    Refreshing or removing a key does not search the heap: the key's generation is bumped and
+    its old heap entry becomes stale, to be skipped when it reaches the top. pop_expired() costs
+    O((expired + stale) log N) instead of a scan of every key. The heap is rebuilt from the live
+    entries when stale entries outnumber them, so its size stays O(N).
+    """
+
+    def __init__(self):
+        self.heap = []            # (deadline, generation, key)
+        self.entries = dict()     # key -> (deadline, generation) of the live entry
+        self.generation = 0
+        self.compactions = 0
+
+    def refresh(self, key, deadline):
+        """
+        Sets (or moves) the deadline of a key.
+        """
+        self.generation += 1
+        self.entries[key] = (deadline, self.generation)
+        heapq.heappush(self.heap, (deadline, self.generation, key))
+        self._maybe_compact()
+
+    def remove(self, key):
+        """
+        Forgets a key. Its heap entry is dropped lazily.
+        """
+        if self.entries.pop(key, None) is not None:
+            self._maybe_compact()
+
+    def deadline(self, key):
+        entry = self.entries.get(key)
+        return None if entry is None else entry[0]
+
+    def pop_expired(self, now):
+        """
+        Removes and returns the keys whose deadline is before `now`, earliest first.
+        """
+        expired = []
+        heap = self.heap
+        while heap and heap[0][0] < now:
+            deadline, generation, key = heapq.heappop(heap)
+            entry = self.entries.get(key)
+            if entry is None or entry[1] != generation:
+                continue  # Stale: refreshed or removed since it was pushed
+            del self.entries[key]
+            expired.append(key)
+        return expired
+
+    def next_deadline(self):
+        """
+        Returns:
+            The earliest live deadline, or None if the heap is empty.
+        """
+        heap = self.heap
+        while heap:
+            deadline, generation, key = heap[0]
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] == generation:
+                return deadline
+            heapq.heappop(heap)
+        return None
+
+    def _maybe_compact(self):
+        if len(self.heap) > COMPACT_MIN_SIZE and len(self.heap) > 2 * len(self.entries):
+            self.heap = [(deadline, generation, key) for key, (deadline, generation) in self.entries.items()]
+            heapq.heapify(self.heap)
+            self.compactions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
@@ -0,0 +1,264 @@
+from cyclonedds.core import Listener
+from cyclonedds.pub import DataWriter
+
+import time
+import random
+import threading
+from collections import OrderedDict
+
+from sample_utils import SampleCounter, take_samples
+from message_defs import (DataMessage, ImageMessage, CompressedImageMessage, Initialization, FragmentMessage,
+                          fragment_qos, octets)
+
+FRAGMENT_SIZE = 8 * 1024                 # bytes of payload per fragment, well under a typical Wi-Fi MTU burst
+REASSEMBLY_TIMEOUT = 2.0                 # seconds before an incomplete message is dropped
+REASSEMBLY_MAX_BYTES = 64 * 1024 * 1024  # Maximum memory held by incomplete messages
+DROPPED_HISTORY = 1024                   # Dropped message IDs remembered, so their late fragments are ignored
+
+# Types that may be fragmented, by name
+MESSAGE_TYPES = {message_type.__name__: message_type for message_type in
+                 (DataMessage, ImageMessage, CompressedImageMessage, Initialization)}
+
+# Types where only the newest message matters: completing one drops the older partial ones
+LATEST_ONLY_TYPES = {'ImageMessage', 'CompressedImageMessage'}
+
+
+class Fragmenter:
+    """
+    Splits messages into FragmentMessages of at most `fragment_size` payload bytes.
+
+    Attributes:
+        agent_id (int): The ID of the sending agent.
+        fragment_size (int): Maximum payload bytes per fragment.
+    """
+
+    def __init__(self, agent_id, fragment_size=FRAGMENT_SIZE):
+        self.agent_id = int(agent_id)
+        self.fragment_size = fragment_size
+        # Random start, so a restarted sender does not reuse the IDs of its previous run
+        self.next_message_id = random.getrandbits(31)
+        self.lock = threading.Lock()
+
+    def fragment(self, message, timestamp=None):
+        """
+        Args:
+            message (IdlStruct): One of MESSAGE_TYPES.
+            timestamp (int): Timestamp of the message, defaults to the message's own or now.
+
+        Returns:
+            list: The FragmentMessages, in order.
+        """
+        message_type = type(message).__name__
+        if message_type not in MESSAGE_TYPES:
+            raise ValueError(f"Cannot fragment '{message_type}'")
+
+        data = message.serialize()
+        if timestamp is None:
+            timestamp = getattr(message, 'timestamp', None) or int(time.time())
+
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id = (self.next_message_id + 1) & 0x7FFFFFFF
+
+        fragment_count = max(1, -(-len(data) // self.fragment_size))
+        view = memoryview(data)
+        return [FragmentMessage(sending_agent=self.agent_id, message_id=message_id, fragment_index=index,
+                                fragment_count=fragment_count, message_type=message_type, total_size=len(data),
+                                timestamp=timestamp,
+                                payload=bytes(view[index * self.fragment_size:(index + 1) * self.fragment_size]))
+                for index in range(fragment_count)]
+
+
+class PartialMessage:
+    def __init__(self, fragment, now):
+        self.message_type = fragment.message_type
+        self.fragment_count = fragment.fragment_count
+        self.total_size = fragment.total_size
+        self.fragments = [None] * fragment.fragment_count
+        self.received = 0
+        self.size = 0
+        self.first_seen = now
+
+
+class Reassembler:
+    """
+    Rebuilds messages from their fragments.
+
+    Incomplete messages are dropped when they are older than `timeout`, when the memory held by
+    incomplete messages would exceed `max_bytes` (oldest first), and, for LATEST_ONLY_TYPES, when
+    a newer message of the same type from the same sender completes.
+
+    Attributes:
+        timeout (float): Seconds an incomplete message is kept.
+        max_bytes (int): Maximum payload bytes held by incomplete messages.
+        metrics (dict): Counts of completed and dropped messages and of ignored fragments.
+    """
+
+    def __init__(self, timeout=REASSEMBLY_TIMEOUT, max_bytes=REASSEMBLY_MAX_BYTES):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.partials = OrderedDict()  # (sending_agent, message_id) -> PartialMessage, oldest first
+        self.bytes_held = 0
+        self.dropped = OrderedDict()   # Recently dropped (sending_agent, message_id)
+        self.lock = threading.Lock()
+        self.metrics = {
+            'completed': 0,
+            'dropped_timeout': 0,
+            'dropped_memory': 0,
+            'dropped_superseded': 0,
+            'duplicate_fragments': 0,
+            'late_fragments': 0,
+            'invalid_fragments': 0,
+        }
+
+    def add(self, fragment):
+        """
+        Adds a fragment.
+
+        Returns:
+            IdlStruct: The complete message if this fragment completed it, else None.
+        """
+        now = time.monotonic()
+        fragment.payload = octets(fragment.payload)  # A list of ints as received from DDS
+        message_type = MESSAGE_TYPES.get(fragment.message_type)
+        if (message_type is None or fragment.fragment_count < 1
+                or not 0 <= fragment.fragment_index < fragment.fragment_count):
+            with self.lock:
+                self.metrics['invalid_fragments'] += 1
+            return None
+
+        # Single fragment messages skip the buffers entirely
+        if fragment.fragment_count == 1:
+            with self.lock:
+                self.metrics['completed'] += 1
+            return self._deserialize(message_type, fragment.payload)
+
+        key = (fragment.sending_agent, fragment.message_id)
+        with self.lock:
+            self._expire(now)
+
+            partial = self.partials.get(key)
+            if partial is None:
+                if key in self.dropped:
+                    self.metrics['late_fragments'] += 1
+                    return None
+                if fragment.total_size > self.max_bytes:
+                    self.metrics['dropped_memory'] += 1
+                    self._remember_dropped(key)
+                    return None
+                partial = self.partials[key] = PartialMessage(fragment, now)
+            elif partial.fragment_count != fragment.fragment_count or partial.message_type != fragment.message_type:
+                self.metrics['invalid_fragments'] += 1
+                return None
+
+            if partial.fragments[fragment.fragment_index] is not None:
+                self.metrics['duplicate_fragments'] += 1
+                return None
+
+            partial.fragments[fragment.fragment_index] = fragment.payload
+            partial.received += 1
+            partial.size += len(fragment.payload)
+            self.bytes_held += len(fragment.payload)
+
+            if partial.received < partial.fragment_count:
+                self._enforce_memory_cap(key)
+                return None
+
+            # Complete
+            self.partials.pop(key)
+            self.bytes_held -= partial.size
+            self.metrics['completed'] += 1
+            if partial.message_type in LATEST_ONLY_TYPES:
+                self._drop_superseded(fragment.sending_agent, fragment.message_id, partial.message_type)
+
+        return self._deserialize(message_type, b''.join(partial.fragments))
+
+    def _deserialize(self, message_type, data):
+        try:
+            return message_type.deserialize(data)
+        except Exception:
+            with self.lock:
+                self.metrics['invalid_fragments'] += 1
+            return None
+
+    def _expire(self, now):
+        while self.partials:
+            key, partial = next(iter(self.partials.items()))
+            if now - partial.first_seen <= self.timeout:
+                break
+            self._drop(key, 'dropped_timeout')
+
+    def _enforce_memory_cap(self, current_key):
+        while self.bytes_held > self.max_bytes and self.partials:
+            key = next(iter(self.partials))
+            self._drop(key, 'dropped_memory')
+            if key == current_key:
+                break
+
+    def _drop_superseded(self, sending_agent, message_id, message_type):
+        superseded = [key for key, partial in self.partials.items()
+                      if key[0] == sending_agent and partial.message_type == message_type
+                      and (message_id - key[1]) & 0x7FFFFFFF < 0x40000000]
+        for key in superseded:
+            self._drop(key, 'dropped_superseded')
+
+    def _drop(self, key, reason):
+        partial = self.partials.pop(key)
+        self.bytes_held -= partial.size
+        self.metrics[reason] += 1
+        self._remember_dropped(key)
+
+    def _remember_dropped(self, key):
+        self.dropped[key] = None
+        if len(self.dropped) > DROPPED_HISTORY:
+            self.dropped.popitem(last=False)
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['partial_messages'] = len(self.partials)
+            metrics['bytes_held'] = self.bytes_held
+            return metrics
+
+
+class FragmentListener(Listener):
+    """
+    Reassembles the fragments of one agent's fragment topic and hands every complete message
+    to `deliver`, the same handler used for messages received whole.
+    """
+
+    def __init__(self, deliver, reassembler=None):
+        super().__init__()
+        self.sample_counter = SampleCounter()
+        self.deliver = deliver
+        self.reassembler = Reassembler() if reassembler is None else reassembler
+
+    def update_transformation(self, transform):
+        pass
+
+    def on_data_available(self, reader):
+        # Fragments of one message can share a source timestamp, duplicates are handled by the reassembler
+        for fragment in take_samples(reader, self.sample_counter, skip_duplicates=False):
+            message = self.reassembler.add(fragment)
+            if message is not None:
+                self.deliver(message)
+
+
+class FragmentWriter:
+    """
+    Publishes messages as fragments on a fragment topic.
+    """
+
+    def __init__(self, publisher, topic, agent_id, fragment_size=FRAGMENT_SIZE, qos=fragment_qos):
+        self.writer = DataWriter(publisher, topic, qos=qos)
+        self.fragmenter = Fragmenter(agent_id, fragment_size=fragment_size)
+
+    def write(self, message, timestamp=None):
+        """
+        Returns:
+            int: The number of fragments written.
+        """
+        fragments = self.fragmenter.fragment(message, timestamp=timestamp)
+        for fragment in fragments:
+            self.writer.write(fragment)
+        return len(fragments)
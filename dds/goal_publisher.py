@@ -16,6 +16,7 @@ import numpy as np
 import signal
 import os
 
+from bridge import Bridge, BridgeHandler, run_bridge
 from message_defs import DataMessage, reliable_qos, get_ip
 
 ROBOT_GOALS_QUERY = """
@@ -43,89 +44,35 @@ ROBOT_INITIAL_POSITIONS_QUERY = """
                             }
                             """
 
-TRANSFORMATION_MATRIX_QUERY = """
-                            query {
-                                transform {
-                                    R
-                                    t
-                                    timestamp
-                                }
-                            }
-                            """
+class GoalWriter(BridgeHandler):
+    """
+    Bridge handler that forwards goals and initial positions set in the GUI to the robots.
+    """
+    name = 'goal'
+    uses_transform = True
 
-class GoalWriter:
-    def __init__(self, my_id, server_url=None):
+    def __init__(self, bridge):
+        super().__init__(bridge)
 
-        self.my_id = my_id
+        self.my_id = bridge.my_id
 
         # GraphQL server URL
-        self.my_ip = get_ip()
-        if server_url is None:
-            self.graphql_server =  f"http://{self.my_ip}:8000/graphql" 
-        else:
-            self.graphql_server = server_url
+        self.my_ip = bridge.my_ip
+        self.graphql_server = bridge.graphql_server
 
         self.robot_goal_history = dict()
         self.robot_init_history = dict()
 
-        self.lease_duration_ms = 30000
-        qos_profile = DomainParticipantQos()
-        qos_profile.lease_duration = duration(milliseconds=self.lease_duration_ms)
-
-        # Create a DomainParticipant, Subscriber, and Publisher
-        self.participant = DomainParticipant(qos=qos_profile)
-        self.subscriber = Subscriber(self.participant)
-        self.publisher = Publisher(self.participant)
-
-        self.R = None
-        self.t = None
+        self.participant = bridge.participant
+        self.publisher = bridge.publisher
 
+        self.transform = None
 
-    def transform_point(self, point, forward=True):
-        """
-        Transforms a point from the current map to the reference map or vice versa
-
-        Parameters:
-        - point (tuple): The point to be transformed.
-        - forward (bool): True if transforming from current map to reference map, False otherwise.
-
-        Returns:
-        - tuple: The transformed point.
-        """
-        if self.R is None:
-            return point
-
-        point_xy = np.array([point[0], point[1]])
-        if forward:
-            new_point_xy = self.R @ point_xy + self.t
-            new_point_theta = point[2] + np.arctan2(self.R[1, 0], self.R[0, 0])
-            return np.concatenate((new_point_xy, [new_point_theta]))
-        else:
-            new_point_xy = self.R.T @ (point_xy - self.t)
-            new_point_theta = point[2] - np.arctan2(self.R[1, 0], self.R[0, 0])
-            return np.concatenate((new_point_xy, [new_point_theta]))
+    def on_transform(self, transform):
+        self.transform = transform
 
     def run(self):
 
-        # First make sure we have the transformation matrix
-        while self.R is None:
-            response = requests.post(self.graphql_server, json={'query': TRANSFORMATION_MATRIX_QUERY}, timeout=1)
-            if response.status_code == 200:
-                data = response.json()
-                transform = data.get('data', {}).get('transform', {})
-                timestamp = transform.get('timestamp', 0)
-                if time.time() - timestamp > 10:
-                    continue
-                R = transform.get('R', [])
-                t = transform.get('t', [])
-                if len(R) == 4 and len(t) == 2:
-                    self.R = np.array(R).reshape((2, 2))
-                    self.t = np.array(t)
-                    # print("Goal publisher got the transformation matrix!")
-                    break
-                else:
-                    time.sleep(1)
-
         # Now start the main loop
         while True:
             try:
@@ -152,7 +99,7 @@ class GoalWriter:
                             continue
 
                         # Transform the goal to the reference map
-                        robot_goal_x, robot_goal_y, robot_goal_theta = self.transform_point([robot_goal_x, robot_goal_y, robot_goal_theta], forward=True)
+                        robot_goal_x, robot_goal_y, robot_goal_theta = self.transform.transform_point([robot_goal_x, robot_goal_y, robot_goal_theta], forward=True)
 
                         if robot_goal_id not in self.robot_goal_history:
                             # Store goal in history
@@ -164,7 +111,7 @@ class GoalWriter:
                                 # Send the goal to the robot
                                 goal_dict = {"x": robot_goal_x, "y": robot_goal_y, "theta": robot_goal_theta}
                                 command_message = DataMessage('goal', int(self.my_id), int(robot_goal_timestamp), json.dumps(goal_dict))
-                                message_topic = Topic(self.participant, 'DataTopic' + str(robot_goal_id), DataMessage)
+                                message_topic = self.bridge.get_topic('DataTopic' + str(robot_goal_id), DataMessage)
                                 message_writer = DataWriter(self.publisher, message_topic, qos=reliable_qos)
                                 message_writer.write(command_message)
                         elif self.robot_goal_history[robot_goal_id] != (robot_goal_x, robot_goal_y, robot_goal_theta, robot_goal_timestamp):
@@ -173,7 +120,7 @@ class GoalWriter:
                             self.robot_goal_history[robot_goal_id] = (robot_goal_x, robot_goal_y, robot_goal_theta, robot_goal_timestamp)
                             goal_dict = {"x": robot_goal_x, "y": robot_goal_y, "theta": robot_goal_theta}
                             command_message = DataMessage('goal', int(self.my_id), int(robot_goal_timestamp), json.dumps(goal_dict))
-                            message_topic = Topic(self.participant, 'DataTopic' + str(robot_goal_id), DataMessage)
+                            message_topic = self.bridge.get_topic('DataTopic' + str(robot_goal_id), DataMessage)
                             message_writer = DataWriter(self.publisher, message_topic, qos=reliable_qos)
                             
                             message_writer.write(command_message)
@@ -196,7 +143,7 @@ class GoalWriter:
                         robot_timestamp = robot['init_timestamp']
 
                         # Transform the initial position to the reference map
-                        robot_x, robot_y, robot_theta = self.transform_point([robot_x, robot_y, robot_theta], forward=True)
+                        robot_x, robot_y, robot_theta = self.transform.transform_point([robot_x, robot_y, robot_theta], forward=True)
 
                         if robot_id not in self.robot_init_history:
                             # Store initial position in history
@@ -208,7 +155,7 @@ class GoalWriter:
                                 # Send the initial position to the robot
                                 init_dict = {"x": robot_x, "y": robot_y, "theta": robot_theta}
                                 command_message = DataMessage('position_init', int(self.my_id), int(robot_timestamp), json.dumps(init_dict))
-                                message_topic = Topic(self.participant, 'DataTopic' + str(robot_id), DataMessage)
+                                message_topic = self.bridge.get_topic('DataTopic' + str(robot_id), DataMessage)
                                 message_writer = DataWriter(self.publisher, message_topic, qos=reliable_qos)
                                 message_writer.write(command_message)
                         elif self.robot_init_history[robot_id] != (robot_x, robot_y, robot_theta, robot_timestamp):
@@ -216,7 +163,7 @@ class GoalWriter:
                             self.robot_init_history[robot_id] = (robot_x, robot_y, robot_theta, robot_timestamp)
                             init_dict = {"x": robot_x, "y": robot_y, "theta": robot_theta}
                             command_message = DataMessage('position_init', int(self.my_id), int(robot_timestamp), json.dumps(init_dict))
-                            message_topic = Topic(self.participant, 'DataTopic' + str(robot_id), DataMessage)
+                            message_topic = self.bridge.get_topic('DataTopic' + str(robot_id), DataMessage)
                             message_writer = DataWriter(self.publisher, message_topic, qos=reliable_qos)
                             
                             message_writer.write(command_message)
@@ -237,19 +184,7 @@ if __name__ == '__main__':
     if agent_id is None:
         raise ValueError("AGENT_ID environment variable not set")
 
-    goal_writer = GoalWriter(agent_id)
-
-    def handle_signal(sig, frame):
-        goal_writer.shutdown()
-        exit(0)
-
-    # Set up signal handlers for SIGINT (Ctrl+C) and SIGTERM
-    signal.signal(signal.SIGTERM, handle_signal) # Handles termination signal
 
-    time.sleep(10)  # Wait for the participant to do entry and initialization
-    try:
-        goal_writer.run()
-    except KeyboardInterrupt:
-        print('Exiting...')
-        exit(0)
-    
\ No newline at end of file
+    # Run the goal publisher on its own bridge
+    bridge = Bridge(agent_id, [GoalWriter], wait_for_setup=True)
+    run_bridge(bridge)
@@ -0,0 +1,126 @@
+import bisect
+import hashlib
+import threading
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def agent_hash(agent_id):
+    """
+    SHA-256 of an agent ID as an integer, memoized since the same IDs are hashed over and over.
+
+    Args:
+        agent_id (int or str): The agent ID. 7 and '7' hash the same.
+
+    Returns:
+        int: The 256-bit hash.
+    """
+    return int(hashlib.sha256(str(agent_id).encode()).hexdigest(), 16)
+
+
+class HashRing:
+    """
+    Sorted array of agent hashes, to choose which agent answers an entry request.
+
+    The responder for a new agent is the member whose hash is closest (smallest absolute
+    difference) to the new agent's hash, the agent itself excluded, as the previous scan of every
+    agent did. The two neighbours of the new hash on the sorted array are the only candidates, so
+    a lookup is a bisect, O(log N). Members are added and removed incrementally on enter, exit
+    and death.
+
+    Listener threads change and query the ring concurrently, so every method holds `lock`.
+
+    Attributes:
+        hashes (list): Sorted member hashes.
+        members (dict): Member hash -> agent ID.
+        lock (threading.Lock): Guards `hashes` and `members`.
+    """
+
+    def __init__(self, agent_ids=()):
+        self.hashes = []
+        self.members = dict()
+        self.lock = threading.Lock()
+        for agent_id in agent_ids:
+            self._add(agent_id)
+
+    def add(self, agent_id):
+        """
+        Returns:
+            bool: True if the agent was not already a member.
+        """
+        with self.lock:
+            return self._add(agent_id)
+
+    def remove(self, agent_id):
+        """
+        Returns:
+            bool: True if the agent was a member.
+        """
+        with self.lock:
+            return self._remove(agent_id)
+
+    def _add(self, agent_id):
+        h = agent_hash(agent_id)
+        if h in self.members:
+            return False
+        bisect.insort(self.hashes, h)
+        self.members[h] = int(agent_id)
+        return True
+
+    def _remove(self, agent_id):
+        h = agent_hash(agent_id)
+        if self.members.pop(h, None) is None:
+            return False
+        del self.hashes[bisect.bisect_left(self.hashes, h)]
+        return True
+
+    def sync(self, agent_ids):
+        """
+        Makes the membership equal to `agent_ids`, adding and removing only the differences.
+        """
+        agent_ids = set(int(agent_id) for agent_id in agent_ids)
+        with self.lock:
+            current = set(self.members.values())
+            for agent_id in current - agent_ids:
+                self._remove(agent_id)
+            for agent_id in agent_ids - current:
+                self._add(agent_id)
+
+    def responders(self, agent_id, count=2):
+        """
+        Returns the members closest to an agent's hash, closest first: the responder and backups.
+
+        Args:
+            agent_id (int or str): The agent requesting entry. Never its own responder.
+            count (int): How many members to return at most.
+
+        Returns:
+            list: Agent IDs.
+        """
+        h = agent_hash(agent_id)
+        with self.lock:
+            hashes = self.hashes
+            right = bisect.bisect_left(hashes, h)
+            left = right - 1
+            if right < len(hashes) and hashes[right] == h:
+                right += 1  # Skip the agent itself
+
+            # Walk outwards from the insertion point, taking the nearer neighbour each time
+            responders = []
+            while len(responders) < count and (left >= 0 or right < len(hashes)):
+                if right >= len(hashes) or (left >= 0 and h - hashes[left] <= hashes[right] - h):
+                    responders.append(self.members[hashes[left]])
+                    left -= 1
+                else:
+                    responders.append(self.members[hashes[right]])
+                    right += 1
+            return responders
+
+    def __len__(self):
+        with self.lock:
+            return len(self.hashes)
+
+    def __contains__(self, agent_id):
+        h = agent_hash(agent_id)
+        with self.lock:
+            return h in self.members
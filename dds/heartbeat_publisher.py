@@ -13,47 +13,36 @@ import os
 import socket
 import signal
 
-from message_defs import Heartbeat, best_effort_qos
+from bridge import Bridge, BridgeHandler, run_bridge
+from message_defs import Heartbeat, heartbeat_writer_qos
 
 HEARTBEAT_PERIOD = 10    # seconds
 AGENT_TYPE = 'human'
 
 
-class HeartbeatPublisher:
+class HeartbeatPublisher(BridgeHandler):
+    """
+    Bridge handler that publishes this agent's heartbeat.
+    """
+    name = 'heartbeat_publisher'
 
-    def __init__(self):
+    def __init__(self, bridge):
         """
         Initializes the HeartbeatPublisher.
         """
+        super().__init__(bridge)
 
-        # Get the agent ID from the environment variable
-        self.agent_id = os.getenv('AGENT_ID')
-        if self.agent_id is None:
-            raise ValueError("AGENT_ID environment variable not set")
-        self.agent_id = int(self.agent_id)
+        self.agent_id = int(bridge.my_id)
         self.agent_type = AGENT_TYPE
 
         if self.agent_type == 'human':
             self.location_valid = False
 
-        # Get IP Address
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        # This doesn't have to be reachable; it just has to be a valid address
-        s.connect(("8.8.8.8", 80))
-        self.my_ip = s.getsockname()[0]
-        s.close()
+        self.my_ip = bridge.my_ip
 
-        self.lease_duration_ms = 30000
-        qos_profile = DomainParticipantQos()
-        qos_profile.lease_duration = duration(milliseconds=self.lease_duration_ms)
-
-        # Create a DomainParticipant, Subscriber, and Publisher
-        self.participant = DomainParticipant(qos=qos_profile)
-        self.publisher = Publisher(self.participant)
-
-        # Create a Topic and DataWriter for the heartbeat message
-        self.heartbeat_topic = Topic(self.participant, 'HeartbeatTopic', Heartbeat)
-        self.heartbeat_writer = DataWriter(self.publisher, self.heartbeat_topic, qos=best_effort_qos)
+        # Create a DataWriter for the heartbeat message
+        self.heartbeat_topic = bridge.get_topic('HeartbeatTopic', Heartbeat)
+        self.heartbeat_writer = DataWriter(bridge.publisher, self.heartbeat_topic, qos=heartbeat_writer_qos)
 
     
     def run(self):
@@ -73,19 +62,12 @@ class HeartbeatPublisher:
         
 
 if __name__ == "__main__":
-    # Create an instance of the HeartbeatPublisher and run it
-    publisher = HeartbeatPublisher()
-
-    def handle_signal(sig, frame):
-        publisher.shutdown()
-        exit(0)
+    # Get the agent ID from the environment variable
+    agent_id = os.getenv('AGENT_ID')
+    if agent_id is None:
+        raise ValueError("AGENT_ID environment variable not set")
 
-    # Set up signal handlers for SIGINT (Ctrl+C) and SIGTERM
-    signal.signal(signal.SIGTERM, handle_signal) # Handles termination signal
 
-    time.sleep(11)  # Wait for the participant to do entry and initialization
-    try:
-        publisher.run()
-    except KeyboardInterrupt:
-        print("Heartbeat publisher stopped.")
-        exit(0)
\ No newline at end of file
+    # Run the heartbeat publisher on its own bridge
+    bridge = Bridge(agent_id, [HeartbeatPublisher], wait_for_setup=True)
+    run_bridge(bridge)
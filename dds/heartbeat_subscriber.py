@@ -5,30 +5,28 @@ from cyclonedds.pub import Publisher, DataWriter
 from cyclonedds.util import duration
 from cyclonedds.idl import IdlStruct
 from cyclonedds.idl.types import sequence
-from cyclonedds.core import Qos, Policy, Listener
-from cyclonedds.builtin import BuiltinDataReader, BuiltinTopicDcpsParticipant
+from cyclonedds.core import Qos, Policy, Listener, InstanceState
+from cyclonedds.builtin import BuiltinDataReader, BuiltinTopicDcpsParticipant, BuiltinTopicDcpsPublication
 
 import time
 import os
 import socket
 import signal
-import hashlib
+import queue
 import requests
+import threading
 
 
-from message_defs import Heartbeat, best_effort_qos, get_ip
+from bridge import Bridge, BridgeHandler, run_bridge
+from sample_utils import SampleCounter, take_samples
+from expiry import DeadlineHeap
+from agent_registry import AgentRegistryWriter
+from hash_ring import agent_hash
+from message_defs import Heartbeat, best_effort_qos, heartbeat_reader_qos, get_ip
 
 HEARTBEAT_PERIOD = 10    # seconds
 HEARTBEAT_TIMEOUT = 31   # seconds
 
-AGENTS_QUERY =  """
-                    query {
-                        subscribedAndExitedAgents {
-                            id
-                        }
-                    }
-                """ 
-
 class HeartbeatListener(Listener):
     """
     Listener class that handles heartbeat data from agents.
@@ -39,11 +37,13 @@ class HeartbeatListener(Listener):
         agents (dict): A dictionary to store information about all agents in the environment.
     """
 
-    def __init__(self, my_id):
+    def __init__(self, my_id, liveness_monitor=None):
         super().__init__()
+        self.sample_counter = SampleCounter()
         self.heartbeats = dict()
         self.new_heartbeats = dict()
         self.my_id = my_id
+        self.liveness_monitor = liveness_monitor
 
         self.R = None
         self.t = None
@@ -58,7 +58,7 @@ class HeartbeatListener(Listener):
         Returns:
             None
         """
-        for sample in reader.read():
+        for sample in take_samples(reader, self.sample_counter):
 
             # Skip messages from self
             if sample.agent_id == int(self.my_id):
@@ -67,6 +67,17 @@ class HeartbeatListener(Listener):
             self.new_heartbeats[sample.agent_id] = sample.timestamp
             self.heartbeats[sample.agent_id] = sample.timestamp
 
+            if self.liveness_monitor is not None:
+                self.liveness_monitor.on_heartbeat(sample)
+
+    def on_liveliness_changed(self, reader, status):
+        """
+        Callback method called when a heartbeat writer becomes alive or not alive: it was deleted,
+        its participant left, or its liveliness lease expired.
+        """
+        if self.liveness_monitor is not None and status.not_alive_count_change > 0:
+            self.liveness_monitor.on_writer_lost(status.last_publication_handle)
+
     def get_heartbeats(self):
         """
         Get a copy of the heartbeats dictionary.
@@ -78,6 +89,105 @@ class HeartbeatListener(Listener):
         self.new_heartbeats.clear()
         return returned_heartbeats
 
+class LivenessMonitor:
+    """
+    Detects agents leaving from DDS discovery instead of waiting for heartbeats to time out.
+
+    Heartbeat samples tell which writer (publication handle) and which participant belong to
+    which agent. An agent is reported lost as soon as:
+    - its heartbeat writer stops being alive (liveliness changed on the heartbeat reader), or
+    - its participant is disposed or lost in the DCPSParticipant builtin topic.
+
+    A clean shutdown deletes the writer and participant, which is seen right away. A crashed agent
+    is seen when the liveliness lease offered by its heartbeat writer runs out: LIVELINESS_LEASE_MS
+    for writers using heartbeat_writer_qos, 30 s for robots still offering best_effort_qos.
+
+    Lost agents are put on `lost_agents`, which the HeartbeatSubscriber loop consumes.
+    """
+
+    def __init__(self, participant, my_id):
+        self.my_id = int(my_id)
+        self.lock = threading.Lock()
+        self.handle_to_agent = dict()        # heartbeat publication handle -> agent id
+        self.handle_to_participant = dict()  # publication handle -> participant key, from DCPSPublication
+        self.participant_to_agent = dict()   # participant key -> agent id
+        self.lost_agents = queue.Queue()
+
+        self.publication_reader = BuiltinDataReader(participant, BuiltinTopicDcpsPublication,
+                                                    listener=PublicationListener(self))
+        self.participant_reader = BuiltinDataReader(participant, BuiltinTopicDcpsParticipant,
+                                                    listener=ParticipantListener(self))
+        # Discovery data already known when a reader is created is announced before the reader
+        # object exists, the listeners skip that callback, so take it here
+        PublicationListener(self).on_data_available(self.publication_reader)
+        ParticipantListener(self).on_data_available(self.participant_reader)
+
+    def on_heartbeat(self, sample):
+        info = getattr(sample, 'sample_info', None)
+        if info is None:
+            return
+        with self.lock:
+            self.handle_to_agent[info.publication_handle] = sample.agent_id
+            participant_key = self.handle_to_participant.get(info.publication_handle)
+            if participant_key is not None:
+                self.participant_to_agent[participant_key] = sample.agent_id
+
+    def on_publication(self, sample):
+        info = sample.sample_info
+        with self.lock:
+            if info.instance_state != InstanceState.Alive:
+                self.handle_to_participant.pop(info.instance_handle, None)
+            elif sample.topic_name == 'HeartbeatTopic':
+                self.handle_to_participant[info.instance_handle] = sample.participant_key
+                agent_id = self.handle_to_agent.get(info.instance_handle)
+                if agent_id is not None:
+                    self.participant_to_agent[sample.participant_key] = agent_id
+
+    def on_writer_lost(self, publication_handle):
+        with self.lock:
+            agent_id = self.handle_to_agent.pop(publication_handle, None)
+        self._lost(agent_id, 'heartbeat writer not alive')
+
+    def on_participant_lost(self, participant_key):
+        with self.lock:
+            agent_id = self.participant_to_agent.pop(participant_key, None)
+            # Forget the agent's writers too, they went with the participant
+            for handle in [h for h, a in self.handle_to_agent.items() if a == agent_id]:
+                self.handle_to_agent.pop(handle)
+        self._lost(agent_id, 'participant left')
+
+    def _lost(self, agent_id, reason):
+        if agent_id is None or agent_id == self.my_id:
+            return
+        print(f'Agent {agent_id} lost ({reason})')
+        self.lost_agents.put(agent_id)
+
+
+class PublicationListener(Listener):
+    def __init__(self, monitor):
+        super().__init__()
+        self.monitor = monitor
+
+    def on_data_available(self, reader):
+        if reader is None:
+            return
+        for sample in reader.take(N=64):
+            self.monitor.on_publication(sample)
+
+
+class ParticipantListener(Listener):
+    def __init__(self, monitor):
+        super().__init__()
+        self.monitor = monitor
+
+    def on_data_available(self, reader):
+        if reader is None:
+            return
+        for sample in reader.take(N=64):
+            if sample.sample_info.instance_state != InstanceState.Alive:
+                self.monitor.on_participant_lost(sample.key)
+
+
 def hash_func(robot_id):
     """
     Hashes the given robot ID using SHA-256 algorithm.
@@ -89,48 +199,55 @@ def hash_func(robot_id):
     int: The hashed robot ID as an integer.
 
     """
-    return int(hashlib.sha256(robot_id.encode()).hexdigest(), 16)
+    return agent_hash(robot_id)
 
 
-class HeartbeatSubscriber:
+class HeartbeatSubscriber(BridgeHandler):
+    """
+    Bridge handler that tracks heartbeats and removes agents that have left.
+
+    Departures are detected from DDS discovery by a LivenessMonitor and applied right away; the
+    heartbeat timeout is kept as a fallback for agents whose departure is not reported.
+    """
+    name = 'heartbeat_subscriber'
 
-    def __init__(self, server_url=None):
+    def __init__(self, bridge):
+        super().__init__(bridge)
 
-        # Get the agent ID from the environment variable
-        self.my_id = os.getenv('AGENT_ID')
-        if self.my_id is None:
-            raise ValueError("AGENT_ID environment variable not set")
+        self.my_id = bridge.my_id
         
         # Get hash
         self.my_hash = hash_func(self.my_id)
         
         # GraphQL server URL
-        self.my_ip = get_ip()
-        if server_url is None:
-            self.graphql_server =  f"http://{self.my_ip}:8000/graphql" 
-        else:
-            self.graphql_server = server_url
+        self.my_ip = bridge.my_ip
+        self.graphql_server = bridge.graphql_server
+        self.registry_writer = AgentRegistryWriter(self.graphql_server)
 
-        # Dictionary to store agents in the environment
+        # Dictionary to store agents in the environment, and their heartbeat deadlines
         self.agents = dict()
+        self.expiry = DeadlineHeap()
 
-        self.lease_duration_ms = 30000
-        qos_profile = DomainParticipantQos()
-        qos_profile.lease_duration = duration(milliseconds=self.lease_duration_ms)
-
-        # Create a DomainParticipant, Subscriber, and Publisher
-        self.participant = DomainParticipant(qos=qos_profile)
-        self.subscriber = Subscriber(self.participant)
+        self.liveness_monitor = LivenessMonitor(bridge.participant, self.my_id)
 
-        self.heartbeat_topic = Topic(self.participant, 'HeartbeatTopic', Heartbeat)
-        self.heartbeat_listener = HeartbeatListener(self.my_id)
-        self.heartbeat_reader = DataReader(self.subscriber, self.heartbeat_topic, listener=self.heartbeat_listener, qos=best_effort_qos)
+        self.heartbeat_topic = bridge.get_topic('HeartbeatTopic', Heartbeat)
+        self.heartbeat_listener = HeartbeatListener(self.my_id, self.liveness_monitor)
+        self.heartbeat_reader = DataReader(bridge.subscriber, self.heartbeat_topic, listener=self.heartbeat_listener, qos=heartbeat_reader_qos)
 
     def run(self):
         
         last_time = int(time.time())
         prev_exited_agents = set()
         while True:
+            # Apply the departures reported by discovery right away
+            lost_agents = self.wait_for_lost_agents(timeout=1)
+            removed = [agent_id for agent_id in lost_agents if self.remove_agent(agent_id)]
+            for agent_id in lost_agents:
+                # A heartbeat received before the departure must not bring the agent back
+                self.heartbeat_listener.new_heartbeats.pop(agent_id, None)
+            if removed:
+                self.update_agents()
+
             current_time = int(time.time())
 
             if current_time - last_time >= HEARTBEAT_PERIOD:
@@ -145,126 +262,103 @@ class HeartbeatSubscriber:
                 update_to_active_agents = False
                 for agent_id in heartbeats.keys():
                     if agent_id not in self.agents:
-                        self.agents[agent_id] = {
-                            'timestamp': int(time.time())
-                        }
+                        self.set_heartbeat(agent_id, int(time.time()))
 
                     if agent_id in current_agents:
-                        self.agents[agent_id]['timestamp'] = heartbeats[agent_id]
-                        if agent_id in prev_exited_agents:
-                            prev_exited_agents.remove(agent_id)
+                        self.set_heartbeat(agent_id, heartbeats[agent_id])
+                        prev_exited_agents.discard(agent_id)
                     elif agent_id in exited_agents and agent_id not in prev_exited_agents:
                         prev_exited_agents.add(agent_id)
                         
                         # Remove agent from active agents
-                        if agent_id in self.agents:
-                            self.agents.pop(agent_id)
+                        if self.remove_agent(agent_id):
                             update_to_active_agents = True
                     else:
                         print(f'Detected heartbeat from unknown agent {agent_id}')
-                        agent_hash = hash_func(str(agent_id))
 
                         # FIXME: Add correct agent_type and ip_address
-                        self.agents[agent_id] = {
-                            # 'agent_type': 'unknown',
-                            # 'ip_address': 'unknown',
-                            # 'hash': agent_hash,
-                            'timestamp': heartbeats[agent_id]
-                        }
+                        self.set_heartbeat(agent_id, heartbeats[agent_id])
                         update_to_active_agents = True
-
-                        if agent_id in prev_exited_agents:
-                            prev_exited_agents.remove(agent_id)
+                        prev_exited_agents.discard(agent_id)
 
                 # Move newly exited agents to exited agents and remove from active agents
-                for agent_id in exited_agents:
-                    if agent_id not in prev_exited_agents:
-                        prev_exited_agents.add(agent_id)
-                        if agent_id in self.agents:
-                            self.agents.pop(agent_id)
-                            update_to_active_agents = True
+                for agent_id in exited_agents - prev_exited_agents:
+                    prev_exited_agents.add(agent_id)
+                    if self.remove_agent(agent_id):
+                        update_to_active_agents = True
 
-                # Check Periodically for Dead Agents
-                dead_agents = []
-                for agent_id, agent_info in self.agents.items():
-
-                    # Skip self
-                    if agent_id == int(self.my_id):
-                        continue
-
-                    time_difference = current_time - agent_info['timestamp']
-                
-                    if time_difference > HEARTBEAT_TIMEOUT:
-                        # Agent has timed out
-                        print(f'Agent {agent_id} has timed out')
-                        dead_agents.append(agent_id)
-                
-                # Remove Dead Agents
+                # Expire the agents whose heartbeat deadline passed, without scanning every agent
+                dead_agents = self.expiry.pop_expired(current_time)
                 for agent_id in dead_agents:
-                    self.agents.pop(agent_id)
+                    print(f'Agent {agent_id} has timed out')
+                    self.agents.pop(agent_id, None)
 
                 if update_to_active_agents or dead_agents:
                     # Update the list of agents in the environment
                     self.update_agents()
-            
-            # Sleep for a short duration to avoid busy waiting
-            time.sleep(1)
+
+    def set_heartbeat(self, agent_id, timestamp):
+        """
+        Records an agent's latest heartbeat and moves its expiry deadline.
+        """
+        self.agents[agent_id] = {
+            'timestamp': timestamp
+        }
+        # Never expire self
+        if agent_id != int(self.my_id):
+            self.expiry.refresh(agent_id, timestamp + HEARTBEAT_TIMEOUT)
+
+    def remove_agent(self, agent_id):
+        """
+        Returns:
+            bool: True if the agent was being tracked.
+        """
+        self.expiry.remove(agent_id)
+        return self.agents.pop(agent_id, None) is not None
+
+    def wait_for_lost_agents(self, timeout):
+        """
+        Waits up to `timeout` seconds for the LivenessMonitor to report lost agents.
+
+        Returns:
+            list: The IDs of the lost agents, possibly empty.
+        """
+        try:
+            lost_agents = [self.liveness_monitor.lost_agents.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                lost_agents.append(self.liveness_monitor.lost_agents.get_nowait())
+            except queue.Empty:
+                return lost_agents
 
     def get_agents(self):
-        # Query for any agents
-        response = requests.post(self.graphql_server, json={'query': AGENTS_QUERY}, timeout=1)
-        if response.status_code == 200:
-            data = response.json()
-
-            # Get the agent ids from the response
-            subscribed_agents = data.get('data', {}).get('subscribedAndExitedAgents', [])[0].get('id', [])
-            exited_agents = data.get('data', {}).get('subscribedAndExitedAgents', [])[1].get('id', [])
-            
-            if len(subscribed_agents):
-                subscribed_agents = set(subscribed_agents)
-            else:
-                subscribed_agents = set()
-
-            if len(exited_agents):
-                exited_agents = set(exited_agents)
-            else:
-                exited_agents = set()
-
-            return subscribed_agents, exited_agents
-        else:
-            return set(), set()
+        # The bridge keeps the agent lists up to date from pushed changes, no need to query. The
+        # bridge replaces the sets rather than mutating them, so they are safe to use without a copy
+        return self.bridge.agents, self.bridge.exited_agents
+
+    def get_sample_stats(self):
+        return self.heartbeat_listener.sample_counter
         
     def update_agents(self):
-        mutation = """
-            mutation($agentList: [Int!]!) {
-            setAgentList(agent_list: $agentList)
-            }
-        """
+        # Only the agents that joined or left since the last update are sent to the registry, one mutation each
         agent_list = list(self.agents.keys())
+        self.registry_writer.update(agent_list)
 
-        response = requests.post(
-            self.graphql_server,
-            json={'query': mutation, 'variables': {'agentList': agent_list}},
-            timeout=1
-        )
+        # Let the other handlers in this bridge know right away
+        self.bridge.set_agents(agent_list)
 
     def shutdown(self):
         pass
 
 if __name__ == "__main__":
-    # Create an instance of the HeartbeatSubscriber and run it
-    subscriber = HeartbeatSubscriber()
-
-    def handle_signal(sig, frame):
-        subscriber.shutdown()
-        exit(0)
-
-    # Set up signal handlers for SIGINT (Ctrl+C) and SIGTERM
-    signal.signal(signal.SIGTERM, handle_signal) # Handles termination signal
-
-    time.sleep(10)  # Wait for the participant to do entry and initialization
-    try:
-        subscriber.run()
-    except KeyboardInterrupt:
-        print("Heartbeat subscriber stopped.")
-        exit(0)
\ No newline at end of file
+    # Get the agent ID from the environment variable
+    agent_id = os.getenv('AGENT_ID')
+    if agent_id is None:
+        raise ValueError("AGENT_ID environment variable not set")
+
+
+    # Run the heartbeat subscriber on its own bridge
+    bridge = Bridge(agent_id, [HeartbeatSubscriber], wait_for_setup=True)
+    run_bridge(bridge)
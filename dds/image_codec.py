@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+
+from message_defs import ImageMessage, CompressedImageMessage, octets
+
+ENCODED_FORMATS = ('jpeg', 'png')  # Payload is a complete image file
+RAW_ENCODING = 'raw'               # Payload is packed rgb8 pixels
+FILE_EXTENSIONS = {'jpeg': 'jpg', 'png': 'png'}
+
+
+def decode_image(sample):
+    """
+    Decodes the pixels of an image sample without going through a Python list.
+
+    Args:
+        sample (CompressedImageMessage or ImageMessage): The received sample.
+
+    Returns:
+        np.ndarray: (height, width, 3) uint8 array. For 'raw' payloads this is a read-only view
+        of the sample's buffer.
+    """
+    if isinstance(sample, CompressedImageMessage):
+        if sample.encoding in ENCODED_FORMATS:
+            from PIL import Image
+            with Image.open(io.BytesIO(octets(sample.data))) as image:
+                return np.asarray(image.convert('RGB'))
+        if sample.encoding != RAW_ENCODING:
+            raise ValueError(f"Unknown image encoding '{sample.encoding}'")
+        return np.frombuffer(octets(sample.data), dtype=np.uint8).reshape((sample.height, sample.width, 3))
+
+    # Legacy ImageMessage, one int per byte
+    return np.asarray(sample.data, dtype=np.uint8).reshape((sample.height, sample.width, 3))
+
+
+def encoded_payload(sample):
+    """
+    Returns the sample's payload if it is already an encoded image file, so it can be written to
+    disk as is instead of being decoded and re-encoded.
+
+    Returns:
+        tuple: (bytes, file extension), or (None, None) if the sample carries raw pixels.
+    """
+    if isinstance(sample, CompressedImageMessage) and sample.encoding in ENCODED_FORMATS:
+        return octets(sample.data), FILE_EXTENSIONS[sample.encoding]
+    return None, None
+
+
+def encode_image(agent_id, timestamp, image_array, encoding='jpeg', quality=85):
+    """
+    Builds a CompressedImageMessage from an rgb8 array, for the sending side and the benchmarks.
+
+    Args:
+        agent_id (int): The ID of the sending agent.
+        timestamp (int): The timestamp of the image.
+        image_array (np.ndarray): (height, width, 3) uint8 array.
+        encoding (str): 'jpeg', 'png' or 'raw'.
+        quality (int): JPEG quality.
+
+    Returns:
+        CompressedImageMessage: The message to publish.
+    """
+    image_array = np.ascontiguousarray(image_array, dtype=np.uint8)
+    height, width = image_array.shape[:2]
+
+    if encoding == RAW_ENCODING:
+        data = image_array.tobytes()
+    elif encoding in ENCODED_FORMATS:
+        from PIL import Image
+        buffer = io.BytesIO()
+        if encoding == 'jpeg':
+            Image.fromarray(image_array, 'RGB').save(buffer, format='JPEG', quality=quality)
+        else:
+            Image.fromarray(image_array, 'RGB').save(buffer, format='PNG')
+        data = buffer.getvalue()
+    else:
+        raise ValueError(f"Unknown image encoding '{encoding}'")
+
+    return CompressedImageMessage(agent_id=agent_id, timestamp=timestamp, encoding=encoding,
+                                  width=width, height=height, data=data)
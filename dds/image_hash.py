@@ -0,0 +1,119 @@
+import io
+import threading
+
+import numpy as np
+
+from message_defs import CompressedImageMessage, octets
+
+HASH_SIZE = 8           # 8x8 difference hash, 64 bits
+SAMPLE_SIZE = 64        # Frames are subsampled to about this many rows before averaging
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def dhash(image_array, hash_size=HASH_SIZE):
+    """
+    Difference hash of an image: the sign of the horizontal gradient on a hash_size x hash_size
+    grid of block averages of the grayscale image.
+
+    Args:
+        image_array (np.ndarray): (height, width, 3) or (height, width) image.
+
+    Returns:
+        int: The hash, hash_size * hash_size bits.
+    """
+    # Subsample first, so the cost does not depend on the frame resolution
+    step = max(1, min(image_array.shape[0], image_array.shape[1]) // SAMPLE_SIZE)
+    small = image_array[::step, ::step]
+    if small.ndim == 3:
+        small = small[..., :3] @ GRAY_WEIGHTS
+    small = small.astype(np.float32, copy=False)
+
+    rows, cols = hash_size, hash_size + 1
+    if small.size == 0:
+        raise ValueError("Cannot hash an empty image")
+    if small.shape[0] < rows or small.shape[1] < cols:
+        # Too small for one pixel per block, whose mean would be NaN: scale up by repetition
+        small = np.repeat(small, -(-rows // small.shape[0]), axis=0)
+        small = np.repeat(small, -(-cols // small.shape[1]), axis=1)
+
+    height = small.shape[0] - small.shape[0] % rows
+    width = small.shape[1] - small.shape[1] % cols
+    blocks = small[:height, :width].reshape(rows, height // rows, cols, width // cols).mean(axis=(1, 3))
+
+    bits = (blocks[:, 1:] > blocks[:, :-1]).reshape(-1)
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def sample_dhash(sample):
+    """
+    Hash of a received image sample. JPEG payloads are decoded at reduced size (DCT scaling),
+    raw payloads are hashed straight from the sample's buffer.
+    """
+    if isinstance(sample, CompressedImageMessage) and sample.encoding in ('jpeg', 'png'):
+        from PIL import Image
+        with Image.open(io.BytesIO(octets(sample.data))) as image:
+            image.draft('L', (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))  # No-op for PNG
+            return dhash(np.asarray(image.convert('L')))
+
+    if isinstance(sample, CompressedImageMessage):
+        pixels = np.frombuffer(octets(sample.data), dtype=np.uint8)
+    else:
+        pixels = np.asarray(sample.data, dtype=np.uint8)
+    return dhash(pixels.reshape((sample.height, sample.width, 3)))
+
+
+class DuplicateFilter:
+    """
+    Tracks the hash of the last stored frame of every robot, to recognise near-duplicates.
+
+    A frame is a near-duplicate if its hash is within `threshold` bits of the last stored frame
+    of the same robot, and that frame is less than `max_interval` seconds older, so a stationary
+    camera is still archived every `max_interval` seconds.
+
+    Attributes:
+        threshold (int): Maximum Hamming distance of a near-duplicate.
+        max_interval (float): Maximum time between two stored frames of a robot.
+    """
+
+    def __init__(self, threshold=4, max_interval=60):
+        self.threshold = threshold
+        self.max_interval = max_interval
+        self.last_stored = dict()   # robot_id -> (hash, timestamp, path)
+        self.robot_locks = dict()   # robot_id -> Lock held from find_reference() to stored()
+        self.lock = threading.Lock()
+
+    def robot_lock(self, robot_id):
+        """
+        Lock to hold around find_reference() and stored() for one frame, so two near-identical
+        frames of a robot handled by different workers cannot both be stored.
+        """
+        with self.lock:
+            lock = self.robot_locks.get(robot_id)
+            if lock is None:
+                lock = self.robot_locks[robot_id] = threading.Lock()
+            return lock
+
+    def find_reference(self, robot_id, frame_hash, timestamp):
+        """
+        Returns:
+            str: Path of the stored frame this one duplicates, or None if it should be stored.
+        """
+        with self.lock:
+            last = self.last_stored.get(robot_id)
+        if last is None:
+            return None
+
+        last_hash, last_timestamp, last_path = last
+        if abs(timestamp - last_timestamp) >= self.max_interval:
+            return None
+        if hamming(frame_hash, last_hash) > self.threshold:
+            return None
+        return last_path
+
+    def stored(self, robot_id, frame_hash, timestamp, path):
+        with self.lock:
+            self.last_stored[robot_id] = (frame_hash, timestamp, path)
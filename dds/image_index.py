@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import threading
+import importlib.util
+from collections import deque
+
+# The schema and the queries are shared with the GraphQL server, which reads the same file. The
+# module lives with the server (its container only mounts graphql/) and is loaded from its path,
+# not through sys.path, where the server's image_index and agent_registry would clash with ours.
+GRAPHQL_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'graphql', 'python-graphql')
+_spec = importlib.util.spec_from_file_location('image_index_db', os.path.join(GRAPHQL_SERVER_DIR, 'image_index_db.py'))
+image_index_db = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(image_index_db)
+
+SCHEMA = image_index_db.SCHEMA
+connect_read_only = image_index_db.connect_read_only
+query_index = image_index_db.query_images
+
+# The default is graphql/image_index/, where the server looks by default, whatever the working directory
+IMAGE_INDEX_PATH = os.getenv('IMAGE_INDEX_PATH', os.path.join(GRAPHQL_SERVER_DIR, '..', 'image_index', 'images.sqlite'))
+BATCH_SIZE = 200        # rows per transaction
+FLUSH_INTERVAL = 0.5    # seconds a row waits at most before being committed
+
+
+class ImageIndex:
+    """
+    SQLite index of the stored images, keyed by (robot_id, timestamp), so time-range lookups are
+    answered locally instead of through the per-frame Influx points.
+
+    Inserts and deletes are queued and committed by a background thread in batches of up to
+    `batch_size` rows, at least every `flush_interval` seconds. The database is in WAL mode, so
+    the GraphQL server can read it while the bridge writes.
+
+    Attributes:
+        path (str): Path of the SQLite file.
+        batch_size (int): Maximum number of rows per transaction.
+        flush_interval (float): Maximum time (seconds) a row waits before being committed.
+    """
+
+    def __init__(self, path=IMAGE_INDEX_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.running = True
+        self.metrics = {
+            'inserted': 0,
+            'deleted': 0,
+            'batches': 0,
+            'failed_batches': 0,
+        }
+
+        # The connection is only used by the writer thread
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+        self.thread = threading.Thread(target=self._run, name='image-index', daemon=True)
+        self.thread.start()
+
+    def add(self, robot_id, timestamp, path, size, reference=False):
+        """
+        Queues an image row. Never blocks on the database.
+        """
+        self._enqueue(('insert', (int(robot_id), int(timestamp), path, int(size), int(reference))))
+
+    def remove(self, robot_id, timestamp, path=None):
+        """
+        Queues the removal of an image row (e.g. evicted from the image store). With `path`, the
+        reference rows pointing at that file are removed too.
+        """
+        if path is None:
+            self._enqueue(('delete', (int(robot_id), int(timestamp))))
+        else:
+            self._enqueue(('delete_file', (int(robot_id), int(timestamp), path)))
+
+    def remove_before(self, robot_id, timestamp):
+        """
+        Queues the removal of every row of a robot older than `timestamp`.
+        """
+        self._enqueue(('delete_before', (int(robot_id), int(timestamp))))
+
+    def query(self, robot_id, start=None, end=None, limit=None):
+        """
+        Returns the rows of a robot with start <= timestamp <= end, oldest first. With `limit`,
+        only the newest `limit` rows of the range are returned. Rows still queued are not included.
+
+        Returns:
+            list: (robot_id, timestamp, path, size, reference) tuples.
+        """
+        connection = connect_read_only(self.path)
+        try:
+            return query_index(connection, robot_id, start, end, limit)
+        finally:
+            connection.close()
+
+    def _enqueue(self, operation):
+        with self.condition:
+            self.pending.append(operation)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.running and len(self.pending) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                running = self.running
+
+            if batch:
+                self._write(batch)
+            elif not running:
+                break
+
+        # The writer owns the connection, so it cannot be closed under a commit
+        self.connection.close()
+
+    def _write(self, batch):
+        inserts = [row for operation, row in batch if operation == 'insert']
+        deletes = [row for operation, row in batch if operation != 'insert']
+        try:
+            with self.connection:
+                # Apply in queue order: a frame can be stored again after being evicted
+                for operation, row in batch:
+                    if operation == 'insert':
+                        self.connection.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)', row)
+                    elif operation == 'delete':
+                        self.connection.execute('DELETE FROM images WHERE robot_id = ? AND timestamp = ?', row)
+                    elif operation == 'delete_file':
+                        self.connection.execute('DELETE FROM images WHERE robot_id = ? AND (timestamp = ? OR path = ?)',
+                                                row)
+                    else:
+                        self.connection.execute('DELETE FROM images WHERE robot_id = ? AND timestamp < ?', row)
+            self.metrics['inserted'] += len(inserts)
+            self.metrics['deleted'] += len(deletes)
+            self.metrics['batches'] += 1
+        except sqlite3.Error as e:
+            self.metrics['failed_batches'] += 1
+            print(f"Failed to write {len(batch)} image index rows: {e}")
+
+    def get_metrics(self):
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics['pending'] = len(self.pending)
+        return metrics
+
+    def close(self, timeout=5):
+        """
+        Commits the queued rows and stops the writer thread, which then closes the connection.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"Image index writer still committing after {timeout} s, it will close the database when done")
+
@@ -0,0 +1,310 @@
+import os
+import bisect
+import shutil
+import threading
+from collections import deque
+
+DEFAULT_ROOT = 'images'
+DEFAULT_MAX_BYTES_PER_ROBOT = 2 * 1024 * 1024 * 1024  # 2 GB
+DEFAULT_MAX_AGE = 7 * 24 * 3600                       # seconds
+DEFAULT_BUCKET_SECONDS = 3600                         # one directory per robot per hour
+MAX_EVICTIONS_PER_PUT = 16                            # bounds the eviction work done by one write
+
+
+class ImageStore:
+    """
+    Disk-bounded archive of received images, with one ring buffer per robot.
+
+    Files are stored as `<root>/<robot_id>/<bucket>/image_<robot_id>_<timestamp>.<ext>`, where
+    `bucket` is the timestamp rounded down to `bucket_seconds`, so no directory grows without
+    bound. Each robot's buffer is bounded by `max_bytes_per_robot` and `max_age`; the oldest
+    frames are evicted a few at a time on every write, never by scanning the directories.
+
+    The index (robot, timestamp) -> path is kept in memory and rebuilt at startup by listing
+    the bucket directories; whole buckets that are past `max_age` are deleted without listing.
+
+    Attributes:
+        root (str): Root directory of the archive.
+        max_bytes_per_robot (int): Maximum total size of one robot's images.
+        max_age (float): Maximum age (seconds) of an image, relative to the newest timestamp of that robot.
+        bucket_seconds (int): Time span covered by one directory.
+        on_evict (callable): Called with (robot_id, timestamp, path) for every evicted image, or None.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, max_bytes_per_robot=DEFAULT_MAX_BYTES_PER_ROBOT, max_age=DEFAULT_MAX_AGE,
+                 bucket_seconds=DEFAULT_BUCKET_SECONDS, on_evict=None):
+        self.root = root
+        self.max_bytes_per_robot = max_bytes_per_robot
+        self.max_age = max_age
+        self.bucket_seconds = bucket_seconds
+        self.on_evict = on_evict
+
+        self.lock = threading.Lock()
+        self.frames = dict()        # robot_id -> deque of (timestamp, path, size), oldest first
+        self.timestamps = dict()    # robot_id -> deque of timestamps, parallel to frames, for bisect
+        self.bytes_used = dict()    # robot_id -> total bytes
+        self.index = dict()         # (robot_id, timestamp) -> path
+        self.bucket_counts = dict() # bucket directory -> number of files
+        self.metrics = {
+            'stored': 0,
+            'evicted': 0,
+            'evicted_bytes': 0,
+        }
+
+        os.makedirs(self.root, exist_ok=True)
+        self.rebuild()
+
+    def bucket_dir(self, robot_id, timestamp):
+        bucket = int(timestamp) // self.bucket_seconds * self.bucket_seconds
+        return os.path.join(self.root, str(robot_id), str(bucket))
+
+    def put(self, robot_id, timestamp, data, extension):
+        """
+        Writes an image and evicts the oldest images of that robot if its buffer is over budget.
+
+        Args:
+            robot_id (int): The ID of the robot that sent the image.
+            timestamp (int): The timestamp of the image.
+            data (bytes): The encoded image.
+            extension (str): The file extension, e.g. 'png' or 'jpg'.
+
+        Returns:
+            str: The path of the stored image.
+        """
+        robot_id = int(robot_id)
+        directory = self.bucket_dir(robot_id, timestamp)
+        path = os.path.join(directory, f"image_{robot_id}_{timestamp}.{extension}")
+
+        try:
+            with open(path, 'wb') as f:
+                f.write(data)
+        except FileNotFoundError:
+            # New bucket, or the bucket was just emptied by an eviction
+            os.makedirs(directory, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        with self.lock:
+            old_path = self.index.get((robot_id, timestamp))
+            if old_path is not None:
+                # Same frame received again, replace the old entry
+                self._remove(robot_id, timestamp)
+            self._add(robot_id, timestamp, path, len(data))
+            self.metrics['stored'] += 1
+            evicted = self._evict(robot_id, MAX_EVICTIONS_PER_PUT)
+
+        if old_path is not None and old_path != path:
+            self._delete_file(old_path)
+        self._finish_evictions(evicted)
+        return path
+
+    def get_path(self, robot_id, timestamp):
+        with self.lock:
+            return self.index.get((int(robot_id), timestamp))
+
+    def latest(self, robot_id):
+        """
+        Returns:
+            tuple: (timestamp, path) of the newest image of the robot, or None.
+        """
+        with self.lock:
+            frames = self.frames.get(int(robot_id))
+            if not frames:
+                return None
+            timestamp, path, _ = frames[-1]
+            return timestamp, path
+
+    def oldest(self, robot_id):
+        """
+        Returns:
+            tuple: (timestamp, path) of the oldest image of the robot, or None.
+        """
+        with self.lock:
+            frames = self.frames.get(int(robot_id))
+            if not frames:
+                return None
+            timestamp, path, _ = frames[0]
+            return timestamp, path
+
+    def robots(self):
+        with self.lock:
+            return [robot_id for robot_id, frames in self.frames.items() if frames]
+
+    def query(self, robot_id, start=None, end=None, limit=None):
+        """
+        Returns the robot's images with start <= timestamp <= end, oldest first.
+
+        Returns:
+            list: (timestamp, path) tuples.
+        """
+        with self.lock:
+            robot_id = int(robot_id)
+            frames = self.frames.get(robot_id)
+            if not frames:
+                return []
+            timestamps = self.timestamps[robot_id]
+            first = 0 if start is None else bisect.bisect_left(timestamps, start)
+            last = len(timestamps) if end is None else bisect.bisect_right(timestamps, end)
+            if limit is not None:
+                last = min(last, first + limit)
+            return [(frames[i][0], frames[i][1]) for i in range(first, last)]
+
+    def evict(self):
+        """
+        Runs eviction to completion for every robot (e.g. from a periodic maintenance call).
+        """
+        with self.lock:
+            evicted = []
+            for robot_id in list(self.frames):
+                evicted.extend(self._evict(robot_id, None))
+        self._finish_evictions(evicted)
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['robots'] = len(self.frames)
+            metrics['images'] = len(self.index)
+            metrics['bytes'] = sum(self.bytes_used.values())
+        return metrics
+
+    def rebuild(self):
+        """
+        Rebuilds the in-memory index from the directory tree. Buckets entirely older than
+        `max_age` are deleted without being listed.
+        """
+        with self.lock:
+            self.frames.clear()
+            self.timestamps.clear()
+            self.bytes_used.clear()
+            self.index.clear()
+            self.bucket_counts.clear()
+
+            for robot_entry in os.scandir(self.root):
+                if not robot_entry.is_dir() or not robot_entry.name.lstrip('-').isdigit():
+                    continue
+                robot_id = int(robot_entry.name)
+
+                buckets = sorted((int(entry.name), entry.path) for entry in os.scandir(robot_entry.path)
+                                 if entry.is_dir() and entry.name.isdigit())
+                if not buckets:
+                    continue
+
+                newest_bucket = buckets[-1][0]
+                for bucket, bucket_path in buckets:
+                    if self.max_age is not None and bucket + self.bucket_seconds <= newest_bucket - self.max_age:
+                        shutil.rmtree(bucket_path, ignore_errors=True)
+                        continue
+
+                    entries = []
+                    for entry in os.scandir(bucket_path):
+                        timestamp = self._parse_timestamp(entry.name)
+                        if timestamp is not None and entry.is_file():
+                            entries.append((timestamp, entry.path, entry.stat().st_size))
+                    for timestamp, path, size in sorted(entries):
+                        self._add(robot_id, timestamp, path, size)
+
+            evicted = []
+            for robot_id in list(self.frames):
+                evicted.extend(self._evict(robot_id, None))
+
+        self._finish_evictions(evicted)
+
+    @staticmethod
+    def _parse_timestamp(filename):
+        # image_<robot_id>_<timestamp>.<ext>
+        stem = filename.rsplit('.', 1)[0]
+        parts = stem.split('_')
+        if len(parts) != 3 or parts[0] != 'image':
+            return None
+        try:
+            return int(parts[2])
+        except ValueError:
+            return None
+
+    def _add(self, robot_id, timestamp, path, size):
+        frames = self.frames.setdefault(robot_id, deque())
+        timestamps = self.timestamps.setdefault(robot_id, deque())
+
+        if not timestamps or timestamp >= timestamps[-1]:
+            frames.append((timestamp, path, size))
+            timestamps.append(timestamp)
+        else:
+            # Out of order frame, rare
+            i = bisect.bisect_right(timestamps, timestamp)
+            frames.insert(i, (timestamp, path, size))
+            timestamps.insert(i, timestamp)
+
+        self.bytes_used[robot_id] = self.bytes_used.get(robot_id, 0) + size
+        self.index[(robot_id, timestamp)] = path
+        directory = os.path.dirname(path)
+        self.bucket_counts[directory] = self.bucket_counts.get(directory, 0) + 1
+
+    def _remove(self, robot_id, timestamp):
+        timestamps = self.timestamps[robot_id]
+        i = bisect.bisect_left(timestamps, timestamp)
+        _, path, size = self.frames[robot_id][i]
+        del self.frames[robot_id][i]
+        del timestamps[i]
+        self.bytes_used[robot_id] -= size
+        self.index.pop((robot_id, timestamp), None)
+        self._release_bucket(path)
+
+    def _evict(self, robot_id, max_evictions):
+        """
+        Pops the oldest frames of a robot while it is over budget. Must be called with the lock held.
+
+        Returns:
+            list: (robot_id, timestamp, path) of the evicted frames, for _finish_evictions() once
+            the lock is released.
+        """
+        frames = self.frames[robot_id]
+        timestamps = self.timestamps[robot_id]
+        evicted = []
+
+        while frames and (max_evictions is None or len(evicted) < max_evictions):
+            timestamp, path, size = frames[0]
+            over_bytes = self.max_bytes_per_robot is not None and self.bytes_used[robot_id] > self.max_bytes_per_robot
+            too_old = self.max_age is not None and timestamp < timestamps[-1] - self.max_age
+            if not (over_bytes or too_old):
+                break
+
+            frames.popleft()
+            timestamps.popleft()
+            self.bytes_used[robot_id] -= size
+            self.index.pop((robot_id, timestamp), None)
+            self._release_bucket(path)
+            self.metrics['evicted'] += 1
+            self.metrics['evicted_bytes'] += size
+            evicted.append((robot_id, timestamp, path))
+
+        return evicted
+
+    def _finish_evictions(self, evicted):
+        for robot_id, timestamp, path in evicted:
+            self._delete_file(path)
+            if self.on_evict is not None:
+                self.on_evict(robot_id, timestamp, path)
+
+    def _release_bucket(self, path):
+        directory = os.path.dirname(path)
+        count = self.bucket_counts.get(directory, 0) - 1
+        if count <= 0:
+            self.bucket_counts.pop(directory, None)
+        else:
+            self.bucket_counts[directory] = count
+
+    def _delete_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+        # Remove the bucket directory once its last file is gone
+        directory = os.path.dirname(path)
+        with self.lock:
+            if directory in self.bucket_counts:
+                return
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
@@ -7,217 +7,387 @@ from cyclonedds.core import Qos, Policy, Listener
 
 import influxdb_client
 from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
 
 import time
 import json
 import numpy as np
 import signal
 import os
+import io
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
-from message_defs import ImageMessage, reliable_qos, best_effort_qos, get_ip
-
-AGENTS_QUERY = """
-                    query {
-                        subscribed_agents {
-                            id
-                        }
-                    }
-               """ 
-
-TRANSFORM_QUERY =   """
-                        query {
-                            transform {
-                                R
-                                t
-                                timestamp
-                            }
-                        }   
-                    """
+from bridge import Bridge, AgentTopicHandler, run_bridge
+from transforms import RigidTransform2D
+from sample_utils import SampleCounter, take_samples
+from image_codec import decode_image, encoded_payload
+from image_store import ImageStore
+from image_index import ImageIndex, IMAGE_INDEX_PATH
+from rate_control import FrameRateController
+from image_hash import DuplicateFilter, sample_dhash
+from message_defs import ImageMessage, CompressedImageMessage, reliable_qos, best_effort_qos, get_ip, octets
+
+# Persistence settings, overridable from the environment
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'source')                    # 'source', 'png' or 'jpeg'
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', '85'))       # 1-95
+IMAGE_PNG_COMPRESS_LEVEL = int(os.getenv('IMAGE_PNG_COMPRESS_LEVEL', '1'))  # 0-9, PIL's default of 6 is several times slower
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+IMAGE_MAX_IN_FLIGHT = int(os.getenv('IMAGE_MAX_IN_FLIGHT', '8'))
+IMAGE_DIR = os.getenv('IMAGE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images'))
+IMAGE_STATS_PERIOD = 10  # seconds between the per-robot frame count points
+IMAGE_MAX_MB_PER_ROBOT = int(os.getenv('IMAGE_MAX_MB_PER_ROBOT', '2048'))
+IMAGE_MAX_AGE_HOURS = float(os.getenv('IMAGE_MAX_AGE_HOURS', '168'))
+IMAGE_TARGET_FPS = float(os.getenv('IMAGE_TARGET_FPS', '0')) or None                      # per robot, 0 for no limit
+IMAGE_MAX_BYTES_PER_SECOND = float(os.getenv('IMAGE_MAX_BYTES_PER_SECOND', '0')) or None  # all robots, 0 for no limit
+IMAGE_INFLUX_INDEX = os.getenv('IMAGE_INFLUX_INDEX', '0') == '1'  # Also write one image_data Influx point per frame
+IMAGE_DEDUP_THRESHOLD = int(os.getenv('IMAGE_DEDUP_THRESHOLD', '4'))          # bits out of 64, -1 to store every frame
+IMAGE_DEDUP_MODE = os.getenv('IMAGE_DEDUP_MODE', 'skip')                      # 'skip' or 'reference'
+IMAGE_DEDUP_MAX_INTERVAL = float(os.getenv('IMAGE_DEDUP_MAX_INTERVAL', '60'))  # seconds, a frame is stored at least this often
+
+
+class ImagePersistencePipeline:
+    """
+    Decodes, encodes and writes received images on a thread pool, so the DDS callback only hands
+    the sample over and returns.
+
+    The number of frames queued or being written is bounded by `max_in_flight`. When the pool
+    falls behind, new frames are dropped (and counted) instead of blocking the reader. Files are
+    written to an ImageStore, which bounds the archive per robot, and recorded in a SQLite
+    ImageIndex that the GraphQL server queries (when the store evicts a file, its row and the
+    reference rows pointing at it are removed).
+    Per-frame image_data Influx points are optional. If `frame_url` is set, every frame is also
+    sent to the GraphQL server's latest-frame cache.
+
+    Near-duplicates of a robot's last stored frame (by perceptual hash) are not written. In 'skip'
+    mode they are dropped entirely; in 'reference' mode only an index row pointing at the stored
+    frame is written. They still refresh the latest-frame cache.
+
+    Attributes:
+        image_format (str): 'source' writes JPEG/PNG payloads as received and raw pixels as PNG;
+            'png' or 'jpeg' re-encodes every frame to that format.
+        jpeg_quality (int): Quality used when encoding JPEG.
+        png_compress_level (int): zlib level used when encoding PNG.
+        max_in_flight (int): Maximum number of frames queued or being written.
+        telemetry_writer (TelemetryWriter): Writer for the image_data points, or None to not write them.
+        store (ImageStore): The image archive.
+        index (ImageIndex): The image index, or None.
+        frame_url (str): Base URL of the server's /images routes, or None.
+        duplicate_filter (DuplicateFilter): Near-duplicate detection, or None to store every frame.
+        dedup_mode (str): 'skip' or 'reference'.
+        on_frame_done (callable): Called with (robot_id, stored) once a submitted frame is stored or
+            dropped, or None.
+    """
+
+    def __init__(self, telemetry_writer=None, image_format=IMAGE_FORMAT, jpeg_quality=IMAGE_JPEG_QUALITY,
+                 png_compress_level=IMAGE_PNG_COMPRESS_LEVEL, workers=IMAGE_WORKERS,
+                 max_in_flight=IMAGE_MAX_IN_FLIGHT, store=None, index=None, frame_url=None, dedup_threshold=IMAGE_DEDUP_THRESHOLD,
+                 dedup_mode=IMAGE_DEDUP_MODE, dedup_max_interval=IMAGE_DEDUP_MAX_INTERVAL, on_frame_done=None):
+        if image_format not in ('source', 'png', 'jpeg'):
+            raise ValueError(f"Unknown image format '{image_format}'")
+        if dedup_mode not in ('skip', 'reference'):
+            raise ValueError(f"Unknown dedup mode '{dedup_mode}'")
+
+        self.telemetry_writer = telemetry_writer
+        self.image_format = image_format
+        self.jpeg_quality = jpeg_quality
+        self.png_compress_level = png_compress_level
+        self.max_in_flight = max_in_flight
+        self.index = index
+        if store is None:
+            store = ImageStore(IMAGE_DIR, max_bytes_per_robot=IMAGE_MAX_MB_PER_ROBOT * 1024 * 1024,
+                               max_age=IMAGE_MAX_AGE_HOURS * 3600,
+                               on_evict=index.remove if index is not None else None)
+            if index is not None:
+                # Drop the rows of the images deleted while the bridge was not running
+                for robot_id in store.robots():
+                    index.remove_before(robot_id, store.oldest(robot_id)[0])
+        self.store = store
+        self.frame_url = frame_url
+        self.duplicate_filter = None
+        if dedup_threshold >= 0:
+            self.duplicate_filter = DuplicateFilter(threshold=dedup_threshold, max_interval=dedup_max_interval)
+        self.dedup_mode = dedup_mode
+        self.on_frame_done = on_frame_done
+        self.sessions = threading.local()  # One HTTP session (kept-alive connection) per worker
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-writer')
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            'submitted': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'bytes_written': 0,
+            'duplicates': 0,
+            'hash_failed': 0,
+            'uploaded': 0,
+            'upload_failed': 0,
+        }
+
+    def submit(self, robot_id, sample):
+        """
+        Queues a sample for persistence. Never blocks.
+
+        Args:
+            robot_id (int): The ID of the robot that sent the image.
+            sample (CompressedImageMessage or ImageMessage): The received sample.
+
+        Returns:
+            bool: True if the frame was queued, False if it was dropped.
+        """
+        if not self.slots.acquire(blocking=False):
+            with self.metrics_lock:
+                self.metrics['dropped'] += 1
+            self._frame_done(robot_id, False)
+            return False
+
+        with self.metrics_lock:
+            self.metrics['submitted'] += 1
+        try:
+            self.executor.submit(self._persist, robot_id, sample)
+        except RuntimeError:
+            # Pool already shut down
+            self.slots.release()
+            self._frame_done(robot_id, False)
+            return False
+        return True
+
+    def _frame_done(self, robot_id, stored):
+        if self.on_frame_done is not None:
+            self.on_frame_done(robot_id, stored)
+
+    def encode(self, sample):
+        """
+        Returns:
+            tuple: (encoded bytes, file extension) for the configured format.
+        """
+        payload, extension = encoded_payload(sample)
+        if payload is not None and self.image_format in ('source', sample.encoding):
+            return payload, extension
+
+        image = Image.fromarray(decode_image(sample), 'RGB')
+        buffer = io.BytesIO()
+        if self.image_format == 'jpeg':
+            image.save(buffer, format='JPEG', quality=self.jpeg_quality)
+            return buffer.getvalue(), 'jpg'
+        image.save(buffer, format='PNG', compress_level=self.png_compress_level)
+        return buffer.getvalue(), 'png'
+
+    def _persist(self, robot_id, sample):
+        stored = False
+        try:
+            frame_hash = None
+            if self.duplicate_filter is not None:
+                try:
+                    frame_hash = sample_dhash(sample)
+                except Exception as e:
+                    # Store the frame without deduplication rather than losing it
+                    with self.metrics_lock:
+                        self.metrics['hash_failed'] += 1
+                    print(f"Failed to hash image from robot {robot_id}, storing it anyway: {e}")
+
+            if frame_hash is None:
+                data, extension, image_filename = self.store_frame(robot_id, sample)
+            else:
+                # Compare and record under the robot's lock, so concurrent near-duplicates are caught
+                with self.duplicate_filter.robot_lock(robot_id):
+                    reference = self.duplicate_filter.find_reference(robot_id, frame_hash, sample.timestamp)
+                    if reference is None:
+                        data, extension, image_filename = self.store_frame(robot_id, sample)
+                        self.duplicate_filter.stored(robot_id, frame_hash, sample.timestamp, image_filename)
+
+                if reference is not None:
+                    with self.metrics_lock:
+                        self.metrics['duplicates'] += 1
+                    if self.frame_url is not None:
+                        # Not stored, but the robot is still sending: keep its latest frame current
+                        self.upload_frame(robot_id, sample.timestamp, *self.encode(sample))
+                    if self.dedup_mode == 'reference':
+                        self.write_index(robot_id, sample.timestamp, reference, 0, reference=True)
+                    return
+
+            if self.frame_url is not None:
+                self.upload_frame(robot_id, sample.timestamp, data, extension)
+
+            self.write_index(robot_id, sample.timestamp, image_filename, len(data))
+
+            with self.metrics_lock:
+                self.metrics['written'] += 1
+                self.metrics['bytes_written'] += len(data)
+            stored = True
+        except Exception as e:
+            with self.metrics_lock:
+                self.metrics['failed'] += 1
+            print(f"Failed to save image from robot {robot_id}: {e}")
+        finally:
+            self.slots.release()
+            self._frame_done(robot_id, stored)
+
+    def store_frame(self, robot_id, sample):
+        """
+        Encodes the sample and writes it to the image store.
+
+        Returns:
+            tuple: (encoded data, file extension, stored file name)
+        """
+        data, extension = self.encode(sample)
+        return data, extension, self.store.put(robot_id, sample.timestamp, data, extension)
+
+    def write_index(self, robot_id, timestamp, image_filename, size, reference=False):
+        if self.index is not None:
+            self.index.add(robot_id, timestamp, image_filename, size, reference=reference)
+
+        # Write file name to influxDB
+        if self.telemetry_writer is not None:
+            point = Point("image_data") \
+                .tag("robot_id", robot_id) \
+                .field("image_filename", image_filename) \
+                .time(timestamp, WritePrecision.S)
+            if reference:
+                point = point.field("reference", True)
+            self.telemetry_writer.write(point)
+
+    def upload_frame(self, robot_id, timestamp, data, extension):
+        """
+        Sends the encoded frame to the server's latest-frame cache.
+        """
+        session = getattr(self.sessions, 'session', None)
+        if session is None:
+            session = self.sessions.session = requests.Session()
+
+        content_type = 'image/jpeg' if extension == 'jpg' else 'image/png'
+        try:
+            response = session.put(f"{self.frame_url}/{robot_id}", data=data, timeout=1,
+                                   headers={'Content-Type': content_type, 'X-Timestamp': str(timestamp)})
+            uploaded = response.status_code in (204, 409)  # 409: a newer frame was already cached
+        except requests.RequestException:
+            uploaded = False
+
+        with self.metrics_lock:
+            self.metrics['uploaded' if uploaded else 'upload_failed'] += 1
+
+    def get_metrics(self):
+        with self.metrics_lock:
+            return dict(self.metrics)
+
+    def close(self):
+        """
+        Waits for the queued frames to be written and stops the pool.
+        """
+        self.executor.shutdown(wait=True)
+        if self.index is not None:
+            self.index.close()
+
 
 class ImageListener(Listener):
 
-    def __init__(self, my_id, topic_id, graphql_server, influx_write_api=None):
+    def __init__(self, my_id, topic_id, graphql_server, pipeline, rate_controller):
         super().__init__()
+        self.sample_counter = SampleCounter()
         self.my_id = my_id
         self.topic_id = topic_id
         self.graphql_server = graphql_server
         self.detected_object_num = 0
         self.object_dict = dict()
 
-        self.R = None
-        self.t = None
-
-        self.influx_write_api = influx_write_api
+        self.transform = RigidTransform2D()
 
-    def transform_point(self, point, forward=True):
-        if self.R is None:
-            return point
-
-        point_xy = np.array([point[0], point[1]])
-        if forward:
-            new_point_xy = self.R @ point_xy + self.t
-            new_point_theta = point[2] + np.arctan2(self.R[1, 0], self.R[0, 0])
-            return np.concatenate((new_point_xy, [new_point_theta]))
-        else:
-            new_point_xy = self.R.T @ (point_xy - self.t)
-            new_point_theta = point[2] - np.arctan2(self.R[1, 0], self.R[0, 0])
-            return np.concatenate((new_point_xy, [new_point_theta]))
+        self.pipeline = pipeline
+        self.rate_controller = rate_controller
 
-    def update_transformation(self, R, t):
-        self.R = R
-        self.t = t
+    def update_transformation(self, transform):
+        self.transform = transform
 
     def on_data_available(self, reader):
-        for sample in reader.read():
-
-            timestamp = sample.timestamp
-            print(f"Received image with timestamp: {timestamp}")
-
-            # Save the image to a file
-            image_data = np.array(sample.data)
-            image_array = image_data.reshape((sample.height, sample.width, 3))
-            image = Image.fromarray(image_array.astype('uint8'), 'RGB')
-            image_filename = "images/image_{}_{}.png".format(self.topic_id, timestamp)  # Image format is image_topic_{id}_{timestamp}.png
-            image.save(image_filename)
-
-            # Write file name to influxDB
-            if self.influx_write_api is not None:
-                point = Point("image_data") \
-                    .tag("robot_id", self.topic_id) \
-                    .field("image_filename", image_filename) \
-                    .time(timestamp, WritePrecision.S)
-                self.influx_write_api.write(bucket="first_bucket", org="eig", record=point)
-
-
-class ImageSubscriber:
-
-    def __init__(self, my_id, server_url=None, influx_client=None):
-
-        self.my_id = my_id
-        self.influx_client = influx_client
-        self.influx_write_api = self.influx_client.write_api(write_options=SYNCHRONOUS)
-
-        self.my_ip = get_ip()
-        # GraphQL server URL
-        if server_url is None:
-            self.graphql_server =  f"http://{self.my_ip}:8000/graphql" 
+        for sample in take_samples(reader, self.sample_counter):
+            self.handle_sample(sample)
+
+    def handle_sample(self, sample):
+        """
+        Handles one image, received whole or reassembled from fragments.
+        """
+        # Drop frames over this robot's rate or byte budget before any decode
+        if not self.rate_controller.admit(self.topic_id, len(sample.data), getattr(sample, 'tagged', False)):
+            return
+
+        if isinstance(sample, CompressedImageMessage):
+            sample.data = octets(sample.data)  # A list of ints as received from DDS, converted once admitted
+
+        # Decode, encode and write happen on the pipeline's pool
+        if self.pipeline.submit(self.topic_id, sample):
+            self.rate_controller.on_processed()
         else:
-            self.graphql_server = server_url
-
-        self.subscribed_agents = self.get_agents()
-
-        # Get the transformation matrix from Ignite
-        self.R = None
-        self.t = None
-
-        self.get_transform()
-
-        self.lease_duration_ms = 30000
-        qos_profile = DomainParticipantQos()
-        qos_profile.lease_duration = duration(milliseconds=self.lease_duration_ms)
-
-        # Create a DomainParticipant, Subscriber, and Publisher
-        self.participant = DomainParticipant(qos=qos_profile)
-        self.subscriber = Subscriber(self.participant)
-
-        self.image_listeners = dict()
-        self.image_readers = dict()
-
-        for agent_id in self.subscribed_agents:
-            print(f"Subscribed to agent {agent_id} images")
-            new_image_topic = Topic(self.participant, 'ImageTopic' + str(agent_id), ImageMessage)
-            self.image_listeners[agent_id] = ImageListener(my_id, agent_id, self.graphql_server, influx_write_api=self.influx_write_api)
-            self.image_listeners[agent_id].update_transformation(self.R, self.t)
-            self.image_readers[agent_id] = DataReader(self.subscriber, new_image_topic, listener=self.image_listeners[agent_id], qos=reliable_qos)
-
-    def run(self):
-        while True:
-
+            self.rate_controller.on_overload()
+
+
+class ImageSubscriber(AgentTopicHandler):
+    """
+    Bridge handler that subscribes to CompressedImageTopic<id>, ImageFragmentTopic<id> (images
+    sent as fragments) and, for older robots, the legacy ImageTopic<id> for every agent in the
+    environment. All readers share the agent's listener.
+    """
+    name = 'image'
+    uses_transform = True
+    uses_influx = True
+
+    topic_prefix = 'ImageTopic'
+    data_type = ImageMessage
+    qos = reliable_qos
+    label = 'images'
+
+    compressed_topic_prefix = 'CompressedImageTopic'
+    fragment_topic_prefix = 'ImageFragmentTopic'
+
+    def __init__(self, bridge):
+        super().__init__(bridge)
+        self.compressed_readers = dict()
+        frame_url = bridge.graphql_server.rsplit('/graphql', 1)[0] + '/images'
+        telemetry_writer = bridge.telemetry_writer if IMAGE_INFLUX_INDEX else None
+        self.rate_controller = FrameRateController(target_fps=IMAGE_TARGET_FPS, max_bytes_per_second=IMAGE_MAX_BYTES_PER_SECOND)
+        self.pipeline = ImagePersistencePipeline(telemetry_writer=telemetry_writer, index=ImageIndex(IMAGE_INDEX_PATH),
+                                                 frame_url=frame_url, on_frame_done=self.rate_controller.on_frame_done)
+
+    def on_agents_changed(self, new_agents, old_agents):
+        super().on_agents_changed(new_agents, old_agents)
+
+        for agent_id in new_agents:
             try:
-                agents_to_subscribe = self.get_agents()
-                new_agents = agents_to_subscribe - self.subscribed_agents
-                old_agents = self.subscribed_agents - agents_to_subscribe
-
-                for agent_id in new_agents:
-                    if int(agent_id) == int(self.my_id):
-                        continue
-
-                    print(f"    Subscribed to agent {agent_id} images")
-                    new_image_topic = Topic(self.participant, 'ImageTopic' + str(agent_id), ImageMessage)
-                    self.image_listeners[agent_id] = ImageListener(self.my_id, agent_id, self.graphql_server, influx_write_api=self.influx_write_api)
-                    self.image_listeners[agent_id].update_transformation(self.R, self.t)
-                    self.image_readers[agent_id] = DataReader(self.subscriber, new_image_topic, listener=self.image_listeners[agent_id], qos=reliable_qos)
-
-
-                for agent_id in old_agents:
-                    print(f"    Unsubscribed from agent {agent_id} images")
-                    self.image_listeners[agent_id] = None
-                    self.image_readers[agent_id] = None
-                    self.image_listeners.pop(agent_id)
-                    self.image_readers.pop(agent_id)
-
-                self.subscribed_agents = agents_to_subscribe
+                topic = self.bridge.get_topic(self.compressed_topic_prefix + str(agent_id), CompressedImageMessage)
+                self.compressed_readers[agent_id] = DataReader(self.bridge.subscriber, topic, listener=self.listeners[agent_id], qos=self.qos)
             except Exception as e:
-                pass
-
-            time.sleep(1)
+                print(f"    Could not subscribe to agent {agent_id} compressed images: {e}")
 
-    def get_agents(self):
-        # Query for any agents
-        response = requests.post(self.graphql_server, json={'query': AGENTS_QUERY}, timeout=1)
-        if response.status_code == 200:
-            data = response.json()
+        for agent_id in old_agents:
+            self.compressed_readers.pop(agent_id, None)
 
-            # Get the agent ids from the response
-            agent_ids = data.get('data', {}).get('subscribed_agents', {}).get('id', [])
-
-            if int(self.my_id) in agent_ids:
-                agent_ids.remove(int(self.my_id))
-            elif self.my_id in agent_ids:
-                agent_ids.remove(self.my_id)
-
-            if len(agent_ids):
-                return set(agent_ids)
-            else:
-                return set()
-        else:
-            return set()
-
-    def get_transform(self):
-        # Query for the transform
-        response = requests.post(self.graphql_server, json={'query': TRANSFORM_QUERY}, timeout=1)
-        data = response.json()
-        transform = data.get('data', {}).get('transform', {})
-        R = transform.get('R', [])
-        t = transform.get('t', [])
-        
-        while len(R) != 4 or len(t) != 2:
-            response = requests.post(self.graphql_server, json={'query': TRANSFORM_QUERY}, timeout=1)
-            data = response.json()
-            transform = data.get('data', {}).get('transform', {})
-            R = transform.get('R', [])
-            t = transform.get('t', [])
-            time.sleep(1)
-
-        self.R = np.array(R).reshape((2, 2))
-        self.t = np.array(t)
+    def run(self):
+        # Publish the per-robot admitted/processed/dropped counts alongside the other telemetry
+        while self.bridge.telemetry_writer is not None:
+            time.sleep(IMAGE_STATS_PERIOD)
+            for robot_id, counts in self.rate_controller.get_stats().items():
+                point = Point("image_frames").tag("robot_id", robot_id)
+                for field, value in counts.items():
+                    point = point.field(field, value)
+                self.bridge.telemetry_writer.write(point)
+
+    def make_listener(self, agent_id):
+        return ImageListener(self.bridge.my_id, agent_id, self.bridge.graphql_server, self.pipeline, self.rate_controller)
 
     def shutdown(self):
+        self.pipeline.close()
+        print(f"Image persistence: {self.pipeline.get_metrics()}")
+        print(f"Image store: {self.pipeline.store.get_metrics()}")
+        print(f"Image index: {self.pipeline.index.get_metrics()}")
+        print(f"Image reassembly: {self.reassembler.get_metrics()}")
+        for robot_id, counts in sorted(self.rate_controller.get_stats().items()):
+            print(f"    Robot {robot_id} frames: {counts}")
         print("Image Subscriber stopped\n")
 
 if __name__ == "__main__":
 
-    def handle_signal(sig, frame):
-        image_sub.shutdown()
-        exit(0)
-
-    # Set up signal handlers for SIGINT (Ctrl+C) and SIGTERM
-    signal.signal(signal.SIGTERM, handle_signal) # Handles termination signal
-
-    time.sleep(10)  # Wait for the participant to do entry and initialization
     # Create an instance of the ImageSubscriber
     agent_id = os.getenv('AGENT_ID')
     if agent_id is None:
@@ -230,17 +400,6 @@ if __name__ == "__main__":
     url = "http://localhost:8086"
     write_client = influxdb_client.InfluxDBClient(url=url, token=token, org=org)
 
-    image_sub = ImageSubscriber(agent_id, influx_client=write_client)
-
-    def handle_signal(sig, frame):
-        image_sub.shutdown()
-        exit(0)
-
-    # Set up signal handlers for SIGINT (Ctrl+C) and SIGTERM
-    signal.signal(signal.SIGTERM, handle_signal) # Handles termination signal
-
-    try:
-        image_sub.run()
-    except KeyboardInterrupt:
-        print('Exiting...')
-        exit(0)
\ No newline at end of file
+    # Run the image subscriber on its own bridge
+    bridge = Bridge(agent_id, [ImageSubscriber], influx_client=write_client, wait_for_setup=True)
+    run_bridge(bridge)
@@ -1,10 +1,14 @@
 from cyclonedds.util import duration
 from cyclonedds.idl import IdlStruct
-from cyclonedds.idl.types import sequence
+from cyclonedds.idl.types import sequence, uint8
 from cyclonedds.core import Qos, Policy
 
 from dataclasses import dataclass
 
+import os
+import json
+import zlib
+import base64
 import socket
 
 @dataclass
@@ -48,7 +52,9 @@ class Initialization(IdlStruct):
     Attributes:
         target_agent (int): The ID of the target agent.
         agents (str): A json dict of all the agents that the sending_agent is aware of.
-        known_points (str): 
+        known_points (str): A json list of the reference known points.
+
+    Both strings may be compressed, see encode_json_field().
     """
     target_agent: int
     sending_agent: int
@@ -101,6 +107,53 @@ class ImageMessage(IdlStruct):
     height: int
     encoding: str
 
+@dataclass
+class CompressedImageMessage(IdlStruct):
+    """
+    Represents an image message with an octet payload, sent on CompressedImageTopic<id>.
+
+    Attributes:
+        agent_id (int): The ID of the agent sending the image.
+        timestamp (int): The timestamp of the image message.
+        encoding (str): 'jpeg' or 'png' for an encoded file, 'raw' for packed rgb8 pixels.
+        width (int): The width of the image.
+        height (int): The height of the image.
+        data (sequence[uint8]): The encoded image, or the raw pixels (height * width * 3 bytes).
+        tagged (bool): Marks a priority frame (e.g. one with a detection), processed ahead of the others.
+    """
+    agent_id: int
+    timestamp: int
+    encoding: str
+    width: int
+    height: int
+    data: sequence[uint8]  # sequence<octet>, one byte per byte on the wire
+    tagged: bool = False
+
+@dataclass
+class FragmentMessage(IdlStruct):
+    """
+    One fragment of a large message, sent on <DataFragmentTopic|ImageFragmentTopic><id> or
+    InitializationFragmentTopic.
+
+    Attributes:
+        sending_agent (int): The ID of the agent sending the message.
+        message_id (int): ID of the message, unique per sending agent.
+        fragment_index (int): Position of this fragment, from 0 to fragment_count - 1.
+        fragment_count (int): Number of fragments of the message.
+        message_type (str): Name of the fragmented IdlStruct, e.g. 'DataMessage'.
+        total_size (int): Size of the serialized message.
+        timestamp (int): The timestamp of the message.
+        payload (sequence[uint8]): This fragment's slice of the serialized message.
+    """
+    sending_agent: int
+    message_id: int
+    fragment_index: int
+    fragment_count: int
+    message_type: str
+    total_size: int
+    timestamp: int
+    payload: sequence[uint8]  # sequence<octet>, a plain bytes field has no XTypes type object
+
 
 # Create different policies for the DDS entities
 reliable_qos = Qos(
@@ -115,6 +168,63 @@ best_effort_qos = Qos(
     Policy.Liveliness.ManualByParticipant(lease_duration=duration(milliseconds=30000))
 )
 
+LIVELINESS_LEASE_MS = int(os.getenv('LIVELINESS_LEASE_MS', 1000))  # lease offered by heartbeat writers
+
+# Heartbeat writers offer Automatic liveliness, which DDS asserts on its own between heartbeats, with
+# a short lease: a crashed agent's heartbeat writer is reported not alive once the lease runs out.
+heartbeat_writer_qos = Qos(
+    Policy.Reliability.BestEffort,
+    Policy.Durability.Volatile,
+    Policy.Liveliness.Automatic(lease_duration=duration(milliseconds=LIVELINESS_LEASE_MS))
+)
+
+# Heartbeat readers request the weakest liveliness (Automatic, 30 s), which every writer offering
+# Automatic or ManualByParticipant with a lease up to 30 s matches. Writers with a short lease
+# (heartbeat_writer_qos) are then detected as lost within that lease instead of the heartbeat
+# timeout; robots still offering best_effort_qos only after its 30 s lease.
+heartbeat_reader_qos = Qos(
+    Policy.Reliability.BestEffort,
+    Policy.Durability.Volatile,
+    Policy.Liveliness.Automatic(lease_duration=duration(milliseconds=30000))
+)
+
+# Fragments are small and many, so keep enough history that a burst is not overwritten in the
+# reader cache before it is taken. A lost fragment only loses its own message.
+fragment_qos = Qos(
+    Policy.Reliability.BestEffort,
+    Policy.Durability.Volatile,
+    Policy.History.KeepLast(depth=1024)
+)
+
+# Prefix of a compressed json string field: zlib-compressed json, base64 encoded
+COMPRESSED_JSON_PREFIX = 'zlib:'
+
+def encode_json_field(value, compress=False):
+    """
+    Serializes a value for a json string field of a message, optionally compressed.
+    """
+    text = json.dumps(value, separators=(',', ':'))
+    if not compress:
+        return text
+    return COMPRESSED_JSON_PREFIX + base64.b64encode(zlib.compress(text.encode(), 9)).decode('ascii')
+
+def decode_json_field(text):
+    """
+    Parses a json string field written by encode_json_field(), compressed or not.
+    """
+    if text.startswith(COMPRESSED_JSON_PREFIX):
+        text = zlib.decompress(base64.b64decode(text[len(COMPRESSED_JSON_PREFIX):])).decode()
+    return json.loads(text)
+
+def octets(value):
+    """
+    Returns a sequence[uint8] field as bytes. CycloneDDS accepts bytes when writing the field but
+    hands it back as a list of ints, so received payloads cost one copy here. A plain bytes field
+    would deserialize straight to bytes, but CycloneDDS cannot build a type object for it.
+    """
+    return value if isinstance(value, (bytes, bytearray, memoryview)) else bytes(value)
+
+
 def get_ip():
     # Get IP Address
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
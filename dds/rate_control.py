@@ -0,0 +1,182 @@
+import time
+import threading
+
+ACTIVE_WINDOW = 5.0         # seconds without a frame before a robot stops counting towards the fair share
+MIN_SCALE = 0.1             # Lowest fraction of the configured rates the controller backs off to
+BACKOFF_FACTOR = 0.8        # Multiplicative decrease when the pipeline is overloaded
+RECOVERY_STEP = 0.01        # Additive increase per frame processed without overload
+REBALANCE_PERIOD = 1.0      # seconds, how often shares are recomputed as robots go idle
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding at most `burst` tokens.
+    """
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def consume(self, amount, now, allow_debt=0):
+        """
+        Takes `amount` tokens if available. With `allow_debt`, the bucket may go that far below zero.
+
+        Returns:
+            bool: True if the tokens were taken.
+        """
+        self.refill(now)
+        if self.tokens - amount < -allow_debt:
+            return False
+        self.tokens -= amount
+        return True
+
+
+class RobotRateState:
+    def __init__(self, frame_bucket, byte_bucket, now):
+        self.frame_bucket = frame_bucket
+        self.byte_bucket = byte_bucket
+        self.last_seen = now
+        self.counts = {
+            'admitted': 0,
+            'processed': 0,
+            'tagged': 0,
+            'dropped_rate': 0,
+            'dropped_budget': 0,
+            'dropped_pipeline': 0,
+        }
+
+
+class FrameRateController:
+    """
+    Decides, before anything is decoded, which image frames the pipeline processes.
+
+    Every robot gets a frame-rate limit (`target_fps`) and a share of the global bytes-per-second
+    budget, split evenly across the robots that sent a frame in the last ACTIVE_WINDOW seconds.
+    Tagged frames (e.g. detections) skip the frame-rate limit and may overdraw the robot's byte
+    share by one burst, so they are only dropped under sustained overload.
+
+    When the pipeline reports overload, both limits are scaled down multiplicatively, and they
+    recover additively as frames go through.
+
+    Attributes:
+        target_fps (float): Frames per second processed per robot, or None for no limit.
+        max_bytes_per_second (float): Global budget of payload bytes per second, or None for no limit.
+        scale (float): Current fraction of the configured rates in effect.
+    """
+
+    def __init__(self, target_fps=None, max_bytes_per_second=None, burst_seconds=1.0):
+        self.target_fps = target_fps
+        self.max_bytes_per_second = max_bytes_per_second
+        self.burst_seconds = burst_seconds
+        self.scale = 1.0
+
+        self.robots = dict()
+        self.last_rebalance = time.monotonic()
+        self.lock = threading.Lock()
+
+    def admit(self, robot_id, nbytes, tagged=False):
+        """
+        Args:
+            robot_id (int): The robot that sent the frame.
+            nbytes (int): Size of the frame's payload.
+            tagged (bool): True for priority frames.
+
+        Returns:
+            bool: True if the frame should be processed, False if it should be dropped.
+        """
+        now = time.monotonic()
+        with self.lock:
+            state = self.robots.get(robot_id)
+            if state is None:
+                state = self.robots[robot_id] = RobotRateState(TokenBucket(0, 0, now), TokenBucket(0, 0, now), now)
+                self._rebalance(now)
+                # A new robot starts with full buckets
+                state.frame_bucket.tokens = state.frame_bucket.burst
+                state.byte_bucket.tokens = state.byte_bucket.burst
+            else:
+                was_active = now - state.last_seen <= ACTIVE_WINDOW
+                state.last_seen = now
+                if not was_active or now - self.last_rebalance > REBALANCE_PERIOD:
+                    self._rebalance(now)
+
+            if self.target_fps is not None and not tagged:
+                if not state.frame_bucket.consume(1, now):
+                    state.counts['dropped_rate'] += 1
+                    return False
+
+            if self.max_bytes_per_second is not None:
+                allow_debt = state.byte_bucket.burst if tagged else 0
+                if not state.byte_bucket.consume(nbytes, now, allow_debt=allow_debt):
+                    state.counts['dropped_budget'] += 1
+                    return False
+
+            state.counts['admitted'] += 1
+            if tagged:
+                state.counts['tagged'] += 1
+            return True
+
+    def on_overload(self):
+        """
+        Called when the pipeline had to drop an admitted frame.
+        """
+        with self.lock:
+            self.scale = max(MIN_SCALE, self.scale * BACKOFF_FACTOR)
+            self._rebalance(time.monotonic())
+
+    def on_processed(self):
+        """
+        Called when an admitted frame was queued without overload.
+        """
+        with self.lock:
+            if self.scale < 1.0:
+                self.scale = min(1.0, self.scale + RECOVERY_STEP)
+                self._rebalance(time.monotonic())
+
+    def on_frame_done(self, robot_id, stored):
+        """
+        Called by the pipeline for every admitted frame: stored, or dropped (in-flight cap,
+        near-duplicate, failed write).
+        """
+        with self.lock:
+            state = self.robots.get(robot_id)
+            if state is not None:
+                state.counts['processed' if stored else 'dropped_pipeline'] += 1
+
+    def _rebalance(self, now):
+        """
+        Recomputes every robot's rates from the active robot count and the current scale.
+        Must be called with the lock held.
+        """
+        self.last_rebalance = now
+        active = [state for state in self.robots.values() if now - state.last_seen <= ACTIVE_WINDOW]
+        share = None
+        if self.max_bytes_per_second is not None:
+            share = self.max_bytes_per_second * self.scale / max(1, len(active))
+
+        for state in self.robots.values():
+            if self.target_fps is not None:
+                rate = self.target_fps * self.scale
+                state.frame_bucket.refill(now)
+                state.frame_bucket.rate = rate
+                state.frame_bucket.burst = max(1.0, rate * self.burst_seconds)
+                state.frame_bucket.tokens = min(state.frame_bucket.tokens, state.frame_bucket.burst)
+            if share is not None:
+                state.byte_bucket.refill(now)
+                state.byte_bucket.rate = share
+                state.byte_bucket.burst = share * self.burst_seconds
+                state.byte_bucket.tokens = min(state.byte_bucket.tokens, state.byte_bucket.burst)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: robot_id -> admitted/processed/tagged/dropped counts. 'processed' frames were
+            stored by the pipeline, 'dropped_pipeline' ones were admitted and then dropped by it.
+        """
+        with self.lock:
+            return {robot_id: dict(state.counts) for robot_id, state in self.robots.items()}
@@ -0,0 +1,113 @@
+import os
+import time
+import requests
+from contextlib import contextmanager
+
+STARTUP_TIMEOUT = float(os.getenv('STARTUP_TIMEOUT', '120'))  # seconds to wait for a dependency
+MAX_POLL_DELAY = 1.0  # seconds between readiness checks, at most
+
+SCHEMA_QUERY = """
+                    query {
+                        __typename
+                    }
+               """
+
+AGENT_ENTRY_QUERY = """
+                    query($agentId: Int!) {
+                        agentEntry(agent_id: $agentId) {
+                            active
+                            last_seen
+                        }
+                    }
+               """
+
+
+def wait_for(check, description, timeout=STARTUP_TIMEOUT, initial_delay=0.05, max_delay=MAX_POLL_DELAY):
+    """
+    Polls `check` until it returns a truthy value, with exponential backoff between attempts, so a
+    dependency that is already ready costs one call and a slow one is not hammered.
+
+    Args:
+        check (callable): Returns a truthy value once ready. Exceptions count as not ready.
+        description (str): What is waited for, for the messages.
+        timeout (float): Seconds before giving up, or None to wait forever.
+
+    Returns:
+        The first truthy value returned by `check`.
+
+    Raises:
+        TimeoutError: If not ready within `timeout` seconds.
+    """
+    start = time.monotonic()
+    delay = initial_delay
+    reported = False
+    while True:
+        try:
+            result = check()
+            if result:
+                return result
+        except Exception as e:
+            pass
+
+        elapsed = time.monotonic() - start
+        if timeout is not None and elapsed > timeout:
+            raise TimeoutError(f"{description} not ready after {timeout:g} s")
+        if not reported and elapsed > 2:
+            print(f"Waiting for {description}...")
+            reported = True
+
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def graphql_ready(graphql_server):
+    """
+    True once the GraphQL server serves its schema. The server connects to Ignite before it
+    starts serving, so this also means Ignite is reachable.
+    """
+    response = requests.post(graphql_server, json={'query': SCHEMA_QUERY}, timeout=1)
+    return response.status_code == 200 and 'data' in response.json()
+
+
+def agent_registered(graphql_server, agent_id, since):
+    """
+    True once the agent is active in the agent registry with a last seen time of at least `since`.
+    The entry/exit handler stamps the entry at the end of its setup, so an entry left by an earlier
+    run does not count.
+    """
+    response = requests.post(graphql_server, json={'query': AGENT_ENTRY_QUERY, 'variables': {'agentId': int(agent_id)}},
+                             timeout=1)
+    entry = (response.json().get('data') or {}).get('agentEntry') or {}
+    return bool(entry.get('active')) and (entry.get('last_seen') or 0) >= since
+
+
+class StartupTimer:
+    """
+    Measures the phases of a component's startup, for a one-line report once it is running.
+
+    Usage:
+        timer = StartupTimer('bridge')
+        with timer.phase('graphql'):
+            wait_for(...)
+        timer.report()
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.monotonic()
+        self.phases = []  # (phase name, seconds)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.monotonic() - start))
+
+    def total(self):
+        return time.monotonic() - self.start
+
+    def report(self):
+        phases = ', '.join(f"{name} {seconds:.2f} s" for name, seconds in self.phases)
+        print(f"Startup ({self.name}): {phases}; total {self.total():.2f} s")
@@ -0,0 +1,96 @@
+from cyclonedds.core import SampleState, InstanceState
+
+MAX_SAMPLES = 64  # Maximum number of samples taken per callback
+
+
+class SampleCounter:
+    """
+    Counts the samples consumed by take_samples().
+
+    Attributes:
+        taken (int): Valid samples handed to the listener.
+        duplicates_avoided (int): Samples skipped because they were already seen, either marked
+            as read in the cache or redelivered by the same writer (e.g. TransientLocal history).
+        disposed (int): Instances reported as disposed.
+        no_writers (int): Instances reported as having no live writers left (writer unregistered or lost).
+    """
+
+    def __init__(self):
+        self.taken = 0
+        self.duplicates_avoided = 0
+        self.disposed = 0
+        self.no_writers = 0
+        self.last_source_timestamp = dict()
+
+    def as_dict(self):
+        return {
+            'taken': self.taken,
+            'duplicates_avoided': self.duplicates_avoided,
+            'disposed': self.disposed,
+            'no_writers': self.no_writers,
+        }
+
+    def add(self, other):
+        """
+        Adds the counts of another counter into this one (used to aggregate per-agent listeners).
+        """
+        self.taken += other.taken
+        self.duplicates_avoided += other.duplicates_avoided
+        self.disposed += other.disposed
+        self.no_writers += other.no_writers
+
+
+def take_samples(reader, counter, on_instance_gone=None, max_samples=MAX_SAMPLES, skip_duplicates=True):
+    """
+    Takes every available sample out of the reader cache and yields the ones not seen before.
+
+    Unlike read(), take() removes samples from the cache, so a KeepLast/TransientLocal reader does
+    not hand the same sample back on a later callback.
+
+    Args:
+        reader (DataReader): The reader passed to on_data_available.
+        counter (SampleCounter): Counter updated with what was taken and skipped.
+        on_instance_gone (callable): Called with the SampleInfo when an instance is disposed or
+            loses all of its writers.
+        max_samples (int): Maximum number of samples taken in one call.
+        skip_duplicates (bool): Skip samples not newer than the writer's last one. Turn off for
+            topics where one writer sends bursts that may share a source timestamp (fragments).
+
+    Yields:
+        The valid, new samples in cache order.
+    """
+    for sample in reader.take(N=max_samples):
+        info = getattr(sample, 'sample_info', None)
+        if info is None:
+            counter.taken += 1
+            yield sample
+            continue
+
+        if not info.valid_data:
+            # Instance state change only (no payload): the writer disposed or went away
+            if info.instance_state == InstanceState.NotAliveDisposed:
+                counter.disposed += 1
+            elif info.instance_state == InstanceState.NotAliveNoWriters:
+                counter.no_writers += 1
+            counter.last_source_timestamp.pop(info.publication_handle, None)
+            if on_instance_gone is not None:
+                on_instance_gone(info)
+            continue
+
+        if info.sample_state == SampleState.Read:
+            counter.duplicates_avoided += 1
+            continue
+
+        if not skip_duplicates:
+            counter.taken += 1
+            yield sample
+            continue
+
+        last_timestamp = counter.last_source_timestamp.get(info.publication_handle)
+        if last_timestamp is not None and info.source_timestamp <= last_timestamp:
+            counter.duplicates_avoided += 1
+            continue
+        counter.last_source_timestamp[info.publication_handle] = info.source_timestamp
+
+        counter.taken += 1
+        yield sample
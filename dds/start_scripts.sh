@@ -1,11 +1,8 @@
 #!/bin/bash
 
-python3 entry_exit.py &
-python3 heartbeat_publisher.py &
-python3 heartbeat_subscriber.py &
-python3 goal_publisher.py &
-python3 location_subscriber.py &
-python3 data_subscriber.py &
-python3 image_subscriber.py &
+# All handlers share one process and one DDS participant.
+# To split handlers across processes, run several bridges with --handlers, e.g.
+#   python3 dds_bridge.py --handlers entry_exit,heartbeat_publisher,heartbeat_subscriber,goal,location,data &
+#   python3 dds_bridge.py --handlers image &
+python3 dds_bridge.py &
 wait
-
@@ -0,0 +1,274 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+
+from influxdb_client import WritePrecision
+from influxdb_client.client.write_api import SYNCHRONOUS
+
+DEFAULT_BUCKET = "first_bucket"
+DEFAULT_ORG = "eig"
+
+
+class TelemetryWriter:
+    """
+    Shared, batched InfluxDB writer used by the DDS bridges.
+
+    Points are converted to line protocol on the calling thread and queued. A background
+    thread flushes the queue either when `batch_size` lines are waiting or every
+    `flush_interval` seconds, so DDS callbacks never wait on an HTTP round trip.
+
+    Failed batches are retried with exponential backoff and full jitter. If a batch still
+    cannot be written it is moved to a bounded spill buffer (in memory, and optionally on
+    disk) and replayed once InfluxDB accepts writes again.
+
+    Attributes:
+        bucket (str): The InfluxDB bucket to write to.
+        org (str): The InfluxDB organization.
+        batch_size (int): Maximum number of lines sent per request.
+        flush_interval (float): Maximum time (seconds) a line waits before being flushed.
+        max_pending (int): Maximum number of lines waiting to be written.
+        max_spill (int): Maximum number of lines held in the in-memory spill buffer.
+        spill_path (str): Optional file used to hold spilled lines once memory is full.
+        spill_max_bytes (int): Maximum size of the spill file.
+    """
+
+    def __init__(self, influx_client, bucket=DEFAULT_BUCKET, org=DEFAULT_ORG, write_precision=WritePrecision.S,
+                 batch_size=500, flush_interval=1.0, max_pending=10000, max_retries=3, base_backoff=0.5,
+                 max_backoff=10.0, max_spill=50000, spill_path=None, spill_max_bytes=64 * 1024 * 1024):
+        self.write_api = influx_client.write_api(write_options=SYNCHRONOUS)
+        self.bucket = bucket
+        self.org = org
+        self.write_precision = write_precision
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.max_spill = max_spill
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+
+        self.pending = deque()
+        self.spill = deque()
+        self.condition = threading.Condition()
+        self.running = True
+        self.in_flight = 0              # Lines taken by the background thread and not yet written or spilled
+        self.flush_requested = False
+
+        self.metrics = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'retries': 0,
+            'failed_batches': 0,
+            'spilled': 0,
+            'spilled_to_disk': 0,
+        }
+        self.start_time = time.time()
+
+        self.thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        """
+        Queues a point (or a line protocol string) for writing. Never blocks on the network.
+
+        Args:
+            record (Point or str): The point to write.
+
+        Returns:
+            bool: True if the point was queued, False if it was dropped because the queue is full.
+        """
+        line = record if isinstance(record, str) else record.to_line_protocol()
+        with self.condition:
+            if len(self.pending) >= self.max_pending:
+                self.metrics['dropped'] += 1
+                return False
+
+            self.pending.append(line)
+            self.metrics['enqueued'] += 1
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+        return True
+
+    def get_metrics(self):
+        """
+        Get a snapshot of the throughput and drop counters.
+
+        Returns:
+            dict: Counters plus the current queue depths and the average write rate (points/s).
+        """
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics['pending'] = len(self.pending)
+            metrics['spill'] = len(self.spill)
+
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        metrics['write_rate'] = metrics['written'] / elapsed
+        metrics['spill_file_bytes'] = self._spill_file_size()
+        return metrics
+
+    def flush(self, timeout=None):
+        """
+        Blocks until everything queued so far has been written to InfluxDB (or spilled), including
+        the batch the background thread is writing.
+
+        Args:
+            timeout (float): Maximum time to wait, in seconds.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+            while self.pending or self.in_flight:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.condition.wait(0.1 if remaining is None else min(remaining, 0.1))
+
+    def close(self, timeout=5.0):
+        """
+        Flushes the queue and stops the background thread.
+        """
+        self.flush(timeout=timeout)
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=timeout)
+
+        # Anything still in memory goes to disk so it survives a restart
+        with self.condition:
+            leftover = list(self.spill) + list(self.pending)
+            self.spill.clear()
+            self.pending.clear()
+        if not leftover:
+            return
+        if self.spill_path is not None:
+            self._spill_to_disk(leftover)
+        else:
+            with self.condition:
+                self.metrics['dropped'] += len(leftover)
+            print(f"Warning: telemetry writer closed with {len(leftover)} unwritten points, dropped")
+
+    def _run(self):
+        last_flush = time.time()
+        while True:
+            with self.condition:
+                while self.running and not self.flush_requested and len(self.pending) < self.batch_size \
+                        and time.time() - last_flush < self.flush_interval:
+                    self.condition.wait(max(self.flush_interval - (time.time() - last_flush), 0.01))
+
+                if not self.running:
+                    return
+
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                self.in_flight = len(batch)
+                if not self.pending:
+                    self.flush_requested = False
+
+            last_flush = time.time()
+            written = False
+            if batch:
+                written = self._write_with_retry(batch)
+                if not written:
+                    self._spill_batch(batch)
+
+            # The batch is written or spilled: wake up flush()
+            with self.condition:
+                self.in_flight = 0
+                self.condition.notify_all()
+
+            if written:
+                self._replay_spill()
+
+    def _write_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write_api.write(bucket=self.bucket, org=self.org, record=batch,
+                                     write_precision=self.write_precision)
+                with self.condition:
+                    self.metrics['written'] += len(batch)
+                    self.metrics['batches'] += 1
+                return True
+            except Exception as e:
+                if attempt == self.max_retries or not self.running:
+                    print(f"Telemetry write failed after {attempt + 1} attempts: {e}")
+                    break
+
+                with self.condition:
+                    self.metrics['retries'] += 1
+
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt))))
+
+        with self.condition:
+            self.metrics['failed_batches'] += 1
+        return False
+
+    def _spill_batch(self, batch):
+        overflow = []
+        with self.condition:
+            for line in batch:
+                if len(self.spill) >= self.max_spill:
+                    overflow.append(self.spill.popleft())
+                self.spill.append(line)
+            self.metrics['spilled'] += len(batch)
+
+        if overflow:
+            if self.spill_path is None:
+                with self.condition:
+                    self.metrics['dropped'] += len(overflow)
+            else:
+                self._spill_to_disk(overflow)
+
+    def _spill_to_disk(self, lines):
+        written = 0
+        size = self._spill_file_size()
+        with open(self.spill_path, 'a') as f:
+            for line in lines:
+                if size + len(line) + 1 > self.spill_max_bytes:
+                    break
+                f.write(line + '\n')
+                size += len(line) + 1
+                written += 1
+
+        with self.condition:
+            self.metrics['spilled_to_disk'] += written
+            self.metrics['dropped'] += len(lines) - written
+
+    def _spill_file_size(self):
+        if self.spill_path is None or not os.path.exists(self.spill_path):
+            return 0
+        return os.path.getsize(self.spill_path)
+
+    def _replay_spill(self):
+        # Influx is reachable again, send what was spilled (memory first, then disk)
+        while True:
+            with self.condition:
+                batch = [self.spill.popleft() for _ in range(min(self.batch_size, len(self.spill)))]
+            if not batch:
+                break
+            if not self._write_with_retry(batch):
+                self._spill_batch(batch)
+                return
+
+        if self._spill_file_size() == 0:
+            return
+
+        replay_path = self.spill_path + '.replay'
+        os.replace(self.spill_path, replay_path)
+        with open(replay_path, 'r') as f:
+            lines = [line.rstrip('\n') for line in f if line.strip()]
+        os.remove(replay_path)
+
+        for i in range(0, len(lines), self.batch_size):
+            batch = lines[i:i + self.batch_size]
+            if not self._write_with_retry(batch):
+                self._spill_to_disk(lines[i:])
+                return
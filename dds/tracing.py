@@ -0,0 +1,112 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency buckets, in seconds (the same as the GraphQL server's /metrics)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def sample_source_time(sample):
+    """
+    The time a DDS sample was written, in seconds since the epoch.
+
+    Uses the writer's source timestamp from the SampleInfo (nanoseconds) when the sample has one,
+    and falls back to the message's own `timestamp` field otherwise. Both come from the sending
+    agent's clock, so the latency measured against them includes any clock offset between hosts.
+    """
+    info = getattr(sample, 'sample_info', None)
+    if info is not None and info.source_timestamp:
+        return info.source_timestamp / 1e9
+    return float(sample.timestamp)
+
+
+class StageHistogram:
+    """
+    Fixed-bucket latency histogram of one stage of the pipeline.
+
+    Attributes:
+        counts (list): Samples per bucket, the last one for latencies above every bound.
+        count (int): Number of samples.
+        total (float): Sum of the samples, in seconds.
+        max (float): Largest sample, in seconds.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile, or the maximum for the last bucket.
+        """
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(1000 * self.total / self.count, 2) if self.count else None,
+            'p50_ms': round(1000 * self.quantile(0.5), 2),
+            'p99_ms': round(1000 * self.quantile(0.99), 2),
+            'max_ms': round(1000 * self.max, 2),
+        }
+
+
+class Tracer:
+    """
+    Records the latency of each stage a sample goes through in the bridge, e.g. 'dds_receive'
+    (written by the agent to taken by the bridge), 'transform' and 'http' (the mutation round trip).
+
+    Hooks added with add_hook() are called with (stage, seconds) for every record, to forward the
+    latencies elsewhere (e.g. InfluxDB). Recording is cheap enough for the listener callbacks.
+    """
+
+    def __init__(self):
+        self.stages = dict()
+        self.hooks = []
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def record(self, stage, seconds):
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = StageHistogram()
+            histogram.observe(max(seconds, 0.0))
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Records the time spent in the with block under `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def get_metrics(self):
+        with self.lock:
+            return {stage: histogram.as_dict() for stage, histogram in self.stages.items()}
+
+
+tracer = Tracer()  # Shared by the handlers of a bridge process
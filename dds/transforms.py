@@ -0,0 +1,112 @@
+import numpy as np
+
+
+class RigidTransform2D:
+    """
+    A 2D rigid transform (rotation + translation) between an agent's map and the reference map.
+
+    The forward direction maps points from the current map to the reference map
+    (p' = R p + t, theta' = theta + heading). The heading offset and the inverse transform
+    are computed once on construction instead of on every call.
+
+    Attributes:
+        R (np.ndarray): The 2x2 rotation matrix.
+        t (np.ndarray): The translation vector, shape (2,).
+        heading (float): The rotation angle of R, arctan2(R[1,0], R[0,0]).
+        R_inv (np.ndarray): The inverse rotation (R transposed).
+        t_inv (np.ndarray): The inverse translation (-R^T t).
+    """
+
+    def __init__(self, R=None, t=None):
+        self.R = np.identity(2) if R is None else np.asarray(R, dtype=float).reshape((2, 2))
+        self.t = np.zeros(2) if t is None else np.asarray(t, dtype=float).reshape(2)
+
+        self.heading = float(np.arctan2(self.R[1, 0], self.R[0, 0]))
+        self.R_inv = self.R.T.copy()
+        self.t_inv = -self.R_inv @ self.t
+
+        # Scalars for the single point path, which is faster without numpy temporaries
+        self._r = self.R.ravel().tolist()
+        self._t = self.t.tolist()
+
+    @classmethod
+    def from_graphql(cls, transform):
+        """
+        Builds the transform from the result of the GraphQL `transform` query.
+
+        Parameters:
+        - transform (dict): Dictionary with a flattened 'R' (4 values) and 't' (2 values).
+
+        Returns:
+        - RigidTransform2D: The transform, or None if the response does not hold a valid transform.
+        """
+        R = transform.get('R', [])
+        t = transform.get('t', [])
+        if R is None or t is None or len(R) != 4 or len(t) != 2:
+            return None
+        return cls(R, t)
+
+    def apply(self, points):
+        """
+        Transforms a batch of points from the current map to the reference map.
+
+        Parameters:
+        - points (array-like): Array of shape (N, 2) with x, y or (N, 3) with x, y, theta.
+
+        Returns:
+        - np.ndarray: The transformed points, same shape as the input.
+        """
+        points = np.asarray(points, dtype=float)
+        out = np.empty_like(points)
+        out[:, :2] = points[:, :2] @ self.R.T + self.t
+        if points.shape[1] > 2:
+            out[:, 2] = points[:, 2] + self.heading
+        return out
+
+    def apply_inverse(self, points):
+        """
+        Transforms a batch of points from the reference map to the current map.
+
+        Parameters:
+        - points (array-like): Array of shape (N, 2) with x, y or (N, 3) with x, y, theta.
+
+        Returns:
+        - np.ndarray: The transformed points, same shape as the input.
+        """
+        points = np.asarray(points, dtype=float)
+        out = np.empty_like(points)
+        out[:, :2] = points[:, :2] @ self.R_inv.T + self.t_inv
+        if points.shape[1] > 2:
+            out[:, 2] = points[:, 2] - self.heading
+        return out
+
+    def inverse(self):
+        """
+        Returns the transform from the reference map to the current map.
+        """
+        return RigidTransform2D(self.R_inv, self.t_inv)
+
+    def transform_point(self, point, forward=True):
+        """
+        Transforms a single (x, y, theta) point from the current map to the reference map or vice versa
+
+        Parameters:
+        - point (tuple): The point to be transformed.
+        - forward (bool): True if transforming from current map to reference map, False otherwise.
+
+        Returns:
+        - tuple: The transformed point.
+        """
+        r00, r01, r10, r11 = self._r
+        tx, ty = self._t
+        x, y, theta = point[0], point[1], point[2]
+        if forward:
+            return (r00 * x + r01 * y + tx,
+                    r10 * x + r11 * y + ty,
+                    theta + self.heading)
+        else:
+            dx = x - tx
+            dy = y - ty
+            return (r00 * dx + r10 * dy,
+                    r01 * dx + r11 * dy,
+                    theta - self.heading)
@@ -0,0 +1,61 @@
+import asyncio
+
+from agent_registry import agent_registry
+
+
+def get_agent_lists():
+    """
+    Reads the current subscribed and exited agent lists from the agent registry. The registry is
+    only re-read when its version moved.
+
+    Returns:
+        tuple: (subscribed agent ids, exited agent ids)
+    """
+    return agent_registry.get_lists()
+
+
+class AgentListBroadcaster:
+    """
+    Fans agent list changes out to the `agentsChanged` subscribers.
+
+    Only the latest state matters, so a subscriber that falls behind receives the most recent
+    lists once instead of every intermediate change.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+
+    def publish(self, agents, exited_agents):
+        """
+        Pushes the new lists to every subscriber. Safe to call from any thread.
+        """
+        for subscriber in list(self.subscribers):
+            loop, state, event = subscriber
+            state['latest'] = (agents, exited_agents)
+            loop.call_soon_threadsafe(event.set)
+
+    async def subscribe(self, initial=None):
+        """
+        Async generator yielding (agents, exited_agents) every time the lists change.
+
+        Args:
+            initial (tuple): Lists to yield first, so a new subscriber starts with the current state.
+        """
+        loop = asyncio.get_running_loop()
+        state = {'latest': initial}
+        event = asyncio.Event()
+        if initial is not None:
+            event.set()
+
+        subscriber = (loop, state, event)
+        self.subscribers.add(subscriber)
+        try:
+            while True:
+                await event.wait()
+                event.clear()
+                yield state['latest']
+        finally:
+            self.subscribers.discard(subscriber)
+
+
+agent_broadcaster = AgentListBroadcaster()
@@ -0,0 +1,255 @@
+import json
+import time
+import threading
+
+from ignite import ignite_client
+
+VERSION_KEY = 1
+LEGACY_LIST_KEY = 1          # Key of the whole lists in the pre-registry 'subscribed_agents'/'exited_agents' caches
+WRITE_LOCK_TIMEOUT = 5.0     # seconds after which a write left unfinished (crashed server) is taken over
+WRITE_ATTEMPTS = 3           # Version claims tried by an undiffed write before giving up to the caller
+
+
+class AgentRegistry:
+    """
+    Agent membership stored with one Ignite key per agent, plus a version counter.
+
+    Each entry holds two flags, `active` (in the subscribed agent list) and `exited` (in the
+    exited agent list), and the time the agent was last seen. An entry with neither flag is
+    deleted. Every membership change increments the version, so readers only re-read the
+    registry when the version moved, and writers only send the agents that changed.
+
+    The version is even at rest. apply_changes() makes it odd while it writes a batch of changes
+    that was diffed against a given version, so concurrent writers cannot interleave with it.
+    Nothing waits for an odd version: the resolvers run on the server's event loop, so a write or
+    a state read that finds one fails right away and the caller retries.
+
+    Caches:
+        agent_registry: agent id -> JSON {"active", "exited", "last_seen"}
+        agent_registry_meta: VERSION_KEY -> version (int)
+    """
+
+    def __init__(self):
+        self.registry_cache = ignite_client.get_or_create_cache('agent_registry')
+        self.meta_cache = ignite_client.get_or_create_cache('agent_registry_meta')
+        self.lock = threading.Lock()
+        self.cached_version = None
+        self.cached_lists = ([], [])
+        self.odd_version = None      # Odd version last seen, and when, to take over a crashed writer's
+        self.odd_since = None
+        self.migrate_legacy_lists()
+
+    def migrate_legacy_lists(self):
+        """
+        Moves the whole lists written before the registry existed into it, if it is still empty,
+        and deletes them so that nothing reads the outdated lists.
+        """
+        legacy = dict()
+        for cache_name, flag in (('subscribed_agents', 'active'), ('exited_agents', 'exited')):
+            cache = ignite_client.get_or_create_cache(cache_name)
+            value = cache.get(LEGACY_LIST_KEY)
+            if value is not None:
+                legacy[flag] = [agent_id for agent_id in json.loads(value) if agent_id != -1]
+                cache.remove_key(LEGACY_LIST_KEY)
+
+        if legacy and self.meta_cache.get(VERSION_KEY) is None:
+            self.apply_changes(0, active=legacy.get('active', ()), exited=legacy.get('exited', ()))
+            print(f"Migrated the legacy agent lists into the agent registry: {legacy}")
+
+    def get_version(self):
+        version = self.meta_cache.get(VERSION_KEY)
+        return 0 if version is None else version
+
+    def stable_version(self):
+        """
+        Returns the version if no batch is being written, without waiting. A version seen odd for
+        longer than WRITE_LOCK_TIMEOUT (the writer died) is moved on to the next even number.
+
+        Returns:
+            int: The even version, or None if a batch is being written.
+        """
+        version = self.get_version()
+        if version % 2 == 0:
+            return version
+
+        now = time.monotonic()
+        with self.lock:
+            if self.odd_version != version:
+                self.odd_version, self.odd_since = version, now
+                return None
+            if now - self.odd_since <= WRITE_LOCK_TIMEOUT:
+                return None
+        if self.meta_cache.replace_if_equals(VERSION_KEY, version, version + 1):
+            print(f"Agent registry version {version} held for over {WRITE_LOCK_TIMEOUT} s, taken over")
+            return version + 1
+        return None
+
+    def get_entry(self, agent_id):
+        entry = self.registry_cache.get(agent_id)
+        return None if entry is None else json.loads(entry)
+
+    def set_flags(self, agent_id, active=None, exited=None, last_seen=None):
+        """
+        Updates one agent's entry. Only called by apply_changes(), which holds the version.
+
+        Returns:
+            bool: True if the membership changed.
+        """
+        entry = self.get_entry(agent_id) or {"active": False, "exited": False, "last_seen": None}
+        old_flags = (entry["active"], entry["exited"])
+        if active is not None:
+            entry["active"] = active
+        if exited is not None:
+            entry["exited"] = exited
+        if last_seen is not None:
+            entry["last_seen"] = last_seen
+
+        if not entry["active"] and not entry["exited"]:
+            if old_flags != (False, False):
+                self.registry_cache.remove_key(agent_id)
+        else:
+            self.registry_cache.put(agent_id, json.dumps(entry))
+
+        return old_flags != (entry["active"], entry["exited"])
+
+    def apply_changes(self, expected_version, active=(), inactive=(), exited=(), not_exited=(), last_seen=None):
+        """
+        Applies a batch of flag changes that a writer diffed against the registry at
+        `expected_version`. The batch is rejected if the registry moved since, so the writer can
+        diff again against the current contents instead of overwriting another writer's changes.
+
+        Args:
+            last_seen (float): Recorded for the `active` agents, if given.
+
+        Returns:
+            int: The new version (`expected_version` if nothing changed), or None if the registry
+            is no longer at `expected_version`.
+        """
+        changes = dict()
+        for agent_ids, flag, value in ((active, "active", True), (inactive, "active", False),
+                                       (exited, "exited", True), (not_exited, "exited", False)):
+            for agent_id in agent_ids:
+                changes.setdefault(agent_id, dict())[flag] = value
+        if last_seen is not None:
+            for agent_id in active:
+                changes[agent_id]["last_seen"] = last_seen
+
+        if not changes:
+            return expected_version if self.get_version() == expected_version else None
+
+        # Hold the version odd while writing, so no other batch or reader relies on a partial state
+        if expected_version % 2:
+            return None
+        if expected_version == 0:
+            if not self.meta_cache.put_if_absent(VERSION_KEY, 1):
+                return None
+        elif not self.meta_cache.replace_if_equals(VERSION_KEY, expected_version, expected_version + 1):
+            return None
+
+        changed = False
+        try:
+            for agent_id, flags in changes.items():
+                changed |= self.set_flags(agent_id, **flags)
+        finally:
+            # A batch that changed no flag puts the version back, so readers keep their cache
+            self.meta_cache.put(VERSION_KEY, expected_version + 2 if changed else expected_version)
+        return expected_version + 2 if changed else expected_version
+
+    def apply_now(self, **changes):
+        """
+        Applies changes that were not diffed against a version (one agent's, or a legacy whole
+        list) at the current version. Fails instead of waiting if another batch is being written.
+
+        Returns:
+            bool: True if the membership changed, False if not, None if the registry was busy.
+        """
+        for _ in range(WRITE_ATTEMPTS):
+            version = self.stable_version()
+            if version is None:
+                return None
+            new_version = self.apply_changes(version, **changes)
+            if new_version is not None:
+                return new_version != version
+        return None
+
+    def add_agent(self, agent_id, last_seen=None):
+        """
+        Marks an agent as active. An agent that enters again is no longer exited.
+
+        Returns:
+            bool: True if the membership changed, None if the registry was busy.
+        """
+        return self.apply_now(active=[agent_id], not_exited=[agent_id], last_seen=last_seen)
+
+    def remove_agent(self, agent_id, exited=False):
+        """
+        Marks an agent as not active, and as exited if it left gracefully.
+
+        Returns:
+            bool: True if the membership changed, None if the registry was busy.
+        """
+        return self.apply_now(inactive=[agent_id], exited=[agent_id] if exited else ())
+
+    def set_list(self, agent_list, flag):
+        """
+        Applies a whole list (the legacy setAgentList/setExitedAgentList) as per-agent changes:
+        only the agents that joined or left the list are written. [-1] clears the list.
+
+        Returns:
+            bool: True if the membership changed, None if the registry was busy.
+        """
+        agents, exited_agents = self.get_lists()
+        current = set(agents if flag == "active" else exited_agents)
+        new = set(agent_list) - {-1}
+        if flag == "active":
+            return self.apply_now(active=sorted(new - current), inactive=sorted(current - new))
+        return self.apply_now(exited=sorted(new - current), not_exited=sorted(current - new))
+
+    def get_lists(self):
+        """
+        Returns the active and exited agent lists. The registry is only scanned when the version
+        has moved since the last call.
+
+        Returns:
+            tuple: (active agent ids, exited agent ids), sorted.
+        """
+        version = self.get_version()
+        with self.lock:
+            if version == self.cached_version:
+                return self.cached_lists
+
+        agents, exited_agents = [], []
+        for agent_id, entry in self.registry_cache.scan():
+            entry = json.loads(entry)
+            if entry["active"]:
+                agents.append(agent_id)
+            if entry["exited"]:
+                exited_agents.append(agent_id)
+        lists = (sorted(agents), sorted(exited_agents))
+
+        # An odd version is a batch being written, do not keep what was read of it
+        if version % 2 == 0:
+            with self.lock:
+                self.cached_version = version
+                self.cached_lists = lists
+        return lists
+
+    def get_state(self):
+        """
+        Returns the version and the lists read at that version, for writers that diff against
+        the registry.
+
+        Returns:
+            tuple: (version, active agent ids, exited agent ids), or None if a batch was being
+            written (the caller reads again).
+        """
+        version = self.stable_version()
+        if version is None:
+            return None
+        agents, exited_agents = self.get_lists()
+        if self.get_version() != version:
+            return None
+        return version, agents, exited_agents
+
+
+agent_registry = AgentRegistry()
@@ -0,0 +1,274 @@
+"""
+Resolver benchmark: runs server.py's Starlette app in-process and measures throughput and
+p50/p99 latency of each GraphQL operation, through the full ASGI + ariadne + resolver path.
+
+The cache backend is the in-memory Ignite stand-in by default (optionally with an injected
+per-operation latency), or a real Ignite node with --backend ignite. The caches are seeded with
+a fleet of --robots robots, paths of --path-length points and --objects detected objects.
+
+Results can be saved as JSON and compared with an earlier run:
+
+Usage:
+    python benchmarks/bench_resolvers.py --robots 50 --output results.json
+    python benchmarks/bench_resolvers.py --robots 50 --compare results.json
+    python benchmarks/bench_resolvers.py --only map,robotPositions --latency-ms 0.5
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import sqlite3
+import asyncio
+import argparse
+import platform
+import tempfile
+
+import numpy as np
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVER_DIR)
+
+from image_index_db import SCHEMA as IMAGE_INDEX_SCHEMA
+
+ROBOT_FIELDS = "id x y theta"
+
+
+def operations(args):
+    """
+    Returns:
+        dict: Operation name -> (GraphQL document, function of the iteration returning the variables).
+    """
+    rng = random.Random(1)
+
+    def robot(i):
+        return {'robot_id': i % args.robots}
+
+    return {
+        # Queries
+        'map': ("query { map { occupancy width height resolution origin_x origin_y } }", None),
+        'robotPosition': ("query($robot_id: Int) { robotPosition(robot_id: $robot_id) { x y theta } }", robot),
+        'robotPositions': (f"query {{ robotPositions {{ {ROBOT_FIELDS} }} }}", None),
+        'robotInitialPosition': ("query($robot_id: Int) { robotInitialPosition(robot_id: $robot_id) { x_init y_init theta_init init_timestamp } }", robot),
+        'robotInitialPositions': ("query { robotInitialPositions { id x_init y_init theta_init init_timestamp } }", None),
+        'robotGoal': ("query($robot_id: Int) { robotGoal(robot_id: $robot_id) { x_goal y_goal theta_goal goal_timestamp goal_valid } }", robot),
+        'robotGoals': ("query { robotGoals { id x_goal y_goal theta_goal goal_timestamp goal_valid } }", None),
+        'robotVelocity': ("query($robot_id: Int) { robotVelocity(robot_id: $robot_id) { v_x v_y v_theta } }", robot),
+        'robotPath': ("query($robot_id: Int) { robotPath(robot_id: $robot_id) { id x y t } }", robot),
+        'robotPaths': ("query { robotPaths { id x y t } }", None),
+        'robotScan': ("query($robot_id: Int) { robotScan(robot_id: $robot_id) { id ranges range_min range_max timestamp } }", robot),
+        'robotImages': ("query($robot_id: Int!, $start: Float) { robotImages(robot_id: $robot_id, start: $start, limit: 100) { robot_id timestamp path size reference } }",
+                        lambda i: {'robot_id': i % args.robots, 'start': float(args.images_per_robot // 2)}),
+        'robotStatus': ("query($robot_id: Int) { robotStatus(robot_id: $robot_id) { id status } }", robot),
+        'stoppedRobotPositions': (f"query {{ stoppedRobotPositions {{ {ROBOT_FIELDS} }} }}", None),
+        'objectPositions': ("query { objectPositions { id x y type } }", None),
+        'transform': ("query { transform { R t timestamp } }", None),
+        'subscribed_agents': ("query { subscribed_agents { id } }", None),
+        'exitedAgents': ("query { exitedAgents { id } }", None),
+        'subscribedAndExitedAgents': ("query { subscribedAndExitedAgents { id } }", None),
+        'agentRegistryVersion': ("query { agentRegistryVersion }", None),
+        'agentRegistryState': ("query { agentRegistryState { version active exited } }", None),
+
+        # Mutations
+        'setRobotPosition': ("mutation($robot_id: Int, $x: Float, $y: Float, $theta: Float) { setRobotPosition(robot_id: $robot_id, x: $x, y: $y, theta: $theta) }",
+                             lambda i: {'robot_id': i % args.robots, 'x': rng.uniform(-10, 10), 'y': rng.uniform(-10, 10), 'theta': rng.uniform(-3, 3)}),
+        'setRobotInitialPosition': ("mutation($robot_id: Int, $x: Float, $y: Float, $theta: Float, $t: Float) { setRobotInitialPosition(robot_id: $robot_id, x_init: $x, y_init: $y, theta_init: $theta, init_timestamp: $t) }",
+                                    lambda i: {'robot_id': i % args.robots, 'x': 1.0, 'y': 2.0, 'theta': 0.5, 't': time.time()}),
+        'setRobotGoal': ("mutation($robot_id: Int, $x: Float, $y: Float, $theta: Float, $t: Float) { setRobotGoal(robot_id: $robot_id, x_goal: $x, y_goal: $y, theta_goal: $theta, goal_timestamp: $t) }",
+                         lambda i: {'robot_id': i % args.robots, 'x': 1.0, 'y': 2.0, 'theta': 0.5, 't': time.time()}),
+        'setPath': ("mutation($robot_id: Int, $x: [Float], $y: [Float], $t: [Float]) { setPath(robot_id: $robot_id, x: $x, y: $y, t: $t) }",
+                    lambda i: dict(robot_id=i % args.robots, **make_path(args.path_length, i))),
+        'setObjects': ("mutation($agent_id: Int, $x: Float, $y: Float, $object_num: Int) { setObjects(agent_id: $agent_id, x: $x, y: $y, class_name: \"person\", object_num: $object_num) }",
+                       lambda i: {'agent_id': i % args.robots, 'x': rng.uniform(-10, 10), 'y': rng.uniform(-10, 10),
+                                  'object_num': i % max(1, args.objects // args.robots)}),
+        'setTransform': ("mutation($R: [Float], $t: [Float], $ts: Float) { setTransform(R: $R, t: $t, timestamp: $ts) }",
+                         lambda i: {'R': [1.0, 0.0, 0.0, 1.0], 't': [0.0, 0.0], 'ts': time.time()}),
+        # A join and a leave of one agent outside the fleet, in one request
+        'addRemoveAgent': ("mutation($agent_id: Int!) { addAgent(agent_id: $agent_id) removeAgent(agent_id: $agent_id) }",
+                           lambda i: {'agent_id': args.robots + 1}),
+        'setAgentList': ("mutation($agents: [Int]) { setAgentList(agent_list: $agents) }",
+                         lambda i: {'agents': list(range(args.robots))}),
+    }
+
+
+def make_path(length, i):
+    s = np.linspace(0, 10, length)
+    return {'x': (s + i % 7).tolist(), 'y': np.sin(s).tolist(), 't': (s + time.time()).tolist()}
+
+
+class InProcessClient:
+    """
+    Sends GraphQL requests straight to the ASGI app, without a socket or an HTTP server.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def post(self, document, variables=None):
+        body = json.dumps({'query': document, 'variables': variables or {}}).encode()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': '/graphql', 'raw_path': b'/graphql', 'root_path': '', 'query_string': b'',
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 1), 'server': ('127.0.0.1', 8000),
+        }
+        request = {'type': 'http.request', 'body': body, 'more_body': False}
+        chunks = []
+        status = [None]
+
+        async def receive():
+            nonlocal request
+            message, request = request, {'type': 'http.disconnect'}
+            return message
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return status[0], json.loads(b''.join(chunks) or b'{}')
+
+
+async def seed(client, ignite_client, args):
+    """
+    Fills the caches with a fleet, through the mutations where they exist.
+    """
+    rng = random.Random(0)
+    width = height = args.map_size
+    occupancy = np.zeros(width * height, dtype=int)
+    occupancy[rng.sample(range(width * height), width * height // 10)] = 100
+    await client.post("mutation($d: String!) { setMap(data: $d) }", {'d': base64.b64encode(occupancy.tobytes()).decode()})
+    await client.post("""mutation { setMapMetadata(resolution: 0.05, width: %d, height: %d, origin_pos_x: 0, origin_pos_y: 0,
+                      origin_pos_z: 0, origin_ori_x: 0, origin_ori_y: 0, origin_ori_z: 0, origin_ori_w: 1) }""" % (width, height))
+    await client.post("mutation { setTransform(R: [1, 0, 0, 1], t: [0, 0], timestamp: 0) }")
+
+    documents = operations(args)
+    for robot_id in range(args.robots):
+        await client.post("mutation($a: Int!) { addAgent(agent_id: $a) }", {'a': robot_id})
+        for name in ('setRobotPosition', 'setRobotInitialPosition', 'setRobotGoal', 'setPath'):
+            document, variables = documents[name]
+            await client.post(document, variables(robot_id))
+
+        # No mutations for these, written by other services
+        ignite_client.get_or_create_cache('robot_odom').put(robot_id, json.dumps({'vel_x': 0.1, 'vel_y': 0.0, 'vel_theta': 0.0}))
+        ignite_client.get_or_create_cache('robot_status').put(robot_id, robot_id % 2)
+        ignite_client.get_or_create_cache('robot_scan').put(robot_id, json.dumps({
+            'robot_id': robot_id, 'ranges': [rng.uniform(0.1, 10) for _ in range(360)], 'range_min': 0.1,
+            'range_max': 10.0, 'angle_min': -3.14, 'angle_max': 3.14, 'angle_increment': 0.0175, 'timestamp': time.time()}))
+
+    for i in range(args.objects):
+        await client.post("mutation($a: Int, $n: Int) { setObjects(agent_id: $a, x: 1.0, y: 2.0, class_name: \"chair\", object_num: $n) }",
+                          {'a': i % args.robots, 'n': i // args.robots})
+
+
+def seed_image_index(path, args):
+    connection = sqlite3.connect(path)
+    connection.executescript(IMAGE_INDEX_SCHEMA)
+    rows = [(robot_id, t, f"{robot_id}/{t}.jpg", 20000, 0)
+            for robot_id in range(args.robots) for t in range(args.images_per_robot)]
+    connection.executemany('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)', rows)
+    connection.commit()
+    connection.close()
+
+
+async def measure(client, name, document, variables, args):
+    for i in range(args.warmup):
+        await client.post(document, variables(i) if variables else None)
+
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        payload = variables(i) if variables else None
+        t0 = time.perf_counter()
+        status, response = await client.post(document, payload)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if status != 200 or response.get('errors'):
+            errors += 1
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'operations_per_second': args.iterations / elapsed,
+        'p50_ms': latencies[len(latencies) // 2],
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'errors': errors,
+    }
+
+
+async def run(args):
+    from server import app
+    from ignite import ignite_client
+
+    client = InProcessClient(app)
+    await seed(client, ignite_client, args)
+
+    documents = operations(args)
+    names = args.only.split(',') if args.only else list(documents)
+    results = dict()
+    for name in names:
+        document, variables = documents[name]
+        results[name] = await measure(client, name, document, variables, args)
+        stats = results[name]
+        print(f"{name:26s} {stats['operations_per_second']:9.0f} ops/s  p50 {stats['p50_ms']:7.3f} ms  "
+              f"p99 {stats['p99_ms']:7.3f} ms" + (f"  {stats['errors']} errors" if stats['errors'] else ''))
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline['parameters']}):")
+    for name, stats in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        change = (stats['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+        print(f"{name:26s} p50 {before['p50_ms']:7.3f} -> {stats['p50_ms']:7.3f} ms ({change:+6.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', default='memory', choices=['memory', 'ignite'])
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Injected latency per cache operation (memory backend)')
+    parser.add_argument('--robots', type=int, default=20, help='Fleet size')
+    parser.add_argument('--path-length', type=int, default=200, help='Points per path')
+    parser.add_argument('--objects', type=int, default=100, help='Detected objects, spread over the robots')
+    parser.add_argument('--map-size', type=int, default=200, help='Map width and height, in cells')
+    parser.add_argument('--images-per-robot', type=int, default=1000, help='Rows per robot in the image index')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', default=None, help='Comma separated operations to run')
+    parser.add_argument('--output', default=None, help='Save the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    # The server modules read these on import, and load schema.graphql from the working directory
+    work_dir = tempfile.mkdtemp(prefix='bench_resolvers_')
+    index_path = os.path.join(work_dir, 'images.sqlite')
+    seed_image_index(index_path, args)
+    os.environ['IGNITE_BACKEND'] = args.backend
+    os.environ['IGNITE_LATENCY_MS'] = str(args.latency_ms)
+    os.environ['IMAGE_INDEX_PATH'] = index_path
+    os.chdir(SERVER_DIR)
+
+    results = asyncio.run(run(args))
+
+    parameters = {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'only')}
+    if baseline:
+        compare(results, baseline)
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'parameters': parameters, 'python': platform.python_version(),
+                       'timestamp': time.time(), 'results': results}, f, indent=2)
+        print(f"\nResults saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
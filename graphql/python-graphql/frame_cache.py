@@ -0,0 +1,96 @@
+import io
+import hashlib
+import threading
+
+THUMBNAIL_SIZE = (160, 120)  # Bounding box, aspect ratio is kept
+THUMBNAIL_QUALITY = 70
+
+
+class Frame:
+    """
+    One encoded camera frame held by the LatestFrameCache.
+
+    Attributes:
+        robot_id (int): The ID of the robot that sent the frame.
+        timestamp (int): The timestamp of the frame.
+        data (bytes): The encoded image.
+        content_type (str): The MIME type of the encoded image.
+        etag (str): Strong ETag of the frame, quoted for use in HTTP headers.
+    """
+
+    def __init__(self, robot_id, timestamp, data, content_type):
+        self.robot_id = robot_id
+        self.timestamp = timestamp
+        self.data = data
+        self.content_type = content_type
+        self.etag = '"{}"'.format(hashlib.blake2b(data, digest_size=12).hexdigest())
+
+        self.thumbnail = None
+        self.thumbnail_lock = threading.Lock()
+
+    def get_thumbnail(self):
+        """
+        Returns the JPEG thumbnail of the frame, generating it on first use. A frame is only
+        ever thumbnailed once, however many clients ask for it.
+
+        Returns:
+            bytes: The encoded thumbnail.
+        """
+        with self.thumbnail_lock:
+            if self.thumbnail is None:
+                from PIL import Image
+
+                with Image.open(io.BytesIO(self.data)) as image:
+                    # JPEG frames can be decoded at reduced size directly
+                    image.draft('RGB', THUMBNAIL_SIZE)
+                    image = image.convert('RGB')
+                    image.thumbnail(THUMBNAIL_SIZE)
+                    buffer = io.BytesIO()
+                    image.save(buffer, format='JPEG', quality=THUMBNAIL_QUALITY)
+                self.thumbnail = buffer.getvalue()
+            return self.thumbnail
+
+    @property
+    def thumbnail_etag(self):
+        return self.etag[:-1] + '-thumb"'
+
+
+class LatestFrameCache:
+    """
+    In-memory cache of the most recent frame of every robot, fed by the image bridge over HTTP
+    and served to the GUI by the /images routes.
+    """
+
+    def __init__(self):
+        self.frames = dict()
+        self.lock = threading.Lock()
+
+    def put(self, robot_id, timestamp, data, content_type):
+        """
+        Stores a frame unless a newer one is already cached.
+
+        Returns:
+            bool: True if the frame replaced the cached one.
+        """
+        frame = Frame(robot_id, timestamp, data, content_type)
+        with self.lock:
+            current = self.frames.get(robot_id)
+            if current is not None and current.timestamp > timestamp:
+                return False
+            self.frames[robot_id] = frame
+        return True
+
+    def get(self, robot_id):
+        """
+        Returns:
+            Frame: The latest frame of the robot, or None.
+        """
+        with self.lock:
+            return self.frames.get(robot_id)
+
+    def robots(self):
+        with self.lock:
+            return sorted(self.frames)
+
+
+frame_cache = LatestFrameCache()
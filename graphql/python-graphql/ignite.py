@@ -1,8 +1,46 @@
-from pyignite import Client
+import os
 import time
 
-time.sleep(10)
+from metrics import InstrumentedClient
+
+IGNITE_HOST = os.getenv('IGNITE_HOST', 'ignite_host')
+IGNITE_PORT = int(os.getenv('IGNITE_PORT', '10800'))
+IGNITE_CONNECT_TIMEOUT = float(os.getenv('IGNITE_CONNECT_TIMEOUT', '120'))  # seconds
+IGNITE_BACKEND = os.getenv('IGNITE_BACKEND', 'ignite')  # 'memory' for the in-memory stand-in (memory_ignite.py)
+
+
+def connect(host=IGNITE_HOST, port=IGNITE_PORT, timeout=IGNITE_CONNECT_TIMEOUT):
+    """
+    Connects to Ignite as soon as it accepts connections, retrying with exponential backoff
+    instead of sleeping a fixed time first.
+
+    Returns:
+        Client: The connected client.
+    """
+    from pyignite import Client
+
+    start = time.monotonic()
+    delay = 0.1
+    while True:
+        client = Client()
+        try:
+            client.connect(host, port)
+            print(f"Connected to Ignite at {host}:{port} after {time.monotonic() - start:.2f} s")
+            return client
+        except Exception as e:
+            if time.monotonic() - start > timeout:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+
 
 # Set up the Ignite client
-ignite_client = Client()
-ignite_client.connect('ignite_host', 10800)
\ No newline at end of file
+if IGNITE_BACKEND == 'memory':
+    from memory_ignite import MemoryClient
+    ignite_client = MemoryClient()
+    print("Using the in-memory Ignite stand-in")
+else:
+    ignite_client = connect()
+
+# Time every cache call, per cache and method, for /metrics
+ignite_client = InstrumentedClient(ignite_client)
@@ -0,0 +1,40 @@
+import os
+import threading
+
+from image_index_db import connect_read_only, query_images as query_index
+
+# Written by the image bridge (dds/image_index.py). The default is graphql/image_index/, whatever
+# the working directory.
+IMAGE_INDEX_PATH = os.getenv('IMAGE_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              '..', 'image_index', 'images.sqlite'))
+
+connections = threading.local()
+
+
+def get_connection():
+    """
+    Returns this thread's read-only connection to the image index, or None if the bridge has not
+    created it yet.
+    """
+    connection = getattr(connections, 'connection', None)
+    if connection is None:
+        if not os.path.exists(IMAGE_INDEX_PATH):
+            return None
+        connection = connections.connection = connect_read_only(IMAGE_INDEX_PATH)
+    return connection
+
+
+def query_images(robot_id, start=None, end=None, limit=None):
+    """
+    Returns the images of a robot with start <= timestamp <= end, oldest first. With `limit`,
+    only the newest `limit` images of the range are returned.
+
+    Returns:
+        list: dicts with robot_id, timestamp, path, size and reference.
+    """
+    connection = get_connection()
+    if connection is None:
+        return []
+
+    return [{"robot_id": row[0], "timestamp": row[1], "path": row[2], "size": row[3], "reference": bool(row[4])}
+            for row in query_index(connection, robot_id, start, end, limit)]
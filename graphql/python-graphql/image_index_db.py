@@ -0,0 +1,50 @@
+import sqlite3
+
+# Shared by the image bridge, which writes the index (dds/image_index.py), and the GraphQL server,
+# which reads it (image_index.py). Kept in this directory because the server container only
+# mounts graphql/.
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS images (
+        robot_id INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        reference INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (robot_id, timestamp)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS images_path ON images (path);
+"""
+
+
+def connect_read_only(path):
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+def query_images(connection, robot_id, start=None, end=None, limit=None):
+    """
+    Time-range lookup on the image index, served by the (robot_id, timestamp) primary key.
+
+    With `limit`, the newest `limit` rows of the range are returned.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the index.
+
+    Returns:
+        list: (robot_id, timestamp, path, size, reference) tuples, oldest first.
+    """
+    sql = 'SELECT robot_id, timestamp, path, size, reference FROM images WHERE robot_id = ?'
+    parameters = [int(robot_id)]
+    if start is not None:
+        sql += ' AND timestamp >= ?'
+        parameters.append(start)
+    if end is not None:
+        sql += ' AND timestamp <= ?'
+        parameters.append(end)
+    if limit is None:
+        return connection.execute(sql + ' ORDER BY timestamp ASC', parameters).fetchall()
+
+    parameters.append(int(limit))
+    rows = connection.execute(sql + ' ORDER BY timestamp DESC LIMIT ?', parameters).fetchall()
+    rows.reverse()
+    return rows
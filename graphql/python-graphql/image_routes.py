@@ -0,0 +1,78 @@
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Route
+
+from frame_cache import frame_cache
+
+CONTENT_TYPES = ('image/jpeg', 'image/png')
+
+
+def not_modified(request, etag):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is None:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+def image_response(request, data, etag, content_type, timestamp):
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'no-cache',  # Clients revalidate, and get a 304 until the frame changes
+        'X-Timestamp': str(timestamp),
+    }
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type=content_type, headers=headers)
+
+
+async def get_image(request):
+    """
+    GET /images/{robot_id}: the latest frame of the robot, as received from the bridge.
+    """
+    frame = frame_cache.get(request.path_params['robot_id'])
+    if frame is None:
+        return Response(status_code=404)
+    return image_response(request, frame.data, frame.etag, frame.content_type, frame.timestamp)
+
+
+async def get_thumbnail(request):
+    """
+    GET /images/{robot_id}/thumbnail: a small JPEG of the latest frame, generated once per frame.
+    """
+    frame = frame_cache.get(request.path_params['robot_id'])
+    if frame is None:
+        return Response(status_code=404)
+
+    etag = frame.thumbnail_etag
+    if not_modified(request, etag):
+        return image_response(request, None, etag, 'image/jpeg', frame.timestamp)
+
+    thumbnail = frame.thumbnail
+    if thumbnail is None:
+        thumbnail = await run_in_threadpool(frame.get_thumbnail)
+    return image_response(request, thumbnail, etag, 'image/jpeg', frame.timestamp)
+
+
+async def put_image(request):
+    """
+    PUT /images/{robot_id}: called by the image bridge with the encoded frame as the body and
+    its timestamp in the X-Timestamp header.
+    """
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    if content_type not in CONTENT_TYPES:
+        return Response(f"Unsupported content type '{content_type}'", status_code=415)
+    try:
+        timestamp = int(request.headers.get('x-timestamp', '0'))
+    except ValueError:
+        return Response("Invalid X-Timestamp", status_code=400)
+
+    data = await request.body()
+    stored = frame_cache.put(request.path_params['robot_id'], timestamp, data, content_type)
+    return Response(status_code=204 if stored else 409)
+
+
+image_routes = [
+    Route('/images/{robot_id:int}', get_image, methods=['GET']),
+    Route('/images/{robot_id:int}', put_image, methods=['PUT']),
+    Route('/images/{robot_id:int}/thumbnail', get_thumbnail, methods=['GET']),
+]
@@ -0,0 +1,155 @@
+import copy
+import os
+import threading
+import time
+
+IGNITE_LATENCY_MS = float(os.getenv('IGNITE_LATENCY_MS', '0'))  # Injected delay per cache operation
+
+IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+class MemoryScanCursor:
+    """
+    Iterates a snapshot of a cache's (key, value) pairs. Like pyignite's ScanCursor, it can also
+    be used as a context manager.
+    """
+
+    def __init__(self, items):
+        self.items = iter(items)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.items)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class MemoryCache:
+    """
+    In-memory stand-in for a pyignite Cache, for the subset of its API this server uses.
+
+    Values are copied in and out like a real cache would serialize them, so a caller cannot
+    change a stored value by mutating the object it put or got. Every operation sleeps
+    `latency` seconds first, to approximate a network round trip to Ignite.
+    """
+
+    def __init__(self, name, latency=0.0):
+        self.name = name
+        self.latency = latency
+        self.data = dict()
+        self.lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _copy(value):
+        return value if isinstance(value, IMMUTABLE_TYPES) else copy.deepcopy(value)
+
+    def get(self, key):
+        self._wait()
+        with self.lock:
+            return self._copy(self.data.get(key))
+
+    def put(self, key, value):
+        self._wait()
+        with self.lock:
+            self.data[key] = self._copy(value)
+
+    def get_all(self, keys):
+        self._wait()
+        with self.lock:
+            return {key: self._copy(self.data[key]) for key in keys if key in self.data}
+
+    def put_all(self, pairs):
+        self._wait()
+        with self.lock:
+            for key, value in pairs.items():
+                self.data[key] = self._copy(value)
+
+    def scan(self, page_size=1, partitions=-1, local=False):
+        self._wait()
+        with self.lock:
+            items = [(key, self._copy(value)) for key, value in self.data.items()]
+        return MemoryScanCursor(items)
+
+    def remove_key(self, key):
+        self._wait()
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self, keys=None):
+        self._wait()
+        with self.lock:
+            if keys is None:
+                self.data.clear()
+            else:
+                for key in keys:
+                    self.data.pop(key, None)
+
+    def replace_if_equals(self, key, sample, value):
+        self._wait()
+        with self.lock:
+            if key in self.data and self.data[key] == sample:
+                self.data[key] = self._copy(value)
+                return True
+            return False
+
+    def put_if_absent(self, key, value):
+        self._wait()
+        with self.lock:
+            if key in self.data:
+                return False
+            self.data[key] = self._copy(value)
+            return True
+
+    def contains_key(self, key):
+        self._wait()
+        with self.lock:
+            return key in self.data
+
+    def get_size(self):
+        with self.lock:
+            return len(self.data)
+
+
+class MemoryClient:
+    """
+    In-memory stand-in for pyignite's Client, selected with IGNITE_BACKEND=memory (see ignite.py).
+    Lets the resolvers run, be tested and be benchmarked without an Ignite node.
+
+    Attributes:
+        latency (float): Seconds each cache operation sleeps, from IGNITE_LATENCY_MS by default.
+    """
+
+    def __init__(self, latency=IGNITE_LATENCY_MS / 1000):
+        self.latency = latency
+        self.caches = dict()
+        self.lock = threading.Lock()
+
+    def connect(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+    def get_or_create_cache(self, settings):
+        name = settings if isinstance(settings, str) else settings.get('name', settings.get(0))
+        with self.lock:
+            if name not in self.caches:
+                self.caches[name] = MemoryCache(name, self.latency)
+            return self.caches[name]
+
+    def get_cache(self, settings):
+        return self.get_or_create_cache(settings)
+
+    def get_cache_names(self):
+        with self.lock:
+            return list(self.caches)
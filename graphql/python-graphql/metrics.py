@@ -0,0 +1,362 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+
+from ariadne.types import Extension
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'  # Prometheus text exposition format
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """
+    Monotonic counter, one value per combination of label values.
+
+    Updates take a single uncontended lock, so they are safe from the event loop and from the
+    threadpool alike and cost well under a microsecond.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = dict()
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self.lock:
+            values = list(self.values.items())
+        if not values and not self.labels:
+            values = [((), 0)]
+        for label_values, value in values:
+            yield self.name + format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down, e.g. requests in flight. With `function`, the value is instead
+    read when the metrics are scraped, so nothing is done on the hot path.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, description, labels=(), function=None):
+        super().__init__(name, description, labels)
+        self.function = function
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def collect(self):
+        if self.function is not None:
+            yield self.name, self.function()
+        else:
+            yield from super().collect()
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, one per combination of label values.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = dict()  # label values -> [per-bucket counts (last is +Inf), sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def collect(self):
+        with self.lock:
+            values = [(label_values, list(counts), total) for label_values, (counts, total) in self.values.items()]
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield self.name + '_bucket' + format_labels(self.labels, label_values, f'le="{le}"'), cumulative
+            yield self.name + '_sum' + format_labels(self.labels, label_values), total
+            yield self.name + '_count' + format_labels(self.labels, label_values), cumulative
+
+
+class MetricsRegistry:
+    """
+    Holds the server's metrics and renders them in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample, value in metric.collect():
+                lines.append(f'{sample} {value:g}' if isinstance(value, float) else f'{sample} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', 'HTTP requests handled, by route and status.', ('route', 'method', 'status')))
+http_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time to handle an HTTP request, by route.', ('route',)))
+http_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests being handled, by route.', ('route',)))
+
+graphql_in_flight = registry.register(Gauge(
+    'graphql_operations_in_flight', 'GraphQL operations being executed.'))
+resolver_latency = registry.register(Histogram(
+    'graphql_resolver_duration_seconds', 'Time spent in each top-level resolver.', ('field',)))
+resolver_errors = registry.register(Counter(
+    'graphql_resolver_errors_total', 'Top-level resolvers that raised.', ('field',)))
+
+cache_latency = registry.register(Histogram(
+    'ignite_cache_call_duration_seconds', 'Time of each Ignite cache call.', ('cache', 'method')))
+cache_errors = registry.register(Counter(
+    'ignite_cache_call_errors_total', 'Ignite cache calls that raised.', ('cache', 'method')))
+
+trace_latency = registry.register(Histogram(
+    'robot_position_trace_seconds', 'Latency of each stage of a robot position, from the agent to a query.',
+    ('stage',), buckets=LATENCY_BUCKETS + (10.0, 30.0, 60.0)))
+
+websocket_connections = registry.register(Gauge(
+    'websocket_connections', 'Open GraphQL websocket connections.'))
+websocket_messages = registry.register(Counter(
+    'websocket_messages_total', 'Websocket messages, by direction.', ('direction',)))
+subscriptions_active = registry.register(Gauge(
+    'graphql_subscriptions_active', 'Running subscriptions, by field.', ('field',)))
+subscription_messages = registry.register(Counter(
+    'graphql_subscription_messages_total', 'Events pushed to subscribers, by field.', ('field',)))
+
+
+def route_label(path):
+    """
+    The first path segment, so per-robot paths like /images/3 share one label value.
+    """
+    return '/' + path.lstrip('/').split('/', 1)[0]
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting and timing every HTTP request, and keeping the in-flight gauges.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        route = route_label(scope['path'])
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        http_in_flight.inc(route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_latency.observe(time.perf_counter() - start, route)
+            http_in_flight.dec(route)
+            http_requests.inc(route, scope['method'], status[0])
+
+
+class MetricsExtension(Extension):
+    """
+    Ariadne extension timing the top-level resolver of every operation, e.g. `Query.map`, so the
+    resolver that holds the event loop shows up. Nested fields are not timed, to keep the cost
+    per request constant.
+    """
+
+    def request_started(self, context):
+        graphql_in_flight.inc()
+
+    def request_finished(self, context):
+        graphql_in_flight.dec()
+
+    def resolve(self, next_, obj, info, **kwargs):
+        if info.path.prev is not None:
+            return next_(obj, info, **kwargs)
+
+        field = f'{info.parent_type.name}.{info.field_name}'
+        start = time.perf_counter()
+        try:
+            result = next_(obj, info, **kwargs)
+        except Exception:
+            resolver_errors.inc(field)
+            resolver_latency.observe(time.perf_counter() - start, field)
+            raise
+
+        if inspect.isawaitable(result):
+            return self.resolve_async(result, field, start)
+        resolver_latency.observe(time.perf_counter() - start, field)
+        return result
+
+    async def resolve_async(self, result, field, start):
+        try:
+            return await result
+        except Exception:
+            resolver_errors.inc(field)
+            raise
+        finally:
+            resolver_latency.observe(time.perf_counter() - start, field)
+
+
+def instrument_websocket(handler):
+    """
+    Wraps a websocket endpoint to track the open connections and count the messages sent and
+    received on them.
+    """
+
+    async def endpoint(websocket):
+        send, receive = websocket.send, websocket.receive
+
+        async def counted_send(message):
+            if message['type'] == 'websocket.send':
+                websocket_messages.inc('sent')
+            await send(message)
+
+        async def counted_receive():
+            message = await receive()
+            if message['type'] == 'websocket.receive':
+                websocket_messages.inc('received')
+            return message
+
+        websocket.send, websocket.receive = counted_send, counted_receive
+        websocket_connections.inc()
+        try:
+            await handler(websocket)
+        finally:
+            websocket_connections.dec()
+
+    return endpoint
+
+
+def subscription_metrics(field):
+    """
+    Decorator for subscription sources: tracks how many subscriptions of `field` are running and
+    counts the events they push.
+    """
+
+    def decorator(source):
+        @functools.wraps(source)
+        async def wrapper(*args, **kwargs):
+            subscriptions_active.inc(field)
+            try:
+                async for message in source(*args, **kwargs):
+                    subscription_messages.inc(field)
+                    yield message
+            finally:
+                subscriptions_active.dec(field)
+
+        return wrapper
+
+    return decorator
+
+
+class InstrumentedCache:
+    """
+    Wraps an Ignite cache so each call is timed under the cache's name. Only the call itself is
+    timed: iterating the cursor returned by `scan` is not.
+    """
+
+    def __init__(self, cache, name):
+        self.cache = cache
+        self.name = name
+
+    def __getattr__(self, attribute):
+        value = getattr(self.cache, attribute)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            except Exception:
+                cache_errors.inc(self.name, attribute)
+                raise
+            finally:
+                cache_latency.observe(time.perf_counter() - start, self.name, attribute)
+
+        setattr(self, attribute, timed)  # Later calls skip __getattr__
+        return timed
+
+
+class InstrumentedClient:
+    """
+    Wraps an Ignite client so the caches it hands out are InstrumentedCaches.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.caches = dict()
+
+    def get_or_create_cache(self, settings):
+        return self._instrument(self.client.get_or_create_cache(settings), settings)
+
+    def get_cache(self, settings):
+        return self._instrument(self.client.get_cache(settings), settings)
+
+    def _instrument(self, cache, settings):
+        name = settings if isinstance(settings, str) else getattr(cache, 'name', str(settings))
+        if name not in self.caches:
+            self.caches[name] = InstrumentedCache(cache, name)
+        return self.caches[name]
+
+    def __getattr__(self, attribute):
+        return getattr(self.client, attribute)
+
+
+async def metrics_endpoint(request):
+    """
+    GET /metrics: every metric in the Prometheus text format.
+    """
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+metrics_routes = [
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+]
@@ -2,8 +2,12 @@ from ariadne import load_schema_from_path, make_executable_schema, gql, Mutation
 import json
 import numpy as np
 import base64
+import time
 
 from ignite import ignite_client
+from agent_events import agent_broadcaster, get_agent_lists
+from agent_registry import agent_registry
+from metrics import trace_latency
 
 mutation = MutationType()
 
@@ -26,15 +30,22 @@ def resolve_set_robot_goal(_, info, robot_id, x_goal, y_goal, theta_goal, goal_t
         return False
     
 @mutation.field("setRobotPosition")
-def resolve_set_robot_position(_, info, robot_id, x, y, theta):
+def resolve_set_robot_position(_, info, robot_id, x, y, theta, source_ts=None, ingest_ts=None):
     position_cache = ignite_client.get_or_create_cache('robot_position')
     position = {
         "x": x,
         "y": y,
-        "theta": theta
+        "theta": theta,
+        "source_ts": source_ts,  # Written by the agent (DDS sample time)
+        "ingest_ts": ingest_ts,  # Received by the bridge
+        "store_ts": time.time()  # Written to Ignite
     }
     try:
+        start = time.perf_counter()
         position_cache.put(robot_id, json.dumps(position))
+        trace_latency.observe(time.perf_counter() - start, 'ignite_put')
+        if ingest_ts is not None:
+            trace_latency.observe(max(position["store_ts"] - ingest_ts, 0.0), 'ingest_to_store')
         return True
     except:
         return False
@@ -76,24 +87,52 @@ def resolve_clear_robot(_, info, robot_id):
     except:
         return False
     
+def publish_registry_change(changed):
+    # The registry writes return None when another batch was being written: False, the writer retries
+    if changed:
+        agent_broadcaster.publish(*get_agent_lists())
+    return changed is not None
+
 @mutation.field("setAgentList")
 def resolve_set_agent_list(_, info, agent_list):
-    agent_list_cache = ignite_client.get_or_create_cache('subscribed_agents')
+    # Applied as per-agent changes, only the agents that joined or left are written
     try:
-        agent_list_cache.put(1, json.dumps(agent_list))
-        return True
+        return publish_registry_change(agent_registry.set_list(agent_list, "active"))
     except:
         return False
     
 @mutation.field("setExitedAgentList")
 def resolve_set_exited_agent_list(_, info, agent_list):
-    agent_list_cache = ignite_client.get_or_create_cache('exited_agents')
     try:
-        agent_list_cache.put(1, json.dumps(agent_list))
-        return True
+        return publish_registry_change(agent_registry.set_list(agent_list, "exited"))
+    except:
+        return False
+    
+@mutation.field("addAgent")
+def resolve_add_agent(_, info, agent_id, timestamp=None):
+    try:
+        return publish_registry_change(agent_registry.add_agent(agent_id, timestamp))
     except:
         return False
     
+@mutation.field("removeAgent")
+def resolve_remove_agent(_, info, agent_id, exited=False):
+    try:
+        return publish_registry_change(agent_registry.remove_agent(agent_id, exited))
+    except:
+        return False
+    
+@mutation.field("applyAgentChanges")
+def resolve_apply_agent_changes(_, info, expected_version, active=(), inactive=(), exited=(), not_exited=()):
+    # Returns the new version, or None if the registry moved since the writer read it
+    try:
+        version = agent_registry.apply_changes(expected_version, active or (), inactive or (), exited or (), not_exited or ())
+        if version is not None and version != expected_version:
+            agent_broadcaster.publish(*get_agent_lists())
+        return version
+    except:
+        return None
+    
 @mutation.field("clearDetectedObjects")
 def resolve_clear_detected_objects(_, info):
     detected_objects_cache = ignite_client.get_or_create_cache('detected_objects')
@@ -1,13 +1,36 @@
 from ariadne import load_schema_from_path, make_executable_schema, gql, QueryType
 import json
 import numpy as np
+import time
 
 from ignite import ignite_client
+from image_index import query_images
+from agent_events import get_agent_lists
+from agent_registry import agent_registry
+from metrics import trace_latency
 
 md_cache = ignite_client.get_or_create_cache('map_metadata')
 map_cache = ignite_client.get_or_create_cache('map')
 query = QueryType()
 
+
+def trace_position(robot):
+    """
+    Returns the trace timestamps stored with a robot position, and records how old the position
+    is as it is read: since it was stored ('query_read') and since the agent sent it ('end_to_end').
+    """
+    now = time.time()
+    trace = {
+        "source_ts": robot.get("source_ts"),
+        "ingest_ts": robot.get("ingest_ts"),
+        "store_ts": robot.get("store_ts")
+    }
+    if trace["store_ts"] is not None:
+        trace_latency.observe(max(now - trace["store_ts"], 0.0), 'query_read')
+    if trace["source_ts"] is not None:
+        trace_latency.observe(max(now - trace["source_ts"], 0.0), 'end_to_end')
+    return trace
+
 @query.field("map")
 def resolve_data(*_):
     md = md_cache.get(1)
@@ -37,13 +60,17 @@ def resolve_data(*_, robot_id: int):
         return {
             "x": None,
             "y": None,
-            "theta": None
+            "theta": None,
+            "source_ts": None,
+            "ingest_ts": None,
+            "store_ts": None
         }
     robot = json.loads(robot)
     return {
         "x": robot["x"],
         "y": robot["y"],
-        "theta": robot["theta"]
+        "theta": robot["theta"],
+        **trace_position(robot)
     }
 
 @query.field("robotPositions")
@@ -58,7 +85,8 @@ def resolve_data(*_):
             "id": robot_id,
             "x": robot["x"],
             "y": robot["y"],
-            "theta": robot["theta"]
+            "theta": robot["theta"],
+            **trace_position(robot)
         })
     return all_robots
 
@@ -209,6 +237,11 @@ def resolve_data(*_, robot_id: int):
         "timestamp": robot["timestamp"]
     }
 
+@query.field("robotImages")
+def resolve_data(*_, robot_id: int, start=None, end=None, limit=None):
+    # Answered from the local SQLite index kept by the image bridge, not from Influx
+    return query_images(robot_id, start, end, limit)
+
 # @query.field("robotImage")
 # def resolve_data(*_, robot_id: int):
 #     image_cache = ignite_client.get_or_create_cache('robot_image')
@@ -253,7 +286,8 @@ def resolve_data(*_):
                 "id": robot_id,
                 "x": robot["x"],
                 "y": robot["y"],
-                "theta": robot["theta"]
+                "theta": robot["theta"],
+                **trace_position(robot)
             })
     return all_robots
 
@@ -299,47 +333,40 @@ def resolve_data(*_):
 
 @query.field("subscribed_agents")
 def resolve_data(*_):
-    agent_cache = ignite_client.get_or_create_cache('subscribed_agents')
-    agents = agent_cache.get(1)
-    if agents is None:
-        return {"id": []}
-    agents = json.loads(agents)
-    
-    if len(agents)==0 or agents[0] == -1:
-        return {"id": []}
-    
+    agents, _exited_agents = get_agent_lists()
     return {"id": agents}
 
 @query.field("exitedAgents")
 def resolve_data(*_):
-    agent_cache = ignite_client.get_or_create_cache('exited_agents')
-    agents = agent_cache.get(1)
-    if agents is None:
-        return {"id": []}
-    agents = json.loads(agents)
-    
-    if len(agents)==0 or agents[0] == -1:
-        return {"id": []}
-    
-    return {"id": agents}
+    _agents, exited_agents = get_agent_lists()
+    return {"id": exited_agents}
 
 @query.field("subscribedAndExitedAgents")
 def resolve_data(*_):
-    agent_cache = ignite_client.get_or_create_cache('subscribed_agents')
-    exited_agent_cache = ignite_client.get_or_create_cache('exited_agents')
-    agents = agent_cache.get(1)
-    exited_agents = exited_agent_cache.get(1)
-    
-    if agents is None:
-        agents = []
-    else:
-        agents = json.loads(agents)
-    
-    if exited_agents is None:
-        exited_agents = []
-    else:
-        exited_agents = json.loads(exited_agents)
-    
+    agents, exited_agents = get_agent_lists()
     return [
         {"id": agents},   {"id": exited_agents}
-        ]
\ No newline at end of file
+        ]
+
+@query.field("agentRegistryVersion")
+def resolve_agent_registry_version(*_):
+    return agent_registry.get_version()
+
+@query.field("agentRegistryState")
+def resolve_agent_registry_state(*_):
+    state = agent_registry.get_state()
+    if state is None:
+        return None  # A batch is being written, the writer reads again
+    version, agents, exited_agents = state
+    return {
+        "version": version,
+        "active": agents,
+        "exited": exited_agents
+    }
+
+@query.field("agentEntry")
+def resolve_agent_entry(*_, agent_id):
+    entry = agent_registry.get_entry(agent_id)
+    if entry is None:
+        return None
+    return dict(entry, id=agent_id)
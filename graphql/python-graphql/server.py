@@ -1,6 +1,6 @@
 from ariadne import load_schema_from_path, make_executable_schema, gql, QueryType, SubscriptionType, MutationType
 from ariadne.asgi import GraphQL
-from ariadne.asgi.handlers import GraphQLTransportWSHandler
+from ariadne.asgi.handlers import GraphQLHTTPHandler, GraphQLTransportWSHandler
 from fastapi import FastAPI
 import uvicorn
 from starlette.applications import Starlette
@@ -11,6 +11,8 @@ from starlette.websockets import WebSocketDisconnect
 from queries import query
 from mutations import mutation
 from subscriptions import subscription
+from image_routes import image_routes
+from metrics import MetricsExtension, MetricsMiddleware, instrument_websocket, metrics_routes
 from fastapi.middleware.cors import CORSMiddleware
 
 import time
@@ -27,11 +29,15 @@ schema = make_executable_schema(type_defs, query, mutation, subscription)
 #               debug=True)
 
 # Using starlette to handle http and websocket requests
-graphql_app = GraphQL(schema, debug=True, websocket_handler=GraphQLTransportWSHandler())
+graphql_app = GraphQL(schema, debug=True,
+                      http_handler=GraphQLHTTPHandler(extensions=[MetricsExtension]),
+                      websocket_handler=GraphQLTransportWSHandler())
 app = Starlette(
     routes=[
         Route('/graphql', graphql_app.handle_request, methods=['GET', 'POST', 'OPTIONS']),
-        WebSocketRoute('/graphql', graphql_app.handle_websocket),
+        WebSocketRoute('/graphql', instrument_websocket(graphql_app.handle_websocket)),
+        *image_routes,  # Latest camera frame of each robot, fed by the image bridge
+        *metrics_routes,  # Prometheus metrics of the server
     ],
 )
 
@@ -42,8 +48,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Timestamp"],
 )
 
+# Count and time every HTTP request
+app.add_middleware(MetricsMiddleware)
+
 if __name__ == "__main__":
     
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -7,6 +7,8 @@ import struct
 from confluent_kafka import Consumer, KafkaException
 
 from ignite import ignite_client
+from agent_events import agent_broadcaster, get_agent_lists
+from metrics import subscription_metrics
 
 def deserialize_key(key_bytes):
     return struct.unpack('>i', key_bytes)[0] if key_bytes is not None else None
@@ -14,6 +16,7 @@ def deserialize_key(key_bytes):
 subscription = SubscriptionType()
 
 @subscription.source("robotPosition")
+@subscription_metrics("robotPosition")
 async def subscribe_robot_position(obj, info, robot_id: int):
     consumer = Consumer({
         'bootstrap.servers': 'broker:29092',
@@ -59,6 +62,7 @@ def resolve_robot_position(message, info, robot_id):
 
 
 @subscription.source("robotPositions")
+@subscription_metrics("robotPositions")
 async def subscribe_robot_position(obj, info):
     consumer = Consumer({
         'bootstrap.servers': 'broker:29092',
@@ -103,6 +107,7 @@ def resolve_robot_position(message, info):
     return message
 
 @subscription.source("robotVideo")
+@subscription_metrics("robotVideo")
 async def subscribe_robot_position(obj, info, robot_id: int):
     consumer = Consumer({
         'bootstrap.servers': 'broker:29092',
@@ -142,4 +147,16 @@ async def subscribe_robot_position(obj, info, robot_id: int):
 
 @subscription.field("robotVideo")
 def resolve_robot_position(message, info, robot_id):
-    return message
\ No newline at end of file
+    return message
+
+@subscription.source("agentsChanged")
+@subscription_metrics("agentsChanged")
+async def subscribe_agents_changed(obj, info):
+    async for agents, exited_agents in agent_broadcaster.subscribe(initial=get_agent_lists()):
+        yield [
+            {"id": agents},   {"id": exited_agents}
+            ]
+
+@subscription.field("agentsChanged")
+def resolve_agents_changed(message, info):
+    return message